@@ -0,0 +1,129 @@
+import math
+import time
+import warnings
+
+import numpy as np
+import openseespy.opensees as ops
+
+# Solution algorithms tried in order when a chunk of steps does not converge
+ALGORITHMS = (('Newton',), ('ModifiedNewton', '-initial'), ('NewtonLineSearch',), ('KrylovNewton',))
+
+
+def modal_periods(num_modes=3):
+    """Periods of the first num_modes modes of the current model
+
+    Rigid-body or mechanism modes (eigenvalue <= 0) get an infinite period.
+    """
+    eigenvalues = np.asarray(ops.eigen(num_modes), dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        return 2 * np.pi / np.sqrt(np.maximum(eigenvalues, 0.0))
+
+
+def warn_mechanism(periods):
+    """Warn when no mode has a finite period: the model is a mechanism (e.g. loose members)"""
+    periods = np.asarray(periods, dtype=np.float64)
+    if len(periods) and not np.any(np.isfinite(periods) & (periods > 0)):
+        warnings.warn(f"None of the {len(periods)} modes has a finite period; the model is a mechanism "
+                      f"(unconnected nodes or members?)", RuntimeWarning, stacklevel=3)
+        return True
+    return False
+
+
+def choose_time_step(periods, load_frequency=None, output_dt=None, points_per_period=20):
+    """Largest accurate time step for the given periods and load frequency
+
+    Newmark average acceleration is unconditionally stable, so the step is
+    set by accuracy: points_per_period steps over the shortest period of
+    interest (the given modes and the load period). With output_dt the step
+    is shortened to divide the output interval evenly.
+    """
+    periods = np.asarray(periods, dtype=np.float64)
+    warn_mechanism(periods)
+    candidates = periods[np.isfinite(periods) & (periods > 0)].tolist()
+    if load_frequency:
+        candidates.append(1.0 / load_frequency)
+    if not candidates:
+        raise ValueError("No finite period or load frequency to choose the time step from")
+    shortest = min(candidates)
+    dt = shortest / points_per_period
+    if output_dt:
+        dt = output_dt / math.ceil(output_dt / dt - 1e-9)
+    return dt
+
+
+class TransientDriver:
+    """Run a transient analysis in chunks of steps between output samples
+
+    Every output interval is one ops.analyze() call. When a chunk does not
+    converge the remaining part of the interval is retried with halved
+    steps (down to dt / 2**max_halvings) and then with the other
+    algorithms, after which the first algorithm is restored.
+    """
+
+    def __init__(self, dt, output_dt, duration, algorithms=ALGORITHMS, max_halvings=4,
+                 test=('NormDispIncr', 1.0e-6, 25)):
+        self.dt = dt
+        self.output_dt = output_dt
+        self.duration = duration
+        self.algorithms = algorithms
+        self.max_halvings = max_halvings
+        self.test = test
+        self.report = {}
+
+    def recover(self, target):
+        """Reach target time after a failed chunk; returns the analyze() code"""
+        ok = -1
+        for number, algorithm in enumerate(self.algorithms):
+            ops.algorithm(*algorithm)
+            # The first algorithm already failed at full dt
+            for level in range(1 if number == 0 else 0, self.max_halvings + 1):
+                remaining = target - ops.getTime()
+                steps = max(1, round(remaining / (self.dt / 2 ** level)))
+                ok = ops.analyze(steps, remaining / steps)
+                self.report['analyze_calls'] += 1
+                if ok == 0:
+                    self.report['substeps'] += steps if level else 0
+                    break
+            if ok == 0:
+                if number:
+                    self.report['algorithm_switches'] += 1
+                break
+        ops.algorithm(*self.algorithms[0])
+        return ok
+
+    def run(self, on_output=None):
+        """Analyze until duration; on_output(time) is called at every output sample"""
+        start = time.perf_counter()
+        steps_per_output = max(1, round(self.output_dt / self.dt))
+        outputs = round(self.duration / self.output_dt)
+        t0 = ops.getTime()
+
+        self.report = {'dt': self.dt, 'output_dt': self.output_dt, 'steps': 0, 'analyze_calls': 0,
+                       'substeps': 0, 'algorithm_switches': 0, 'failed_at': None, 'times': []}
+        if self.test:
+            ops.test(*self.test)
+        ops.algorithm(*self.algorithms[0])
+
+        for k in range(1, outputs + 1):
+            target = t0 + k * self.output_dt
+            ok = ops.analyze(steps_per_output, self.dt)
+            self.report['analyze_calls'] += 1
+            if ok != 0:
+                ok = self.recover(target)
+            if ok != 0:
+                self.report['failed_at'] = ops.getTime()
+                break
+            self.report['times'].append(ops.getTime())
+            if on_output is not None:
+                on_output(ops.getTime())
+
+        self.report['steps'] = len(self.report['times']) * steps_per_output + self.report['substeps']
+        self.report['elapsed'] = time.perf_counter() - start
+        return self.report
+
+    def format_report(self):
+        report = self.report
+        status = 'completed' if report['failed_at'] is None else f"failed at t = {report['failed_at']:.4f} s"
+        return (f"Transient analysis {status}: dt = {report['dt']:.4g} s, {len(report['times'])} outputs, "
+                f"{report['analyze_calls']} analyze calls, {report['substeps']} sub-steps, "
+                f"{report['algorithm_switches']} algorithm switches in {report['elapsed']:.2f}s")
@@ -0,0 +1,109 @@
+import time
+
+import numpy as np
+from matplotlib.animation import FuncAnimation
+from matplotlib.collections import LineCollection
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
+
+class FrameAnimator:
+    """Deformed-shape animation with one line collection per member class
+
+    coords: (N, 2) or (N, 3) undeformed node coordinates
+    members: (M, 2) node indices
+    displacements: (steps, N, D) nodal displacements; column d moves
+        coordinate axis components[d] (default: the first D axes)
+    classes: (M,) member class labels, drawn with styles[label]
+        (matplotlib LineCollection keywords, e.g. {'colors': 'b'})
+
+    The collections are created once; every frame only replaces their
+    segment arrays with coords + scale * displacements[frame]. 2D axes are
+    blitted, 3D axes are redrawn since the projection changes every artist.
+    """
+
+    def __init__(self, ax, coords, members, displacements, classes=None, styles=None, scale=1.0,
+                 components=None, times=None, linewidth=2):
+        self.ax = ax
+        self.coords = np.asarray(coords, dtype=np.float64)
+        self.members = np.asarray(members, dtype=np.int64)
+        self.displacements = displacements
+        self.scale = scale
+        self.times = times
+        dims = self.coords.shape[1]
+        self.is_3d = dims == 3
+        self.components = list(range(displacements.shape[2])) if components is None else list(components)
+
+        classes = np.zeros(len(self.members), dtype=np.int64) if classes is None else np.asarray(classes)
+        styles = styles or {}
+        self.groups = []
+        collection_type = Line3DCollection if self.is_3d else LineCollection
+        for label in np.unique(classes):
+            selected = self.members[classes == label]
+            style = dict({'linewidths': linewidth}, **styles.get(label, {}))
+            collection = collection_type(self.coords[selected], **style)
+            if self.is_3d:
+                ax.add_collection3d(collection)
+            else:
+                ax.add_collection(collection)
+            self.groups.append((selected, collection))
+
+        if self.is_3d:
+            self.label = ax.text2D(0.02, 0.95, '', transform=ax.transAxes)
+        else:
+            self.label = ax.text(0.02, 0.97, '', transform=ax.transAxes, va='top')
+
+    @property
+    def blit(self):
+        return not self.is_3d
+
+    @property
+    def artists(self):
+        return [collection for _, collection in self.groups] + [self.label]
+
+    def positions(self, frame):
+        """(N, dims) deformed node positions at a frame"""
+        positions = self.coords.copy()
+        positions[:, self.components] += self.scale * self.displacements[frame]
+        return positions
+
+    def update(self, frame):
+        positions = self.positions(frame)
+        for selected, collection in self.groups:
+            collection.set_segments(positions[selected])
+        if self.times is not None:
+            self.label.set_text(f't = {self.times[frame]:.2f} s')
+        return self.artists
+
+    def init(self):
+        return self.update(0)
+
+    def limits(self, margin=0.05):
+        """Axis limits that contain the deformed shape at every frame"""
+        peak = np.abs(self.displacements).max(axis=(0, 1)) * abs(self.scale)
+        low, high = self.coords.min(axis=0), self.coords.max(axis=0)
+        low[self.components] -= peak
+        high[self.components] += peak
+        pad = margin * np.maximum(high - low, 1e-9)
+        return low - pad, high + pad
+
+    def set_limits(self, margin=0.05):
+        low, high = self.limits(margin)
+        self.ax.set_xlim(low[0], high[0])
+        self.ax.set_ylim(low[1], high[1])
+        if self.is_3d:
+            self.ax.set_zlim(low[2], high[2])
+
+    def animation(self, fig, frames=None, interval=20, **kwargs):
+        """FuncAnimation over the displacement steps (or the given frames)"""
+        frames = len(self.displacements) if frames is None else frames
+        return FuncAnimation(fig, self.update, frames=frames, init_func=self.init, interval=interval,
+                             blit=self.blit, **kwargs)
+
+
+def time_frames(fig, update, frames):
+    """Average seconds to update and draw one frame on fig's canvas"""
+    start = time.perf_counter()
+    for frame in frames:
+        update(frame)
+        fig.canvas.draw()
+    return (time.perf_counter() - start) / max(len(frames), 1)
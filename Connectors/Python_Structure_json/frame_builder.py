@@ -0,0 +1,207 @@
+import time
+
+import numpy as np
+import openseespy.opensees as ops
+
+# Section property names in the order elasticBeamColumn takes them (3D)
+SECTION_KEYS = ('A', 'E', 'G', 'J', 'Iy', 'Iz')
+
+
+def local_axes(nodes, members, vertical_tolerance=1e-6):
+    """Local x axis and vecxz vector of every member in one pass
+
+    vecxz is global Z for all members except (nearly) vertical ones, which
+    use global X, so it is never parallel to the member axis. Returns
+    (x_axis (M, 3), vecxz (M, 3), lengths (M,)).
+    """
+    vectors = nodes[members[:, 1]] - nodes[members[:, 0]]
+    lengths = np.linalg.norm(vectors, axis=1)
+    if np.any(lengths == 0):
+        raise ValueError(f"{int(np.sum(lengths == 0))} members have zero length")
+    x_axis = vectors / lengths[:, None]
+
+    vertical = np.abs(x_axis[:, 2]) > 1 - vertical_tolerance
+    vecxz = np.zeros_like(x_axis)
+    vecxz[~vertical, 2] = 1.0
+    vecxz[vertical, 0] = 1.0
+    return x_axis, vecxz, lengths
+
+
+def lumped_member_masses(nodes, members, mass_per_length):
+    """Half of every member's mass lumped at each end node, (N,) array"""
+    lengths = np.linalg.norm(nodes[members[:, 1]] - nodes[members[:, 0]], axis=1)
+    half = 0.5 * lengths * np.broadcast_to(mass_per_length, lengths.shape)
+    return (np.bincount(members[:, 0], weights=half, minlength=len(nodes)) +
+            np.bincount(members[:, 1], weights=half, minlength=len(nodes)))
+
+
+def rigid_diaphragms(nodes, levels, masses):
+    """Master node of every rigid floor diaphragm
+
+    levels is the (N,) floor index of every node, -1 for nodes on no
+    floor. The master of every floor is its node nearest to the floor's
+    center of mass (its centroid when massless). The masses stay at the
+    floor nodes: the Transformation handler projects them onto the master,
+    which keeps the coupling between floor translation and rotation
+    exactly, wherever the master is. Returns master node indices (F,).
+    """
+    on_floor = np.flatnonzero(levels >= 0)
+    floor = levels[on_floor]
+    count = int(levels.max(initial=-1)) + 1
+    xy = nodes[on_floor, :2]
+    mx = masses[on_floor, 0]
+
+    def floor_sum(weights):
+        return np.bincount(floor, weights=weights, minlength=count)
+
+    weights = np.where((floor_sum(mx) > 0)[floor], mx, 1.0)
+    center = np.stack([floor_sum(weights * xy[:, 0]), floor_sum(weights * xy[:, 1])], axis=1)
+    center /= floor_sum(weights)[:, None]
+
+    # Nearest node of every floor: sort by (floor, distance), take the first
+    distance = np.linalg.norm(xy - center[floor], axis=1)
+    order = np.lexsort((distance, floor))
+    return on_floor[order[np.searchsorted(floor[order], np.arange(count))]]
+
+
+class FrameModelBuilder:
+    """Build a 3D elastic frame in OpenSees from node and member arrays
+
+    nodes: (N, 3) coordinates (node n gets tag n + 1)
+    members: (M, 2) node indices (member m gets element tag m + 1)
+    sections: one dict with the SECTION_KEYS, or a list of them together
+        with section_ids (M,) picking the section of every member
+    supports: (N,) boolean mask of fully fixed nodes
+    masses: (N,) translational or (N, 6) nodal masses; zero rows are skipped
+    vecxz: optional (M, 3) override of the computed vecxz vectors
+    diaphragm_levels: optional (N,) floor index of every node (-1 for none,
+        see frame_graph.floor_levels); every floor becomes a rigid
+        diaphragm with one of its nodes as master (see rigid_diaphragms).
+        Needs the Transformation constraint handler
+        (configure_solver(..., mp_constraints=True)).
+
+    Members that share a vecxz vector share one geomTransf, so a regular
+    frame needs two transformations instead of one per element.
+    """
+
+    def __init__(self, nodes, members, sections, section_ids=None, supports=None, masses=None,
+                 vecxz=None, transf_type='Linear', decimals=6, diaphragm_levels=None):
+        self.nodes = np.asarray(nodes, dtype=np.float64)
+        self.members = np.asarray(members, dtype=np.int64)
+        self.sections = [sections] if isinstance(sections, dict) else list(sections)
+        self.section_ids = (np.zeros(len(self.members), dtype=np.int64) if section_ids is None
+                            else np.asarray(section_ids, dtype=np.int64))
+        self.supports = (np.zeros(len(self.nodes), dtype=bool) if supports is None
+                         else np.asarray(supports, dtype=bool))
+        self.masses = masses
+        self.vecxz = vecxz
+        self.transf_type = transf_type
+        self.decimals = decimals
+        self.diaphragm_levels = (None if diaphragm_levels is None
+                                 else np.asarray(diaphragm_levels, dtype=np.int64))
+        self.report = {}
+        self.master_tags = np.zeros(0, dtype=np.int64)
+
+    @property
+    def diaphragm_count(self):
+        return 0 if self.diaphragm_levels is None else int(self.diaphragm_levels.max(initial=-1)) + 1
+
+    def transformations(self):
+        """(unique vecxz vectors (T, 3), transformation index of every member)"""
+        _, vecxz, _ = local_axes(self.nodes, self.members)
+        if self.vecxz is not None:
+            vecxz = np.asarray(self.vecxz, dtype=np.float64)
+        unique, inverse = np.unique(np.round(vecxz, self.decimals) + 0.0, axis=0, return_inverse=True)
+        return unique, inverse.ravel()
+
+    def nodal_masses(self):
+        if self.masses is None:
+            return None
+        masses = np.asarray(self.masses, dtype=np.float64)
+        if masses.ndim == 1:
+            full = np.zeros((len(self.nodes), 6))
+            full[:, :3] = masses[:, None]
+            return full
+        return masses
+
+    def build(self, wipe=True):
+        """Issue all OpenSees commands; returns the build report"""
+        timings = {}
+        start = time.perf_counter()
+
+        if wipe:
+            ops.wipe()
+            ops.model('basic', '-ndm', 3, '-ndf', 6)
+
+        transforms, transform_ids = self.transformations()
+        section_table = np.array([[section[key] for key in SECTION_KEYS] for section in self.sections],
+                                 dtype=np.float64)
+        # Convert everything to plain Python lists once so the command loops
+        # below do no per-element NumPy work
+        element_args = section_table[self.section_ids].tolist()
+        ends = (self.members + 1).tolist()
+        transform_tags = (transform_ids + 1).tolist()
+        timings['axes'] = time.perf_counter() - start
+
+        step = time.perf_counter()
+        for tag, (x, y, z) in enumerate(self.nodes.tolist(), start=1):
+            ops.node(tag, x, y, z)
+        for tag in (np.flatnonzero(self.supports) + 1).tolist():
+            ops.fix(tag, 1, 1, 1, 1, 1, 1)
+        timings['nodes'] = time.perf_counter() - step
+
+        # Rigid floors: the slaves follow the in-plane motion (x, y, rotation
+        # about z) of a master node of their floor. The master is one of the
+        # frame nodes, not an extra node, so the equation numbering keeps it
+        # next to its floor and the band stays narrow.
+        step = time.perf_counter()
+        masses = self.nodal_masses()
+        masters = np.zeros(0, dtype=np.int64)
+        if self.diaphragm_count:
+            masters = rigid_diaphragms(self.nodes, self.diaphragm_levels,
+                                       np.zeros((len(self.nodes), 6)) if masses is None else masses)
+            self.master_tags = masters + 1
+            for floor, master in enumerate(masters.tolist()):
+                slaves = np.flatnonzero(self.diaphragm_levels == floor)
+                ops.rigidDiaphragm(3, master + 1, *(slaves[slaves != master] + 1).tolist())
+        timings['diaphragms'] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        for tag, vector in enumerate(transforms.tolist(), start=1):
+            ops.geomTransf(self.transf_type, tag, *vector)
+        for tag, ((i, j), args, transform) in enumerate(zip(ends, element_args, transform_tags), start=1):
+            ops.element('elasticBeamColumn', tag, i, j, *args, transform)
+        timings['elements'] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        mass_count = 0
+        if masses is not None:
+            loaded = np.flatnonzero(np.any(masses != 0, axis=1))
+            for tag, values in zip((loaded + 1).tolist(), masses[loaded].tolist()):
+                ops.mass(tag, *values)
+            mass_count = len(loaded)
+        timings['masses'] = time.perf_counter() - step
+        timings['total'] = time.perf_counter() - start
+
+        self.report = {
+            'nodes': len(self.nodes),
+            'elements': len(self.members),
+            'transformations': len(transforms),
+            'supports': int(self.supports.sum()),
+            'masses': mass_count,
+            'diaphragms': self.diaphragm_count,
+            'constrained': 0 if self.diaphragm_levels is None else int((self.diaphragm_levels >= 0).sum()) - len(masters),
+            'time': timings
+        }
+        return self.report
+
+    def format_report(self):
+        report = self.report
+        timings = report['time']
+        diaphragms = (f", {report['diaphragms']} rigid diaphragms ({report['constrained']} constrained nodes)"
+                      if report['diaphragms'] else '')
+        return (f"Built {report['nodes']} nodes, {report['elements']} elements, "
+                f"{report['transformations']} transformations, {report['supports']} supports, "
+                f"{report['masses']} masses{diaphragms} in {timings['total']:.3f}s "
+                f"(axes {timings['axes']:.3f}s, nodes {timings['nodes']:.3f}s, "
+                f"elements {timings['elements']:.3f}s, masses {timings['masses']:.3f}s)")
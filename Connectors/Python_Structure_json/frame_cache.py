@@ -0,0 +1,169 @@
+import argparse
+import os
+import shutil
+import time
+
+import numpy as np
+import openseespy.opensees as ops
+
+from frame_analysis import warn_mechanism
+from frame_solver import matrix_statistics
+from frame_store import EXTENSION, ResultStore, ResultWriter, model_hash
+
+# Default cache folder, next to the scripts' other outputs
+CACHE_DIRECTORY = '.frame_cache'
+# Bumped when the cached entries change, so old entries are never misread
+CACHE_VERSION = 2
+
+
+def builder_hash(builder):
+    """Canonical hash of everything a FrameModelBuilder puts into the model"""
+    masses = builder.nodal_masses()
+    return model_hash(builder.nodes, builder.members, sections=builder.sections, section_ids=builder.section_ids,
+                      supports=builder.supports, masses=np.zeros(0) if masses is None else masses,
+                      vecxz=np.zeros(0) if builder.vecxz is None else np.asarray(builder.vecxz, dtype=np.float64),
+                      diaphragm_levels=(np.zeros(0, dtype=np.int64) if builder.diaphragm_levels is None
+                                        else builder.diaphragm_levels),
+                      transf_type=builder.transf_type, cache_version=CACHE_VERSION)
+
+
+def eigen_analysis(num_modes, node_tags, solver='-genBandArpack'):
+    """Eigenvalues, (modes, nodes, ndf) shapes and (nodes, ndf) masses of the current model"""
+    eigenvalues = np.asarray(ops.eigen(solver, num_modes), dtype=np.float64)
+    tags = np.asarray(node_tags).tolist()
+    shapes = np.array([[ops.nodeEigenvector(tag, mode) for tag in tags] for mode in range(1, num_modes + 1)])
+    masses = np.array([ops.nodeMass(tag) for tag in tags], dtype=np.float64)
+    return eigenvalues, shapes, masses
+
+
+class ModelCache:
+    """Model properties and eigen results on disk, one result store per model hash"""
+
+    def __init__(self, directory=CACHE_DIRECTORY):
+        self.directory = directory
+
+    def path(self, key):
+        return os.path.join(self.directory, key + EXTENSION)
+
+    def load(self, key):
+        """(metadata, arrays) of a cached model, or None"""
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with ResultStore(path) as store:
+                return store.metadata, {name: store.array(name) for name in store.arrays}
+        except (OSError, ValueError, KeyError):
+            # Written by an interrupted run or an older version: recompute
+            return None
+
+    def save(self, key, metadata, arrays):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        partial = path + '.part'
+        with ResultWriter(partial, arrays['nodes'], arrays['members'], dict(metadata, model_hash=key)) as writer:
+            for name, array in arrays.items():
+                if name not in ('nodes', 'members'):
+                    writer.add_array(name, array)
+        os.replace(partial, path)
+        return path
+
+    def entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-len(EXTENSION)] for name in os.listdir(self.directory) if name.endswith(EXTENSION))
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def cached_model(builder, num_modes=3, cache=None, build=True, wipe=True, ndf=6):
+    """Build a FrameModelBuilder model and get its modes, reusing cached results
+
+    The cache is keyed by builder_hash(), so any change of nodes, members,
+    sections, masses, supports or transformations is a miss. A hit skips
+    the eigen solve and the matrix statistics; with build=False it does not
+    touch OpenSees at all, for runs that only plot or report. A miss always
+    builds the model, solves num_modes modes and stores them, unless no
+    mode has a finite period (a mechanism, see warn_mechanism).
+
+    Returns a dict with key, hit, built, cached, eigenvalues, periods, shapes
+    (modes, nodes, ndf), masses (nodes, ndf), statistics (for
+    configure_solver) and time.
+    """
+    cache = cache or ModelCache()
+    start = time.perf_counter()
+    key = builder_hash(builder)
+    entry = cache.load(key)
+    hit = entry is not None and entry[0].get('num_modes', 0) >= num_modes
+    built = False
+
+    if hit:
+        metadata, arrays = entry
+        eigenvalues = arrays['eigenvalues'][:num_modes]
+        shapes = arrays['shapes'][:num_modes]
+        masses = arrays['masses']
+        statistics = metadata['statistics']
+        if build:
+            builder.build(wipe=wipe)
+            built = True
+    else:
+        builder.build(wipe=wipe)
+        built = True
+        node_tags = np.arange(1, len(builder.nodes) + 1)
+        eigenvalues, shapes, masses = eigen_analysis(num_modes, node_tags)
+        statistics = matrix_statistics(len(builder.nodes), builder.members, ndf, builder.supports)
+
+    with np.errstate(divide='ignore'):
+        periods = 2 * np.pi / np.sqrt(np.maximum(eigenvalues, 0.0))
+    cached = hit or not warn_mechanism(periods)
+    if not hit and cached:
+        cache.save(key, {'num_modes': num_modes, 'statistics': statistics,
+                         'build': {name: value for name, value in builder.report.items() if name != 'time'}},
+                   {'nodes': builder.nodes, 'members': builder.members, 'supports': builder.supports,
+                    'eigenvalues': eigenvalues, 'shapes': shapes, 'masses': masses})
+    return {
+        'key': key,
+        'hit': hit,
+        'built': built,
+        'cached': cached,
+        'eigenvalues': eigenvalues,
+        'periods': periods,
+        'shapes': shapes,
+        'masses': masses,
+        'statistics': statistics,
+        'time': time.perf_counter() - start
+    }
+
+
+def format_cached(model):
+    source = 'cache hit' if model['hit'] else 'computed and cached' if model['cached'] else 'computed, not cached'
+    built = '' if model['built'] else ', model not built'
+    return f"Model {model['key'][:12]}: {len(model['periods'])} modes {source} in {model['time']:.3f}s{built}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List or clear the cached models and eigen results")
+    parser.add_argument('command', choices=('list', 'clear'))
+    parser.add_argument('--directory', default=CACHE_DIRECTORY)
+    args = parser.parse_args(argv)
+
+    cache = ModelCache(args.directory)
+    if args.command == 'clear':
+        cache.clear()
+        print(f"Cleared {args.directory}")
+        return
+    for key in cache.entries():
+        entry = cache.load(key)
+        if entry is None:
+            print(f"{key}: unreadable")
+            continue
+        metadata, arrays = entry
+        with np.errstate(divide='ignore'):
+            periods = 2 * np.pi / np.sqrt(np.maximum(arrays['eigenvalues'], 0.0))
+        print(f"{key}: {len(arrays['nodes'])} nodes, {len(arrays['members'])} members, "
+              f"{metadata['statistics']['equations']} equations, periods {np.round(periods, 4).tolist()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import glob
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# Video codecs per container when assembling with ffmpeg
+FFMPEG_CODECS = {
+    '.mp4': ['-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2'],
+    '.webm': ['-c:v', 'libvpx-vp9', '-b:v', '0', '-crf', '32', '-pix_fmt', 'yuv420p'],
+}
+FRAME_NAME = 'frame_{:05d}.png'
+# Settings the frames in a frames directory were rendered with
+FINGERPRINT_NAME = 'fingerprint.json'
+
+# (figure, update) of the export in progress, inherited by forked workers
+_JOB = None
+
+
+def backend(preferred='TkAgg'):
+    """The preferred interactive backend when a display is available, else Agg"""
+    if os.name == 'nt' or sys.platform == 'darwin':
+        return preferred
+    if os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'):
+        return preferred
+    return 'Agg'
+
+
+def render_frames(frames, frames_dir, palette=False):
+    """Draw the given frames of the shared figure to PNG files (runs in a worker)
+
+    Frames that already exist are skipped, and every file is written under
+    a temporary name first so an interrupted export never leaves a partial
+    frame behind. An interactive canvas (e.g. TkAgg) is swapped for a plain
+    Agg canvas while rendering, and artists marked animated for blitting
+    are drawn too. With palette the frames are quantized for GIF here.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from PIL import Image
+
+    fig, update = _JOB
+    canvas = fig.canvas
+    if type(canvas) is not FigureCanvasAgg:
+        FigureCanvasAgg(fig)
+    animated = []
+    rendered = 0
+    try:
+        for frame in frames:
+            path = os.path.join(frames_dir, FRAME_NAME.format(frame))
+            if os.path.exists(path):
+                continue
+            for artist in update(frame) or ():
+                if artist.get_animated():
+                    artist.set_animated(False)
+                    animated.append(artist)
+            fig.canvas.draw()
+            image = Image.fromarray(np.asarray(fig.canvas.buffer_rgba())).convert('RGB')
+            if palette:
+                image = image.convert('P', palette=Image.ADAPTIVE)
+            partial = path + '.part'
+            image.save(partial, format='png', compress_level=1)
+            os.replace(partial, path)
+            rendered += 1
+    finally:
+        for artist in animated:
+            artist.set_animated(True)
+        if fig.canvas is not canvas:
+            fig.set_canvas(canvas)
+    return len(frames), rendered
+
+
+def frames_fingerprint(fig, num_frames, palette=False, key=None):
+    """Everything that changes the rendered frames, as stored in FINGERPRINT_NAME"""
+    fingerprint = {
+        'num_frames': num_frames,
+        'size': [float(v) for v in fig.get_size_inches()],
+        'dpi': float(fig.dpi),
+        'palette': palette,
+        'key': key,
+    }
+    # Round trip so tuples and numpy scalars compare equal to the stored copy
+    return json.loads(json.dumps(fingerprint, default=str))
+
+
+def prepare_frames_dir(frames_dir, fingerprint):
+    """Create frames_dir and discard frames rendered with a different fingerprint
+
+    A directory without a fingerprint file counts as different. Returns the
+    number of discarded frames.
+    """
+    os.makedirs(frames_dir, exist_ok=True)
+    path = os.path.join(frames_dir, FINGERPRINT_NAME)
+    try:
+        with open(path) as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        stored = None
+    if stored == fingerprint:
+        return 0
+
+    stale = glob.glob(os.path.join(frames_dir, 'frame_*.png*'))
+    for frame_path in stale:
+        os.remove(frame_path)
+    with open(path, 'w') as f:
+        json.dump(fingerprint, f)
+    return len(stale)
+
+
+def chunk_frames(num_frames, workers, chunks_per_worker=4):
+    """Split range(num_frames) into contiguous chunks for the pool"""
+    size = max(1, math.ceil(num_frames / (workers * chunks_per_worker)))
+    return [range(start, min(start + size, num_frames)) for start in range(0, num_frames, size)]
+
+
+def print_progress(done, total, start):
+    elapsed = time.perf_counter() - start
+    remaining = elapsed / done * (total - done) if done else 0.0
+    print(f"\rRendered {done}/{total} frames ({100 * done / total:.0f}%), "
+          f"{elapsed:.1f}s elapsed, ~{remaining:.1f}s left", end='', flush=True)
+
+
+def assemble(frames_dir, num_frames, path, fps):
+    """Combine the frame PNGs into a GIF (Pillow) or MP4/WebM (ffmpeg)"""
+    extension = os.path.splitext(path)[1].lower()
+    frame_paths = [os.path.join(frames_dir, FRAME_NAME.format(frame)) for frame in range(num_frames)]
+
+    if extension == '.gif':
+        from PIL import Image
+
+        # Frames were already quantized by the workers
+        def frames():
+            for frame_path in frame_paths[1:]:
+                with Image.open(frame_path) as image:
+                    image.load()
+                    yield image
+
+        with Image.open(frame_paths[0]) as first:
+            first.save(path, save_all=True, append_images=frames(), duration=round(1000 / fps), loop=0,
+                       optimize=False)
+        return
+
+    if extension not in FFMPEG_CODECS:
+        raise ValueError(f"Unsupported animation format: {extension} (use .gif, .mp4 or .webm)")
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        raise RuntimeError(f"Writing {extension} needs ffmpeg on the PATH; the frames are kept in {frames_dir}")
+    subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-framerate', str(fps),
+                    '-i', os.path.join(frames_dir, 'frame_%05d.png'), *FFMPEG_CODECS[extension], path],
+                   check=True)
+
+
+def export_animation(fig, update, num_frames, path, fps=20, workers=None, frames_dir=None, keep_frames=False,
+                     dpi=None, key=None):
+    """Render an animation headless on a process pool and write it to path
+
+    update(frame) must bring fig to the given frame, like a FuncAnimation
+    function. Workers are forked and inherit the figure, so they render
+    their chunk of frames with the Agg canvas without rebuilding anything.
+    Frames go to frames_dir (default: <path>_frames); rerunning after an
+    interruption only renders the missing frames. They are only reused when
+    the frame count, figure size, dpi and key (any JSON value identifying
+    the plotted data, e.g. a model_hash of the results) match the earlier
+    run. Without fork (Windows) the frames are rendered in this process.
+    """
+    global _JOB
+    frames_dir = frames_dir or os.path.splitext(path)[0] + '_frames'
+    if dpi:
+        fig.set_dpi(dpi)
+    palette = os.path.splitext(path)[1].lower() == '.gif'
+    discarded = prepare_frames_dir(frames_dir, frames_fingerprint(fig, num_frames, palette, key))
+    if discarded:
+        print(f"Discarded {discarded} frames in {frames_dir} rendered with other settings")
+    _JOB = (fig, update)
+
+    workers = workers or os.cpu_count() or 1
+    existing = sum(os.path.exists(os.path.join(frames_dir, FRAME_NAME.format(frame))) for frame in range(num_frames))
+    if existing:
+        print(f"Resuming: {existing} of {num_frames} frames already rendered in {frames_dir}")
+
+    start = time.perf_counter()
+    done = 0
+    chunks = chunk_frames(num_frames, workers)
+    try:
+        if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                jobs = [pool.submit(render_frames, chunk, frames_dir, palette) for chunk in chunks]
+                for future in as_completed(jobs):
+                    done += future.result()[0]
+                    print_progress(done, num_frames, start)
+        else:
+            for chunk in chunks:
+                done += render_frames(chunk, frames_dir, palette)[0]
+                print_progress(done, num_frames, start)
+    finally:
+        _JOB = None
+    print()
+
+    assemble(frames_dir, num_frames, path, fps)
+    if not keep_frames:
+        shutil.rmtree(frames_dir)
+    print(f"Saved {path} ({num_frames} frames) in {time.perf_counter() - start:.1f}s")
+    return path
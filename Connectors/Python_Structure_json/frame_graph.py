@@ -0,0 +1,221 @@
+import numpy as np
+
+# Same welder as the backend's geometry validation (identical copy)
+from vertex_weld import weld_vertices
+
+# Components whose polygon outlines become frame members
+SURFACE_CATEGORIES = ('walls', 'floors')
+# Components that already are members (two end points)
+MEMBER_CATEGORIES = ('columns', 'beams')
+
+
+class FrameGraph:
+    """Welded node/member graph of a building
+
+    nodes: (N, 3) coordinates, node n has OpenSees tag n + 1
+    members: (M, 2) node indices, each undirected edge once (i < j)
+    member_categories: (M,) category name of every member
+    supports: (N,) boolean mask of support nodes
+    """
+
+    def __init__(self, nodes, members, member_categories, supports):
+        self.nodes = nodes
+        self.members = members
+        self.member_categories = member_categories
+        self.supports = supports
+
+    @property
+    def node_tags(self):
+        return np.arange(1, len(self.nodes) + 1)
+
+    @property
+    def member_tags(self):
+        """(M, 2) OpenSees node tags of the member ends"""
+        return self.members + 1
+
+    def member_vectors(self):
+        """(M, 3) vectors from the first to the second end of every member"""
+        return self.nodes[self.members[:, 1]] - self.nodes[self.members[:, 0]]
+
+    def member_coordinates(self):
+        """(M, 2, 3) end coordinates of every member, e.g. for plotting"""
+        return self.nodes[self.members]
+
+    def level_mask(self, z, tolerance=1e-3):
+        """Nodes at elevation z"""
+        return np.abs(self.nodes[:, 2] - z) <= tolerance
+
+    def split_at(self, elevations, tolerance=1e-3):
+        """Copy with every member split where it crosses one of the elevations (see split_members)"""
+        nodes, members, parent = split_members(self.nodes, self.members, elevations, tolerance)
+        supports = np.concatenate([self.supports, np.zeros(len(nodes) - len(self.nodes), dtype=bool)])
+        return FrameGraph(nodes, members, self.member_categories[parent], supports)
+
+
+def collect_edges(components, categories):
+    """Vertices and edges of the given categories
+
+    Polygons contribute their closed outline, members their single segment.
+    Returns (vertices (V, 3), edges (E, 2) indices into vertices, category
+    index of every edge).
+    """
+    coords, counts, codes = [], [], []
+    for code, category in enumerate(categories):
+        for component in components.get(category) or []:
+            vertices = component['vertices']
+            coords.extend((v['x'], v['y'], v['z']) for v in vertices)
+            counts.append(len(vertices))
+            codes.append(code)
+
+    vertices = np.array(coords, dtype=np.float64).reshape(-1, 3)
+    counts = np.array(counts, dtype=np.int64)
+    codes = np.array(codes, dtype=np.int64)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+
+    # Segment k of a component runs from vertex k to vertex k + 1, wrapping
+    # around for polygons; two-point members only have one segment
+    is_member = np.isin(np.array(categories)[codes], MEMBER_CATEGORIES) if len(codes) else np.zeros(0, bool)
+    segments = np.where(is_member, np.minimum(counts - 1, 1), counts)
+    owner = np.repeat(np.arange(len(counts)), segments)
+    local = np.arange(segments.sum()) - np.repeat(np.cumsum(segments) - segments, segments)
+    first = starts[owner] + local
+    second = starts[owner] + (local + 1) % counts[owner]
+
+    return vertices, np.stack([first, second], axis=1), codes[owner]
+
+
+def split_members(nodes, members, elevations, tolerance=1e-3):
+    """Split members at the elevations they cross, e.g. full-height wall edges at the floors
+
+    A crossing point within tolerance of an existing node is joined to
+    it, so floor outlines get connected to the walls; other crossing
+    points become new nodes, appended after the existing ones. Returns
+    (nodes, members, parent) where parent (M',) is the original member of
+    every new member.
+    """
+    nodes = np.asarray(nodes, dtype=np.float64)
+    members = np.asarray(members, dtype=np.int64)
+    elevations = np.asarray(elevations, dtype=np.float64)
+    z = nodes[members, 2]
+    low, high = z.min(axis=1), z.max(axis=1)
+    member, level = np.nonzero((elevations[None, :] > low[:, None] + tolerance) &
+                               (elevations[None, :] < high[:, None] - tolerance))
+    if len(member) == 0:
+        return nodes, members, np.arange(len(members))
+
+    # Crossing points, welded to the existing nodes (which come first)
+    t = (elevations[level] - z[member, 0]) / (z[member, 1] - z[member, 0])
+    start, end = nodes[members[member, 0]], nodes[members[member, 1]]
+    points = start + t[:, None] * (end - start)
+    canonical = weld_vertices(np.concatenate([nodes, points]), tolerance)[len(nodes):]
+    new = np.unique(canonical[canonical >= len(nodes)])
+    index = np.where(canonical < len(nodes), canonical, len(nodes) + np.searchsorted(new, canonical))
+    nodes = np.concatenate([nodes, np.concatenate([nodes, points])[new]])
+
+    # Chain every member's ends and crossings by position along it
+    count = len(members)
+    owner = np.concatenate([np.arange(count), member, np.arange(count)])
+    position = np.concatenate([np.zeros(count), t, np.ones(count)])
+    chain = np.concatenate([members[:, 0], index, members[:, 1]])
+    order = np.lexsort((position, owner))
+    owner, chain = owner[order], chain[order]
+    same = owner[:-1] == owner[1:]
+    return nodes, np.stack([chain[:-1][same], chain[1:][same]], axis=1), owner[:-1][same]
+
+
+def unique_edges(edges, codes):
+    """Drop zero-length and repeated undirected edges; keeps the first category"""
+    edges = np.sort(edges, axis=1)
+    keep = edges[:, 0] != edges[:, 1]
+    edges, codes = edges[keep], codes[keep]
+    keys = edges[:, 0].astype(np.int64) * (edges.max(initial=0) + 1) + edges[:, 1]
+    _, first = np.unique(keys, return_index=True)
+    first.sort()
+    return edges[first], codes[first]
+
+
+def support_mask(nodes, tolerance=1e-3, elevation=None):
+    """Nodes at the base (lowest elevation unless given) as a boolean mask"""
+    if len(nodes) == 0:
+        return np.zeros(0, dtype=bool)
+    base = nodes[:, 2].min() if elevation is None else elevation
+    return nodes[:, 2] <= base + tolerance
+
+
+def floor_elevations(data, tolerance=1e-3):
+    """Sorted elevations of the horizontal 'floors' components of building JSON"""
+    levels = []
+    for floor in data['components'].get('floors', []):
+        z = np.array([vertex['z'] for vertex in floor['vertices']], dtype=np.float64)
+        if len(z) and np.ptp(z) <= tolerance:
+            levels.append(z.mean())
+    return np.unique(np.round(np.array(levels) / tolerance)) * tolerance
+
+
+def floor_levels(nodes, supports=None, elevations=None, tolerance=1e-3):
+    """Floor index of every node for rigid diaphragms, -1 for nodes on no floor
+
+    Floors are the given elevations (e.g. floor_elevations() of the JSON)
+    or every distinct node elevation. Support nodes and floors with a
+    single node are left out; floors are numbered from the lowest up.
+    """
+    nodes = np.asarray(nodes, dtype=np.float64)
+    z = nodes[:, 2]
+    if elevations is None:
+        elevations = np.unique(np.round(z / tolerance)) * tolerance
+    elevations = np.sort(np.asarray(elevations, dtype=np.float64))
+    if len(nodes) == 0 or len(elevations) == 0:
+        return np.full(len(nodes), -1, dtype=np.int64)
+
+    nearest = np.abs(z[:, None] - elevations[None, :]).argmin(axis=1)
+    levels = np.where(np.abs(z - elevations[nearest]) <= tolerance, nearest, -1)
+    if supports is not None:
+        levels[np.asarray(supports, dtype=bool)] = -1
+    counts = np.bincount(levels[levels >= 0], minlength=len(elevations))
+    levels[(levels >= 0) & (counts[np.maximum(levels, 0)] < 2)] = -1
+
+    on_floor = levels >= 0
+    levels[on_floor] = np.unique(levels[on_floor], return_inverse=True)[1].ravel()
+    return levels
+
+
+def json_to_frame(data, tolerance=1e-3, categories=SURFACE_CATEGORIES + MEMBER_CATEGORIES):
+    """Convert building geometry JSON into a welded FrameGraph
+
+    Vertices closer than tolerance become one node (numbered in order of
+    first appearance), shared wall/floor edges become a single member and
+    the lowest nodes are marked as supports.
+    """
+    components = data['components']
+    categories = tuple(categories)
+    vertices, edges, codes = collect_edges(components, categories)
+
+    canonical = weld_vertices(vertices, tolerance)
+    roots, node_of_vertex = np.unique(canonical, return_inverse=True)
+    nodes = vertices[roots]
+
+    members, member_codes = unique_edges(node_of_vertex.ravel()[edges], codes)
+    member_categories = np.array(categories, dtype=object)[member_codes]
+    return FrameGraph(nodes, members, member_categories, support_mask(nodes, tolerance))
+
+
+def regular_frame(bays_x, bays_y, stories, bay_width_x, bay_width_y, story_height):
+    """Regular 3D frame: columns on a bay grid, beams on every floor above ground
+
+    Nodes are ordered by floor, then x, then y, so node (floor, x, y) has
+    index (floor * (bays_x + 1) + x) * (bays_y + 1) + y. The base floor is
+    marked as supports.
+    """
+    floor, x, y = np.meshgrid(np.arange(stories + 1), np.arange(bays_x + 1), np.arange(bays_y + 1),
+                              indexing='ij')
+    nodes = np.stack([x * bay_width_x, y * bay_width_y, floor * story_height], axis=-1).reshape(-1, 3)
+    index = np.arange(len(nodes)).reshape(floor.shape)
+
+    columns = np.stack([index[:-1].ravel(), index[1:].ravel()], axis=1)
+    beams_x = np.stack([index[1:, :-1, :].ravel(), index[1:, 1:, :].ravel()], axis=1)
+    beams_y = np.stack([index[1:, :, :-1].ravel(), index[1:, :, 1:].ravel()], axis=1)
+    members = np.concatenate([columns, beams_x, beams_y])
+    member_categories = np.array(['columns'] * len(columns) + ['beams'] * (len(beams_x) + len(beams_y)),
+                                 dtype=object)
+
+    return FrameGraph(nodes, members, member_categories, floor.ravel() == 0)
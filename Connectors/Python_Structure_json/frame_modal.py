@@ -0,0 +1,223 @@
+import argparse
+import time
+
+import numpy as np
+import openseespy.opensees as ops
+
+from frame_analysis import TransientDriver, choose_time_step
+from frame_results import NodeResults, ResultBuffer
+from frame_solver import configure_solver
+
+
+def rayleigh_damping_ratios(omega, alpha_m=0.0, beta_k=0.0):
+    """Modal damping ratios of rayleigh(alpha_m, beta_k, 0, 0) damping"""
+    omega = np.asarray(omega, dtype=np.float64)
+    return alpha_m / (2 * omega) + beta_k * omega / 2
+
+
+def harmonic_modal_response(omega, zeta, force, period, times, steady_state=False):
+    """Modal coordinates (steps, modes) under force * sin(2 pi t / period)
+
+    Exact solution of q'' + 2 zeta omega q' + omega^2 q = force sin(W t)
+    for every mode at once, starting at rest at t = 0. With steady_state
+    the decaying free vibration part is left out. Undamped modes at
+    resonance use the linearly growing resonant solution.
+    """
+    omega = np.asarray(omega, dtype=np.float64)
+    zeta = np.broadcast_to(np.asarray(zeta, dtype=np.float64), omega.shape)
+    force = np.broadcast_to(np.asarray(force, dtype=np.float64), omega.shape)
+    if np.any(zeta >= 1):
+        raise ValueError("Modal superposition needs underdamped modes (damping ratio < 1)")
+    t = np.asarray(times, dtype=np.float64)[:, None]
+    load_omega = 2 * np.pi / period
+
+    ratio = load_omega / omega
+    denominator = (1 - ratio ** 2) ** 2 + (2 * zeta * ratio) ** 2
+    resonant = denominator < 1e-12
+    denominator = np.where(resonant, 1.0, denominator)
+    static = force / omega ** 2
+    c = static * (1 - ratio ** 2) / denominator
+    d = static * (-2 * zeta * ratio) / denominator
+    q = c * np.sin(load_omega * t) + d * np.cos(load_omega * t)
+
+    if not steady_state:
+        damped = omega * np.sqrt(1 - zeta ** 2)
+        e = (zeta * omega * -d - c * load_omega) / damped
+        q += np.exp(-zeta * omega * t) * (e * np.sin(damped * t) - d * np.cos(damped * t))
+
+    if np.any(resonant):
+        w = omega[resonant]
+        q[:, resonant] = static[resonant] / 2 * (np.sin(w * t) - w * t * np.cos(w * t))
+    return q
+
+
+class ModalModel:
+    """Modes of the current OpenSees model as NumPy arrays
+
+    shapes: (modes, nodes, ndf) mode shapes, masses: (nodes, ndf) lumped
+    nodal masses. Responses are evaluated by modal superposition without
+    running a transient analysis.
+    """
+
+    def __init__(self, num_modes, node_tags=None, solver='-genBandArpack'):
+        eigenvalues = np.asarray(ops.eigen(solver, num_modes), dtype=np.float64)
+        self.omega = np.sqrt(eigenvalues)
+        self.node_tags = np.asarray(ops.getNodeTags() if node_tags is None else node_tags, dtype=np.int64)
+        tags = self.node_tags.tolist()
+        self.shapes = np.array([[ops.nodeEigenvector(tag, mode) for tag in tags]
+                                for mode in range(1, num_modes + 1)])
+        self.masses = np.array([ops.nodeMass(tag) for tag in tags], dtype=np.float64)
+        self.generalized_masses = np.einsum('mnd,nd,mnd->m', self.shapes, self.masses, self.shapes)
+
+    @property
+    def periods(self):
+        return 2 * np.pi / self.omega
+
+    @property
+    def dofs(self):
+        return tuple(range(1, self.shapes.shape[2] + 1))
+
+    def participation(self, direction):
+        """Participation factors of uniform excitation in dof direction (1-based)"""
+        column = direction - 1
+        return (self.shapes[:, :, column] @ self.masses[:, column]) / self.generalized_masses
+
+    def effective_mass_ratios(self, direction):
+        """Share of the total mass in direction activated by every mode"""
+        column = direction - 1
+        gamma = self.participation(direction)
+        return gamma ** 2 * self.generalized_masses / self.masses[:, column].sum()
+
+    def modal_forces(self, direction=None, accel=1.0, loads=None):
+        """Modal force amplitudes of uniform excitation and/or nodal loads (nodes, ndf)"""
+        forces = np.zeros(len(self.omega))
+        if direction is not None:
+            forces -= self.participation(direction) * accel
+        if loads is not None:
+            forces += np.einsum('mnd,nd->m', self.shapes, loads) / self.generalized_masses
+        return forces
+
+    def harmonic_response(self, times, period, direction=None, accel=1.0, loads=None, zeta=0.0,
+                          steady_state=False, modes=None):
+        """Nodal displacements under a Sine time series, as NodeResults
+
+        Matches a 'Sine' series of the given period driving a
+        UniformExcitation pattern in direction (accel is its factor) and/or
+        a Plain pattern of nodal loads. modes limits the superposition to
+        the first modes.
+        """
+        modes = len(self.omega) if modes is None else modes
+        forces = self.modal_forces(direction, accel, loads)[:modes]
+        zeta = np.broadcast_to(zeta, self.omega.shape)[:modes]
+        q = harmonic_modal_response(self.omega[:modes], zeta, forces, period, times, steady_state)
+        values = np.tensordot(q, self.shapes[:modes], axes=1)
+        return NodeResults(values, times, self.node_tags, self.dofs)
+
+    def truncation_errors(self, times, period, reference=None, dof=1, **load):
+        """Relative peak error of the response with 1..all modes
+
+        The error of k modes is max |u_k - u_ref| / max |u_ref| over all
+        nodes and steps in dof. reference is a (steps, nodes) array, for
+        example from a transient analysis; by default all modes are used.
+        """
+        column = dof - 1
+        forces = self.modal_forces(load.get('direction'), load.get('accel', 1.0), load.get('loads'))
+        zeta = np.broadcast_to(load.get('zeta', 0.0), self.omega.shape)
+        q = harmonic_modal_response(self.omega, zeta, forces, period, times, load.get('steady_state', False))
+        if reference is None:
+            reference = q @ self.shapes[:, :, column]
+        scale = np.abs(reference).max() or 1.0
+
+        errors = np.empty(len(self.omega))
+        response = np.zeros_like(reference)
+        for mode in range(len(self.omega)):
+            response += q[:, mode, None] * self.shapes[mode, None, :, column]
+            errors[mode] = np.abs(response - reference).max() / scale
+        return errors
+
+
+def compare_modal_transient(build, num_modes, period, duration, output_dt, direction=1, accel=1.0,
+                            damping=0.0, points_per_period=20):
+    """Run the modal and the transient path on the same model side by side
+
+    build() creates the model in OpenSees and returns its FrameGraph; the excitation is a Sine
+    UniformExcitation with rayleigh(damping, 0, 0, 0). Returns a report with
+    both run times, the errors against the transient response and the
+    truncation error and effective mass of 1..num_modes modes. The modal
+    solution is exact in time, so what remains at many modes is mostly the
+    period elongation of Newmark at points_per_period steps per period.
+    """
+    frame = build()
+    start = time.perf_counter()
+    modal = ModalModel(num_modes)
+    times = np.arange(1, round(duration / output_dt) + 1) * output_dt
+    zeta = rayleigh_damping_ratios(modal.omega, damping)
+    response = modal.harmonic_response(times, period, direction, accel, zeta=zeta)
+    modal_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ops.timeSeries('Sine', 1, 0.0, duration, period, '-factor', accel)
+    ops.pattern('UniformExcitation', 1, direction, '-accel', 1)
+    if damping:
+        ops.rayleigh(damping, 0.0, 0.0, 0.0)
+    configure_solver(frame.nodes, frame.members, len(modal.dofs), frame.supports, verbose=False)
+    ops.integrator('Newmark', 0.5, 0.25)
+    ops.analysis('Transient')
+    dt = choose_time_step(modal.periods[:3], 1.0 / period, output_dt, points_per_period)
+    driver = TransientDriver(dt, output_dt, duration)
+    buffer = ResultBuffer(modal.node_tags, len(times), dofs=(direction,))
+    driver.run(on_output=lambda t: buffer.record())
+    transient = buffer.results().values[:, :, 0]
+    transient_time = time.perf_counter() - start
+
+    modal_values = response.values[:len(transient), :, direction - 1]
+    errors = modal.truncation_errors(times[:len(transient)], period, transient, direction, direction=direction,
+                                     accel=accel, zeta=zeta)
+    return {
+        'modes': num_modes,
+        'periods': modal.periods,
+        'modal_time': modal_time,
+        'transient_time': transient_time,
+        'peak_modal': float(np.abs(modal_values).max()),
+        'peak_transient': float(np.abs(transient).max()),
+        'error': float(np.abs(modal_values - transient).max() / (np.abs(transient).max() or 1.0)),
+        'truncation_errors': errors,
+        'cumulative_mass': np.cumsum(modal.effective_mass_ratios(direction))
+    }
+
+
+def format_comparison(report):
+    lines = [f"Modal superposition ({report['modes']} modes): {report['modal_time']:.3f}s, "
+             f"transient: {report['transient_time']:.3f}s "
+             f"({report['transient_time'] / report['modal_time']:.0f}x)",
+             f"Peak displacement modal {report['peak_modal']:.6f} m, transient {report['peak_transient']:.6f} m, "
+             f"max error {100 * report['error']:.2f}%",
+             "Modes  Period (s)  Mass (%)  Error vs transient (%)"]
+    for mode, (period, mass, error) in enumerate(zip(report['periods'], report['cumulative_mass'],
+                                                     report['truncation_errors']), start=1):
+        lines.append(f"{mode:5d}  {period:10.4f}  {100 * mass:8.2f}  {100 * error:10.2f}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    from frame_sweep import BASE_VARIANTS, build_variant
+
+    parser = argparse.ArgumentParser(description="Compare modal superposition with the transient analysis")
+    parser.add_argument('--model', choices=sorted(BASE_VARIANTS), default='3d', help="Base frame (default: 3d)")
+    parser.add_argument('--stories', type=int, default=None, help="Override the number of stories")
+    parser.add_argument('--modes', type=int, default=12, help="Number of modes (default: 12)")
+    parser.add_argument('--points-per-period', type=int, default=20,
+                        help="Transient steps per shortest period (default: 20)")
+    args = parser.parse_args(argv)
+
+    variant = dict(BASE_VARIANTS[args.model])
+    if args.stories:
+        variant['stories'] = args.stories
+    report = compare_modal_transient(lambda: build_variant(variant), args.modes, variant['load_period'],
+                                     variant['duration'], variant['output_dt'], damping=variant['damping'],
+                                     points_per_period=args.points_per_period)
+    print(format_comparison(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+from functools import cached_property
+
+import numpy as np
+
+
+def group_starts(groups, count):
+    """Order that sorts nodes/members by group and the start of every group in it"""
+    order = np.argsort(groups, kind='stable')
+    return order, np.searchsorted(groups[order], np.arange(count))
+
+
+class FrameResponse:
+    """Derived response quantities of a frame from its (steps, nodes, dofs) results
+
+    nodes: (N, 2) or (N, 3) coordinates with the vertical axis last, in the
+        same order as the columns of results.values
+    members: (M, 2) node indices; members that connect two levels are
+        treated as columns for the drift calculation
+    results: NodeResults of displacements
+
+    Every quantity is computed once with whole-array operations and cached,
+    so plots, exports and reports can share it.
+    """
+
+    def __init__(self, nodes, members, results, tolerance=1e-3):
+        self.nodes = np.asarray(nodes, dtype=np.float64)
+        self.members = np.asarray(members, dtype=np.int64)
+        self.results = results
+        self.values = np.asarray(results.values)
+        self.times = results.times
+        self.dofs = results.dofs
+        self.tolerance = tolerance
+        if self.values.shape[1] != len(self.nodes):
+            raise ValueError(f"Results hold {self.values.shape[1]} nodes, the frame has {len(self.nodes)}")
+
+    @cached_property
+    def horizontal(self):
+        """Positions in dofs of the horizontal translations"""
+        ndm = self.nodes.shape[1]
+        return [i for i, dof in enumerate(self.dofs) if dof < ndm]
+
+    @cached_property
+    def node_levels(self):
+        """Level index of every node (levels sorted by elevation)"""
+        keys = np.round(self.nodes[:, -1] / self.tolerance).astype(np.int64)
+        return np.unique(keys, return_inverse=True)[1].ravel()
+
+    @cached_property
+    def elevations(self):
+        """Mean elevation of every level"""
+        counts = np.bincount(self.node_levels)
+        return np.bincount(self.node_levels, weights=self.nodes[:, -1]) / counts
+
+    @cached_property
+    def _level_groups(self):
+        return group_starts(self.node_levels, len(self.elevations))
+
+    @cached_property
+    def level_displacement(self):
+        """(steps, levels, dofs) mean displacement of the nodes of every level"""
+        order, starts = self._level_groups
+        counts = np.bincount(self.node_levels)
+        return np.add.reduceat(self.values[:, order], starts, axis=1) / counts[None, :, None]
+
+    @cached_property
+    def columns(self):
+        """(bottom node, top node, story) of every member between two levels"""
+        levels = self.node_levels[self.members]
+        vertical = levels[:, 0] != levels[:, 1]
+        ends = self.members[vertical]
+        flip = levels[vertical, 0] > levels[vertical, 1]
+        ends = np.where(flip[:, None], ends[:, ::-1], ends)
+        return ends[:, 0], ends[:, 1], self.node_levels[ends[:, 0]]
+
+    @cached_property
+    def column_drift(self):
+        """(steps, columns, horizontal dofs) interstory drift ratio of every column"""
+        bottom, top, _ = self.columns
+        height = self.nodes[top, -1] - self.nodes[bottom, -1]
+        relative = self.values[:, top][..., self.horizontal] - self.values[:, bottom][..., self.horizontal]
+        return relative / height[None, :, None]
+
+    @cached_property
+    def _story_groups(self):
+        return group_starts(self.columns[2], len(self.elevations) - 1)
+
+    @cached_property
+    def story_drift(self):
+        """(steps, stories, horizontal dofs) mean drift ratio of the columns of every story
+
+        Stories without columns (e.g. below a transfer level) are zero.
+        """
+        order, starts = self._story_groups
+        stories = len(self.elevations) - 1
+        counts = np.bincount(self.columns[2], minlength=stories)
+        drift = np.zeros((len(self.values), stories, len(self.horizontal)))
+        present = counts > 0
+        if present.any():
+            sums = np.add.reduceat(self.column_drift[:, order], starts[present], axis=1)
+            drift[:, present] = sums / counts[present][None, :, None]
+        return drift
+
+    @cached_property
+    def peak_story_drift(self):
+        """(stories, horizontal dofs) largest drift ratio of any column in every story"""
+        order, starts = self._story_groups
+        stories = len(self.elevations) - 1
+        present = np.bincount(self.columns[2], minlength=stories) > 0
+        peak = np.zeros((stories, len(self.horizontal)))
+        if present.any():
+            column_peak = np.abs(self.column_drift).max(axis=0)
+            peak[present] = np.maximum.reduceat(column_peak[order], starts[present], axis=0)
+        return peak
+
+    @cached_property
+    def peak(self):
+        """(nodes, dofs) peak absolute response"""
+        return np.abs(self.values).max(axis=0)
+
+    @cached_property
+    def rms(self):
+        """(nodes, dofs) root mean square response"""
+        return np.sqrt(np.mean(np.square(self.values), axis=0))
+
+    @cached_property
+    def level_peak(self):
+        """(levels, dofs) peak absolute response of any node of every level"""
+        order, starts = self._level_groups
+        return np.maximum.reduceat(self.peak[order], starts, axis=0)
+
+    @cached_property
+    def level_rms(self):
+        """(levels, dofs) root mean square of the mean level response"""
+        return np.sqrt(np.mean(np.square(self.level_displacement), axis=0))
+
+    @cached_property
+    def residual(self):
+        """(nodes, dofs) response at the last step"""
+        return self.values[-1]
+
+    @cached_property
+    def residual_drift(self):
+        """(stories, horizontal dofs) story drift ratio at the last step"""
+        return self.story_drift[-1]
+
+    @cached_property
+    def accelerations(self):
+        """(steps, nodes, dofs) relative accelerations by central differences in time"""
+        velocity = np.gradient(self.values, self.times, axis=0)
+        return np.gradient(velocity, self.times, axis=0)
+
+    def base_shear(self, masses, ground_accel=None):
+        """(steps, horizontal dofs) base shear estimated from the inertia forces
+
+        masses: (N,) or (N, ndf) nodal masses; ground_accel: (steps,) ground
+        acceleration of a UniformExcitation in the first horizontal dof.
+        Accurate when the output interval resolves the response.
+        """
+        masses = np.asarray(masses, dtype=np.float64)
+        if masses.ndim == 1:
+            weights = np.repeat(masses[:, None], len(self.horizontal), axis=1)
+        else:
+            weights = masses[:, [self.dofs[i] - 1 for i in self.horizontal]]
+        accel = self.accelerations[..., self.horizontal]
+        if ground_accel is not None:
+            accel = accel.copy()
+            accel[..., 0] += np.asarray(ground_accel)[:, None]
+        return -np.einsum('snd,nd->sd', accel, weights)
+
+    def summary(self):
+        """Scalar peaks for reports and sweep tables"""
+        drift = self.peak_story_drift
+        story = int(np.unravel_index(np.argmax(drift), drift.shape)[0]) + 1 if drift.size else 0
+        return {
+            'peak_drift': float(drift.max(initial=0.0)),
+            'peak_drift_story': story,
+            'peak_roof': float(self.level_peak[-1, self.horizontal].max(initial=0.0)),
+            'rms_roof': float(self.level_rms[-1, self.horizontal].max(initial=0.0)),
+            'residual_drift': float(np.abs(self.residual_drift).max(initial=0.0))
+        }
@@ -0,0 +1,261 @@
+import os
+
+import numpy as np
+import openseespy.opensees as ops
+
+
+class NodeResults:
+    """Nodal results as a (steps, nodes, dofs) array with node and time lookup
+
+    values may be a memory-mapped array, so results larger than memory are
+    only read for the slices that are used.
+    """
+
+    def __init__(self, values, times, node_tags, dofs):
+        self.values = values
+        self.times = np.asarray(times)
+        self.node_tags = np.asarray(node_tags)
+        self.dofs = tuple(dofs)
+        self._order = np.argsort(self.node_tags)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def __len__(self):
+        return len(self.values)
+
+    def node_index(self, tags):
+        """Column index of one node tag or an array of them"""
+        tags = np.asarray(tags)
+        position = np.searchsorted(self.node_tags, tags, sorter=self._order)
+        index = self._order[np.minimum(position, len(self._order) - 1)]
+        if np.any(self.node_tags[index] != tags):
+            raise KeyError(f"Nodes not recorded: {np.setdiff1d(tags, self.node_tags).tolist()}")
+        return index
+
+    def node(self, tag, dof=None):
+        """(steps, dofs) history of one node, or (steps,) for a single dof"""
+        history = self.values[:, self.node_index(tag)]
+        return history if dof is None else history[:, self.dofs.index(dof)]
+
+    def nodes(self, tags, dof=None):
+        """(steps, len(tags), dofs) histories of several nodes"""
+        history = self.values[:, self.node_index(tags)]
+        return history if dof is None else history[..., self.dofs.index(dof)]
+
+    def step_at(self, time):
+        """Index of the recorded step closest to time"""
+        return int(np.argmin(np.abs(self.times - time)))
+
+    def at_time(self, time):
+        """(nodes, dofs) snapshot at the recorded step closest to time"""
+        return self.values[self.step_at(time)]
+
+    def sample(self, times):
+        """NodeResults at the recorded steps closest to the given times
+
+        Used to thin out results recorded at every analysis step to the
+        output times; only the selected rows are read.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        position = np.clip(np.searchsorted(self.times, times), 1, max(len(self.times) - 1, 1))
+        before = np.abs(self.times[position - 1] - times) <= np.abs(self.times[position] - times)
+        rows = np.where(before, position - 1, position)
+        return NodeResults(self.values[rows], self.times[rows], self.node_tags, self.dofs)
+
+
+def read_binary_recorder(path, columns):
+    """Memory-map the output of a '-binary' Node recorder written with '-time'
+
+    Every row holds the time and then `columns` doubles; OpenSees ends each
+    row with a newline byte, which is skipped through a structured dtype.
+    Returns (times, values (steps, columns)) without copying.
+    """
+    size = os.path.getsize(path)
+    row_bytes = (columns + 1) * 8
+    for padding in (1, 0):
+        if size % (row_bytes + padding) == 0:
+            break
+    else:
+        raise ValueError(f"{path} does not hold rows of {columns} values")
+
+    fields = [('row', '<f8', (columns + 1,))]
+    if padding:
+        fields.append(('end', 'u1'))
+    if size == 0:
+        return np.zeros(0), np.zeros((0, columns))
+    rows = np.memmap(path, dtype=np.dtype(fields), mode='r')['row']
+    return rows[:, 0], rows[:, 1:]
+
+
+class RecorderResults:
+    """Node recorder writing binary output, read back as NodeResults
+
+    OpenSees writes the responses from C++ after every step, so the analysis
+    can run many steps in a single analyze() call with no Python work per
+    step or per node.
+    """
+
+    def __init__(self, path, node_tags, dofs=(1, 2, 3), response='disp'):
+        self.path = path
+        self.node_tags = np.asarray(node_tags, dtype=np.int64)
+        self.dofs = tuple(dofs)
+        self.response = response
+        self.tag = None
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.tag = ops.recorder('Node', '-binary', self.path, '-time', '-node', *self.node_tags.tolist(),
+                                '-dof', *self.dofs, self.response)
+        return self
+
+    def stop(self):
+        """Close the recorder so its output is flushed to disk"""
+        if self.tag is not None:
+            ops.remove('recorder', self.tag)
+            self.tag = None
+
+    def results(self):
+        self.stop()
+        times, values = read_binary_recorder(self.path, len(self.node_tags) * len(self.dofs))
+        values = values.reshape(len(values), len(self.node_tags), len(self.dofs))
+        return NodeResults(values, times, self.node_tags, self.dofs)
+
+
+class ResultBuffer:
+    """Preallocated (steps, nodes, dofs) array filled after every step
+
+    For cases where recorders cannot be used. One nodeDisp/nodeResponse call
+    per node fills a whole row at once; with a path the array is a memmap
+    on disk.
+    """
+
+    def __init__(self, node_tags, steps, dofs=(1, 2, 3), path=None, response='disp'):
+        self.node_tags = np.asarray(node_tags, dtype=np.int64)
+        self.dofs = tuple(dofs)
+        self.response = response
+        shape = (steps, len(self.node_tags), len(self.dofs))
+        if path is None:
+            self.values = np.zeros(shape)
+        else:
+            self.values = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=shape)
+        self.times = np.zeros(steps)
+        self.count = 0
+        self._tags = self.node_tags.tolist()
+        self._columns = [d - 1 for d in self.dofs]
+
+    def record(self):
+        """Store the current state as the next step"""
+        read = ops.nodeDisp if self.response == 'disp' else ops.nodeVel if self.response == 'vel' \
+            else ops.nodeAccel
+        self.values[self.count] = np.array([read(tag) for tag in self._tags])[:, self._columns]
+        self.times[self.count] = ops.getTime()
+        self.count += 1
+
+    def results(self):
+        return NodeResults(self.values[:self.count], self.times[:self.count], self.node_tags, self.dofs)
+
+
+class OnlineReductions:
+    """Running reductions of nodal responses in O(nodes) memory
+
+    Instead of storing every step, record() (e.g. as the on_output callback
+    of TransientDriver) folds the current state into running maximum,
+    minimum, sum of squares and peak absolute value with its time. Optional
+    drift pairs (bottom tags, top tags, heights) keep drift ratio envelopes
+    of the horizontal dofs, and full histories are kept only for the nodes
+    in keep (e.g. the roof node).
+    """
+
+    def __init__(self, node_tags, dofs=(1, 2, 3), drift_pairs=None, keep=(), response='disp'):
+        self.node_tags = np.asarray(node_tags, dtype=np.int64)
+        self.dofs = tuple(dofs)
+        self.response = response
+        shape = (len(self.node_tags), len(self.dofs))
+        self.maximum = np.full(shape, -np.inf)
+        self.minimum = np.full(shape, np.inf)
+        self.sum_squares = np.zeros(shape)
+        self.peak = np.zeros(shape)
+        self.peak_time = np.zeros(shape)
+        self.count = 0
+        self._tags = self.node_tags.tolist()
+        self._columns = [d - 1 for d in self.dofs]
+        self._lookup = NodeResults(np.zeros((0,) + shape), [], self.node_tags, self.dofs)
+
+        self.drift_pairs = None
+        if drift_pairs is not None:
+            bottom, top, heights = drift_pairs
+            self.drift_pairs = (self._lookup.node_index(bottom), self._lookup.node_index(top),
+                                np.broadcast_to(np.asarray(heights, dtype=np.float64), np.shape(bottom)))
+            self.drift_peak = np.zeros((len(bottom), len(self.dofs)))
+            self.drift_peak_time = np.zeros((len(bottom), len(self.dofs)))
+
+        self.keep = np.asarray(keep, dtype=np.int64)
+        self._keep_index = self._lookup.node_index(self.keep) if len(self.keep) else np.zeros(0, dtype=np.int64)
+        self._history = []
+        self._times = []
+
+    def update(self, values, time):
+        """Fold one (nodes, dofs) state at time into the reductions"""
+        np.maximum(self.maximum, values, out=self.maximum)
+        np.minimum(self.minimum, values, out=self.minimum)
+        self.sum_squares += values * values
+        magnitude = np.abs(values)
+        larger = magnitude > self.peak
+        self.peak[larger] = magnitude[larger]
+        self.peak_time[larger] = time
+        self.count += 1
+
+        if self.drift_pairs is not None:
+            bottom, top, heights = self.drift_pairs
+            drift = np.abs(values[top] - values[bottom]) / heights[:, None]
+            larger = drift > self.drift_peak
+            self.drift_peak[larger] = drift[larger]
+            self.drift_peak_time[larger] = time
+
+        if len(self.keep):
+            self._history.append(values[self._keep_index])
+            self._times.append(time)
+
+    def record(self, time=None):
+        """Read the current state from OpenSees and fold it in"""
+        read = ops.nodeDisp if self.response == 'disp' else ops.nodeVel if self.response == 'vel' \
+            else ops.nodeAccel
+        values = np.array([read(tag) for tag in self._tags])[:, self._columns]
+        self.update(values, ops.getTime() if time is None else time)
+
+    @property
+    def rms(self):
+        return np.sqrt(self.sum_squares / max(self.count, 1))
+
+    def history(self):
+        """NodeResults of the nodes in keep"""
+        values = np.array(self._history).reshape(len(self._history), len(self.keep), len(self.dofs))
+        return NodeResults(values, self._times, self.keep, self.dofs)
+
+    @property
+    def nbytes(self):
+        arrays = [self.maximum, self.minimum, self.sum_squares, self.peak, self.peak_time]
+        if self.drift_pairs is not None:
+            arrays += [self.drift_peak, self.drift_peak_time]
+        return sum(array.nbytes for array in arrays) + sum(values.nbytes for values in self._history)
+
+
+def record_transient(num_steps, dt, node_tags, path, dofs=(1, 2, 3), response='disp', chunk=None):
+    """Run num_steps transient steps with a binary recorder attached
+
+    The steps run in one analyze() call, or in chunks of `chunk` steps (to
+    report progress); stops at the first failed chunk. Returns (ok,
+    NodeResults) where ok is the return code of the last analyze() call.
+    """
+    recorder = RecorderResults(path, node_tags, dofs, response).start()
+    chunk = chunk or num_steps
+    ok = 0
+    done = 0
+    while done < num_steps and ok == 0:
+        steps = min(chunk, num_steps - done)
+        ok = ops.analyze(steps, dt)
+        done += steps
+    return ok, recorder.results()
@@ -0,0 +1,269 @@
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import openseespy.opensees as ops
+
+# Up to this many equations BandGeneral beats UmfPack on unsymmetric models
+SMALL_MODEL_EQUATIONS = 2000
+# Largest banded matrix (bytes) before switching to a sparse solver
+DENSE_STORAGE_LIMIT = 512 * 1024 ** 2
+# Candidates measured by the benchmark: (system, numberer)
+BENCHMARK_CHOICES = (('BandGeneral', 'RCM'), ('BandSPD', 'RCM'), ('ProfileSPD', 'RCM'),
+                     ('SparseSYM', 'RCM'), ('UmfPack', 'RCM'), ('BandGeneral', 'Plain'))
+
+
+def node_adjacency(num_nodes, members):
+    """CSR adjacency (indptr, indices) of the node graph"""
+    ends = np.concatenate([members, members[:, ::-1]])
+    ends = ends[np.lexsort((ends[:, 1], ends[:, 0]))]
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(ends[:, 0], minlength=num_nodes))])
+    return indptr, ends[:, 1]
+
+
+def rcm_order(num_nodes, members):
+    """Reverse Cuthill-McKee node order (new position -> node index)
+
+    Every connected component starts from a low-degree node at the end of a
+    breadth-first search, which is close to a peripheral node.
+    """
+    indptr, indices = node_adjacency(num_nodes, members)
+    degree = np.diff(indptr)
+    neighbors = [indices[indptr[n]:indptr[n + 1]][np.argsort(degree[indices[indptr[n]:indptr[n + 1]]],
+                                                             kind='stable')].tolist()
+                 for n in range(num_nodes)]
+
+    def search(start, visited):
+        order = [start]
+        visited[start] = True
+        queue = deque([start])
+        while queue:
+            for neighbor in neighbors[queue.popleft()]:
+                if not visited[neighbor]:
+                    visited[neighbor] = True
+                    order.append(neighbor)
+                    queue.append(neighbor)
+        return order
+
+    placed = np.zeros(num_nodes, dtype=bool)
+    order = []
+    for seed in np.argsort(degree, kind='stable').tolist():
+        if placed[seed]:
+            continue
+        probe = search(seed, placed.copy())
+        order.extend(search(probe[-1], placed))
+    return np.array(order[::-1], dtype=np.int64)
+
+
+def matrix_statistics(num_nodes, members, ndf, supports=None, order=None):
+    """Size, bandwidth, profile and storage of the stiffness matrix
+
+    Fully fixed support nodes carry no equations. order is the node
+    numbering (RCM when not given); bandwidths are in equations.
+    """
+    members = np.asarray(members, dtype=np.int64)
+    free = np.ones(num_nodes, dtype=bool) if supports is None else ~np.asarray(supports, dtype=bool)
+    order = rcm_order(num_nodes, members) if order is None else np.asarray(order)
+    order = order[free[order]]
+    rank = np.full(num_nodes, -1, dtype=np.int64)
+    rank[order] = np.arange(len(order))
+
+    coupled = members[free[members].all(axis=1)]
+    first, second = rank[coupled[:, 0]], rank[coupled[:, 1]]
+    nodes = len(order)
+    half_band = int(np.abs(first - second).max(initial=0))
+    lowest = np.arange(nodes)
+    np.minimum.at(lowest, np.maximum(first, second), np.minimum(first, second))
+
+    equations = nodes * ndf
+    bandwidth = (half_band + 1) * ndf - 1
+    profile = int(ndf * ndf * (np.arange(nodes) - lowest).sum() + nodes * ndf * (ndf + 1) // 2)
+    nonzeros = nodes * ndf * ndf + 2 * len(coupled) * ndf * ndf
+    return {
+        'equations': equations,
+        'half_bandwidth': bandwidth,
+        'profile': profile,
+        'nonzeros': nonzeros,
+        'band_bytes': 8 * equations * (bandwidth + 1),
+        'band_general_bytes': 8 * equations * (3 * bandwidth + 1),
+        'profile_bytes': 8 * profile,
+        'sparse_bytes': 12 * nonzeros
+    }
+
+
+def select_solver(statistics, symmetric=True, mp_constraints=False):
+    """System, numberer and constraint handler for a model
+
+    From the benchmark below: symmetric frames solve fastest with BandSPD
+    (half the storage of BandGeneral) as long as the band fits in
+    DENSE_STORAGE_LIMIT, beyond that SparseSYM needs the least memory.
+    ProfileSPD is never faster on frames. Unsymmetric tangents (e.g.
+    Corotational) use BandGeneral on small models and UmfPack otherwise.
+    Transformation keeps the matrix positive definite with rigid diaphragm
+    or equalDOF constraints.
+    """
+    constraints = 'Transformation' if mp_constraints else 'Plain'
+
+    if not symmetric:
+        if statistics['equations'] <= SMALL_MODEL_EQUATIONS:
+            system, reason = 'BandGeneral', 'unsymmetric, small model'
+        else:
+            system, reason = 'UmfPack', 'unsymmetric'
+    elif statistics['band_bytes'] <= DENSE_STORAGE_LIMIT:
+        system, reason = 'BandSPD', 'band fits in memory'
+    else:
+        system, reason = 'SparseSYM', 'band too large'
+    return {'system': system, 'numberer': 'RCM', 'constraints': constraints, 'reason': reason}
+
+
+def configure_solver(nodes, members, ndf, supports=None, symmetric=True, mp_constraints=False, verbose=True,
+                     statistics=None):
+    """Pick and set the system, numberer and constraints of the current model
+
+    statistics: matrix_statistics() of the model when already known (e.g.
+    from the model cache), which skips the node ordering.
+    """
+    if statistics is None:
+        statistics = matrix_statistics(len(nodes), members, ndf, supports)
+    choice = select_solver(statistics, symmetric, mp_constraints)
+    # The numberers do not see the coupling of rigid diaphragms: RCM puts a
+    # master far from its floor and the band covers the whole model. Nodes
+    # stored floor by floor already give the narrowest band.
+    z = np.asarray(nodes, dtype=np.float64)[:, -1]
+    if mp_constraints and np.all(np.diff(z) >= -1e-9):
+        choice['numberer'] = 'Plain'
+        choice['reason'] += ', nodes numbered floor by floor'
+    ops.constraints(choice['constraints'])
+    ops.numberer(choice['numberer'])
+    ops.system(choice['system'])
+    if verbose:
+        print(f"Solver: {choice['system']} / {choice['numberer']} / {choice['constraints']} "
+              f"({choice['reason']}; {statistics['equations']} equations, "
+              f"half bandwidth {statistics['half_bandwidth']})")
+    return choice
+
+
+def peak_memory_mb():
+    """Peak resident size of this process in MB, nan where unknown (Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def benchmark_case(case, system, numberer):
+    """Build one model, solve one static load step and measure it (runs in a fresh process)"""
+    from frame_builder import FrameModelBuilder
+    from frame_graph import json_to_frame
+    from frame_sweep import BASE_VARIANTS, build_variant
+
+    if case.get('geometry'):
+        with open(case['geometry'], 'r') as f:
+            frame = json_to_frame(json.load(f))
+        section = {'A': 0.09, 'E': 32000000.0, 'G': 32000000.0 / 2.4, 'J': 1.0, 'Iy': 0.4, 'Iz': 0.4}
+        FrameModelBuilder(frame.nodes, frame.members, section, supports=frame.supports).build()
+        ndf = 6
+    else:
+        variant = dict(BASE_VARIANTS[case['model']], **case)
+        frame = build_variant(variant)
+        ndf = 6 if variant['model'] == '3d' else 3
+
+    # Unit lateral load on every free node
+    ops.timeSeries('Linear', 1)
+    ops.pattern('Plain', 1, 1)
+    load = [1.0] + [0.0] * (ndf - 1)
+    for tag in frame.node_tags[~frame.supports].tolist():
+        ops.load(tag, *load)
+
+    # The first step numbers the equations, assembles, factorizes and solves
+    memory = peak_memory_mb()
+    start = time.perf_counter()
+    ops.constraints('Plain')
+    ops.numberer(numberer)
+    ops.system(system)
+    ops.integrator('LoadControl', 1.0)
+    ops.algorithm('Linear')
+    ops.analysis('Static')
+    ok = ops.analyze(1)
+    solve = time.perf_counter() - start
+    memory = peak_memory_mb() - memory
+    ops.wipe()
+
+    return {'case': case.get('name', ''), 'system': system, 'numberer': numberer, 'ok': ok, 'solve': solve,
+            'memory_mb': memory}
+
+
+def run_benchmark(cases, choices=BENCHMARK_CHOICES):
+    """Benchmark every choice on every case, each run in its own process
+
+    Peak memory is the growth of the worker's maximum resident size while
+    numbering, assembling and factorizing, so every run gets a fresh
+    process and runs one after another to keep the timings clean.
+    """
+    from frame_graph import regular_frame, json_to_frame
+    from frame_sweep import BASE_VARIANTS
+
+    rows = []
+    for case in cases:
+        if case.get('geometry'):
+            with open(case['geometry'], 'r') as f:
+                frame = json_to_frame(json.load(f))
+            ndf = 6
+        else:
+            variant = dict(BASE_VARIANTS[case['model']], **case)
+            frame = regular_frame(variant['bays_x'], variant['bays_y'], variant['stories'], variant['bay_width'],
+                                  variant['bay_width'], variant['story_height'])
+            ndf = 6 if variant['model'] == '3d' else 3
+        statistics = matrix_statistics(len(frame.nodes), frame.members, ndf, frame.supports)
+        selected = select_solver(statistics)
+        print(f"\n{case['name']}: {statistics['equations']} equations, half bandwidth "
+              f"{statistics['half_bandwidth']}, band {statistics['band_bytes'] / 1024 ** 2:.1f} MB, "
+              f"profile {statistics['profile_bytes'] / 1024 ** 2:.1f} MB -> {selected['system']} "
+              f"({selected['reason']})")
+        print(f"  {'system':12s} {'numberer':8s} {'solve (s)':>10s} {'memory (MB)':>12s}")
+        for system, numberer in choices:
+            try:
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    row = pool.submit(benchmark_case, case, system, numberer).result()
+            except Exception as e:
+                # Some solvers abort the whole process on singular matrices
+                row = {'case': case['name'], 'system': system, 'numberer': numberer, 'ok': None,
+                       'solve': float('nan'), 'memory_mb': float('nan'), 'error': str(e)}
+            row['selected'] = system == selected['system'] and numberer == selected['numberer']
+            rows.append(row)
+            marker = '*' if row['selected'] else ' '
+            status = '' if row['ok'] == 0 else '  crashed' if row['ok'] is None else '  failed'
+            print(f" {marker}{system:12s} {numberer:8s} {row['solve']:10.3f} {row['memory_mb']:12.1f}{status}")
+    return rows
+
+
+# Model sizes generated in this folder: the 2D tower and 3D frames up to a
+# large procedural building
+BENCHMARK_CASES = (
+    {'name': 'tower 2D 163 stories', 'model': '2d'},
+    {'name': 'frame 15x4x3', 'model': '3d'},
+    {'name': 'frame 40x8x6', 'model': '3d', 'stories': 40, 'bays_x': 8, 'bays_y': 6},
+    {'name': 'frame 80x12x10', 'model': '3d', 'stories': 80, 'bays_x': 12, 'bays_y': 10},
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark OpenSees systems of equations on generated frames")
+    parser.add_argument('geometry', nargs='*', help="Extra building geometry JSON files to benchmark")
+    parser.add_argument('--quick', action='store_true', help="Skip the largest frame")
+    args = parser.parse_args(argv)
+
+    cases = list(BENCHMARK_CASES[:-1] if args.quick else BENCHMARK_CASES)
+    cases += [{'name': path, 'geometry': path} for path in args.geometry]
+    run_benchmark(cases)
+
+
+if __name__ == "__main__":
+    main()
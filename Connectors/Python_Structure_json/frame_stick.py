@@ -0,0 +1,332 @@
+import argparse
+import json
+import time
+import warnings
+
+import numpy as np
+
+from frame_graph import split_members
+from frame_modal import harmonic_modal_response
+
+# Sway directions of the stick: global x and y
+DIRECTIONS = ('x', 'y')
+# Moment of inertia of the columns for sway in x and y with the builder's
+# member axes (vertical members use global X as vecxz), and of the beams
+# for bending in their vertical plane
+COLUMN_INERTIA = ('Iy', 'Iz')
+BEAM_INERTIA = 'Iy'
+
+
+def column_levels(nodes, members, tolerance=1e-3):
+    """(level of every node, level elevations, column mask) from the column ends
+
+    Members between two elevations are columns and the elevations of their
+    ends are the levels, sorted upwards; every other node belongs to the
+    nearest level. Columns passing floors without a node there must be
+    split first (see StickModel.from_frame).
+    """
+    nodes = np.asarray(nodes)
+    keys = np.round(nodes[:, 2] / tolerance).astype(np.int64)
+    columns = keys[members[:, 0]] != keys[members[:, 1]]
+    elevations = np.unique(keys[members[columns]]) * tolerance
+    levels = np.searchsorted(0.5 * (elevations[:-1] + elevations[1:]), nodes[:, 2])
+    return levels, elevations, columns
+
+
+def member_properties(sections, section_ids, count):
+    """(M,) arrays of every section key for M members"""
+    sections = [sections] if isinstance(sections, dict) else list(sections)
+    section_ids = np.zeros(count, dtype=np.int64) if section_ids is None else np.asarray(section_ids)
+    return {key: np.array([section[key] for section in sections], dtype=np.float64)[section_ids]
+            for key in sections[0]}
+
+
+def story_properties(nodes, members, sections, section_ids=None, supports=None, tolerance=1e-3):
+    """Lateral shear and flexural stiffness of every story of a frame
+
+    Shear stiffness is the sum of the Muto D-values of the columns: the
+    fixed-fixed column stiffness 12 EI / h^3 reduced for the flexibility of
+    the beams framing into both ends (on fixed supports, into the top end
+    only). Flexural stiffness is the overall bending stiffness of the
+    story from the axial stiffness of its columns, sum(E A d^2) about
+    their centroid, which governs slender towers. Members between two
+    elevations are columns (one spanning several stories counts in its
+    top story), members within a level are beams. Returns a dict of
+    (stories,) and (stories, 2) arrays.
+    """
+    nodes = np.asarray(nodes, dtype=np.float64)
+    members = np.asarray(members, dtype=np.int64)
+    supports = np.zeros(len(nodes), dtype=bool) if supports is None else np.asarray(supports, dtype=bool)
+    props = member_properties(sections, section_ids, len(members))
+    levels, elevations, vertical = column_levels(nodes, members, tolerance)
+    stories = len(elevations) - 1
+
+    ends = levels[members]
+    vectors = nodes[members[:, 1]] - nodes[members[:, 0]]
+    lengths = np.linalg.norm(vectors, axis=1)
+
+    # Beam stiffness E I / L summed at every node, per sway direction
+    beams = ~vertical & (ends[:, 0] == ends[:, 1])
+    along = np.argmax(np.abs(vectors[:, :2]), axis=1)
+    joint = np.zeros((len(nodes), 2))
+    for direction in range(2):
+        selected = beams & (along == direction)
+        stiffness = props['E'][selected] * props[BEAM_INERTIA][selected] / lengths[selected]
+        for end in range(2):
+            joint[:, direction] += np.bincount(members[selected, end], weights=stiffness, minlength=len(nodes))
+
+    # Columns oriented bottom -> top
+    columns = np.flatnonzero(vertical)
+    flip = ends[columns, 0] > ends[columns, 1]
+    bottom = np.where(flip, members[columns, 1], members[columns, 0])
+    top = np.where(flip, members[columns, 0], members[columns, 1])
+    story = levels[top] - 1
+    height = nodes[top, 2] - nodes[bottom, 2]
+    fixed = supports[bottom]
+
+    shear = np.zeros((stories, 2))
+    flexural = np.zeros((stories, 2))
+    axial = props['E'][columns] * props['A'][columns]
+    count = np.maximum(np.bincount(story, weights=axial, minlength=stories), 1e-300)
+    for direction in range(2):
+        ei = props['E'][columns] * props[COLUMN_INERTIA[direction]][columns]
+        column = ei / height
+        kbar = np.where(fixed, joint[top, direction] / column,
+                        (joint[top, direction] + joint[bottom, direction]) / (2 * column))
+        a = np.where(fixed, (0.5 + kbar) / (2 + kbar), kbar / (2 + kbar))
+        shear[:, direction] = np.bincount(story, weights=a * 12 * ei / height ** 3, minlength=stories)
+
+        position = 0.5 * (nodes[top, direction] + nodes[bottom, direction])
+        centroid = np.bincount(story, weights=axial * position, minlength=stories) / count
+        flexural[:, direction] = np.bincount(story, weights=axial * (position - centroid[story]) ** 2,
+                                             minlength=stories)
+
+    return {'elevations': elevations, 'heights': np.diff(elevations), 'levels': levels, 'shear': shear,
+            'flexural': flexural}
+
+
+def condensed_stiffness(heights, shear, flexural):
+    """(L, L) lateral stiffness of a fixed-base stick of Timoshenko story elements
+
+    Every story is a beam with bending stiffness flexural and shear
+    stiffness shear (force per unit drift); the rotations are condensed
+    out. Stories with no flexural stiffness act as pure shear springs.
+    """
+    stories = len(heights)
+    h = np.asarray(heights, dtype=np.float64)
+    shear = np.asarray(shear, dtype=np.float64)
+    flexural = np.where(flexural > 0, flexural, 1e6 * shear * h ** 3)
+    phi = 12 * flexural / (shear * h ** 3)
+    scale = flexural / (h ** 3 * (1 + phi))
+    one = np.ones_like(h)
+    element = np.array([[12 * one, 6 * h, -12 * one, 6 * h],
+                        [6 * h, (4 + phi) * h ** 2, -6 * h, (2 - phi) * h ** 2],
+                        [-12 * one, -6 * h, 12 * one, -6 * h],
+                        [6 * h, (2 - phi) * h ** 2, -6 * h, (4 + phi) * h ** 2]]) * scale
+    element = element.transpose(2, 0, 1)
+
+    # dofs (u, theta) of levels 0..L; level 0 is fixed
+    size = 2 * (stories + 1)
+    full = np.zeros((size, size))
+    dofs = 2 * np.arange(stories)[:, None] + np.arange(4)[None, :]
+    np.add.at(full, (dofs[:, :, None], dofs[:, None, :]), element)
+    full = full[2:, 2:]
+    u, theta = np.arange(0, 2 * stories, 2), np.arange(1, 2 * stories, 2)
+    coupling = full[np.ix_(u, theta)]
+    return full[np.ix_(u, u)] - coupling @ np.linalg.solve(full[np.ix_(theta, theta)], coupling.T)
+
+
+class StickModel:
+    """Condensed stick model: one lateral mass and one story element per floor
+
+    elevations: (L + 1,) level elevations, the base first
+    masses: (L, 2) story masses for sway in x and y
+    shear, flexural: (L, 2) story shear and flexural stiffness (see
+        story_properties)
+
+    Modes and responses are computed with NumPy in milliseconds, for
+    previews while the full model runs.
+    """
+
+    def __init__(self, elevations, masses, shear, flexural=None):
+        self.elevations = np.asarray(elevations, dtype=np.float64)
+        self.heights = np.diff(self.elevations)
+        self.masses = np.asarray(masses, dtype=np.float64)
+        self.shear = np.asarray(shear, dtype=np.float64)
+        self.flexural = np.zeros_like(self.shear) if flexural is None else np.asarray(flexural, dtype=np.float64)
+        self._modes = {}
+
+    @classmethod
+    def from_frame(cls, nodes, members, sections, section_ids=None, masses=None, supports=None, tolerance=1e-3,
+                   elevations=None):
+        """Stick of a frame: story stiffness from the members, story masses from the nodes
+
+        masses: (N,) or (N, ndf) nodal masses; the base level is dropped
+        elevations: floor elevations (e.g. frame_graph.floor_elevations of
+            the JSON); members crossing them are split into one column per
+            story, otherwise the levels are the column end elevations only
+        """
+        count = len(nodes)
+        nodal = np.zeros((count, 2)) if masses is None else np.asarray(masses, dtype=np.float64)
+        nodal = np.repeat(nodal[:, None], 2, axis=1) if nodal.ndim == 1 else nodal[:, :2]
+        if elevations is not None:
+            nodes, members, parent = split_members(nodes, members, elevations, tolerance)
+            section_ids = None if section_ids is None else np.asarray(section_ids)[parent]
+            nodal = np.concatenate([nodal, np.zeros((len(nodes) - count, 2))])
+            if supports is not None:
+                supports = np.concatenate([supports, np.zeros(len(nodes) - count, dtype=bool)])
+
+        properties = story_properties(nodes, members, sections, section_ids, supports, tolerance)
+        levels = properties['levels']
+        stories = len(properties['heights'])
+        above = levels > 0
+        story_masses = np.stack([np.bincount(levels[above] - 1, weights=nodal[above, d], minlength=stories)
+                                 for d in range(2)], axis=1)
+        return cls(properties['elevations'], story_masses, properties['shear'], properties['flexural'])
+
+    @classmethod
+    def from_builder(cls, builder, tolerance=1e-3, elevations=None):
+        return cls.from_frame(builder.nodes, builder.members, builder.sections, builder.section_ids,
+                              builder.nodal_masses(), builder.supports, tolerance, elevations)
+
+    def stiffness(self, direction=0):
+        return condensed_stiffness(self.heights, self.shear[:, direction], self.flexural[:, direction])
+
+    def modes(self, direction=0):
+        """(omega (L,), mass-normalized shapes (L, L) with one mode per column)"""
+        if direction not in self._modes:
+            root = 1 / np.sqrt(self.masses[:, direction])
+            eigenvalues, vectors = np.linalg.eigh(root[:, None] * self.stiffness(direction) * root[None, :])
+            self._modes[direction] = (np.sqrt(np.maximum(eigenvalues, 0.0)), root[:, None] * vectors)
+        return self._modes[direction]
+
+    def periods(self, direction=0, num_modes=3):
+        omega = self.modes(direction)[0][:num_modes]
+        with np.errstate(divide='ignore'):
+            return 2 * np.pi / omega
+
+    def sway(self, times, period, direction=0, accel=1.0, zeta=0.0, num_modes=None):
+        """(steps, L) floor displacements relative to the base under a Sine ground motion
+
+        Matches a 'Sine' series of the given period driving a
+        UniformExcitation pattern in the direction (accel is its factor).
+        zeta is one damping ratio or one per mode.
+        """
+        omega, shapes = self.modes(direction)
+        zeta = np.broadcast_to(np.asarray(zeta, dtype=np.float64), omega.shape)
+        num_modes = len(omega) if num_modes is None else num_modes
+        omega, shapes, zeta = omega[:num_modes], shapes[:, :num_modes], zeta[:num_modes]
+        participation = shapes.T @ self.masses[:, direction]
+        q = harmonic_modal_response(omega, zeta, -participation * accel, period, times)
+        return q @ shapes.T
+
+
+def format_stick(stick, num_modes=3, directions=(0, 1), elapsed=None):
+    periods = ', '.join(f"{DIRECTIONS[d]} {np.round(stick.periods(d, num_modes), 4).tolist()}" for d in directions)
+    timing = '' if elapsed is None else f" in {1000 * elapsed:.1f} ms"
+    return f"Stick model: {len(stick.heights)} stories, periods {periods}{timing}"
+
+
+def mode_directions(shapes, masses, nodes):
+    """Direction of every mode of a full model: 0 = x, 1 = y, 2 = vertical, 3 = torsion
+
+    The direction with the largest effective mass fraction, for ground
+    motion in x, y and z and a rotation about the vertical axis through
+    the center of mass.
+    """
+    shapes = np.asarray(shapes)[:, :, :3]
+    masses = np.asarray(masses)[:, :3]
+    nodes = np.asarray(nodes)
+    total = masses[:, :2].sum(axis=0)
+    offsets = nodes[:, :2] - (masses[:, :2] * nodes[:, :2]).sum(axis=0) / np.maximum(total, 1e-300)
+    influence = np.zeros((4,) + nodes.shape)
+    influence[[0, 1, 2], :, [0, 1, 2]] = 1.0
+    influence[3, :, :2] = np.stack([-offsets[:, 1], offsets[:, 0]], axis=1)
+
+    participation = np.einsum('mnd,nd,knd->mk', shapes, masses, influence)
+    modal_mass = np.einsum('mnd,nd->m', shapes ** 2, masses)
+    influence_mass = np.einsum('knd,nd->k', influence ** 2, masses)
+    fraction = participation ** 2 / np.maximum(modal_mass[:, None] * influence_mass[None, :], 1e-300)
+    return np.argmax(fraction, axis=1)
+
+
+def compare_periods(stick, full_periods, full_shapes=None, full_masses=None, nodes=None, num_modes=1,
+                    full_time=None, stick_time=None):
+    """Periods of the stick and the full model for the x and y sway modes
+
+    The full model's modes are sorted into sway, vertical and torsion
+    modes by mode_directions(); without shapes they are all taken as x modes
+    (planar models). Warns when none of them is a sway mode.
+    """
+    full_periods = np.asarray(full_periods, dtype=np.float64)
+    if full_shapes is None:
+        directions = np.zeros(len(full_periods), dtype=np.int64)
+    else:
+        directions = mode_directions(full_shapes, full_masses, nodes)
+
+    rows = []
+    for direction, name in enumerate(DIRECTIONS):
+        full = full_periods[directions == direction][:num_modes]
+        if len(full) == 0:
+            continue
+        stick_periods = stick.periods(direction, len(full))
+        for mode, (stick_period, full_period) in enumerate(zip(stick_periods, full), start=1):
+            rows.append({'direction': name, 'mode': mode, 'stick': float(stick_period), 'full': float(full_period),
+                         'error': float(stick_period / full_period - 1)})
+    if not rows:
+        warnings.warn(f"None of the {len(full_periods)} full model modes is an x or y sway mode; "
+                      f"nothing to compare the stick model with", RuntimeWarning)
+    return {'rows': rows, 'stories': len(stick.heights), 'full_time': full_time, 'stick_time': stick_time}
+
+
+def format_comparison(report):
+    lines = [f"Stick model ({report['stories']} stories) vs full model periods:"]
+    if not report['rows']:
+        lines.append("  no x or y sway mode in the full model")
+    for row in report['rows']:
+        lines.append(f"  {row['direction']} mode {row['mode']}: stick {row['stick']:.4f} s, full {row['full']:.4f} s "
+                     f"({100 * row['error']:+.1f}%)")
+    if report['stick_time'] is not None and report['full_time'] is not None:
+        lines.append(f"  stick {1000 * report['stick_time']:.1f} ms, full {1000 * report['full_time']:.1f} ms")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    from frame_builder import FrameModelBuilder
+    from frame_cache import cached_model
+    from frame_graph import floor_elevations, json_to_frame, regular_frame
+
+    parser = argparse.ArgumentParser(description="Compare the condensed stick model with the full frame")
+    parser.add_argument('geometry', nargs='?', help="Building geometry JSON (default: a regular frame)")
+    parser.add_argument('--stories', type=int, default=15)
+    parser.add_argument('--bays', type=int, nargs=2, default=(4, 3))
+    parser.add_argument('--modes', type=int, default=2, help="Modes to compare per direction")
+    args = parser.parse_args(argv)
+
+    if args.geometry:
+        with open(args.geometry, 'r') as f:
+            data = json.load(f)
+        # Wall edges run the full height: split them at the floors so both
+        # models have one story per floor
+        frame = json_to_frame(data).split_at(floor_elevations(data))
+    else:
+        frame = regular_frame(args.bays[0], args.bays[1], args.stories, 6.0, 6.0, 3.5)
+    section = {'A': 0.09, 'E': 32000000.0, 'G': 32000000.0 / 2.4, 'J': 1.0, 'Iy': 0.4, 'Iz': 0.4}
+    masses = np.zeros((len(frame.nodes), 6))
+    masses[~frame.supports] = [100.0, 100.0, 100.0, 1.0, 1.0, 1.0]
+    builder = FrameModelBuilder(frame.nodes, frame.members, section, supports=frame.supports, masses=masses)
+
+    start = time.perf_counter()
+    stick = StickModel.from_builder(builder)
+    for direction in range(2):
+        stick.modes(direction)
+    stick_time = time.perf_counter() - start
+
+    full = cached_model(builder, 4 * args.modes)
+    report = compare_periods(stick, full['periods'], full['shapes'], full['masses'], builder.nodes, args.modes,
+                             full['time'], stick_time)
+    print(format_comparison(report))
+
+
+if __name__ == "__main__":
+    main()
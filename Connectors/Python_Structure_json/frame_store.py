@@ -0,0 +1,270 @@
+"""
+Chunked, compressed store for frame models and analysis results
+
+Layout of a .m2mr file:
+
+    b'M2MR'                      magic
+    blocks                       zlib streams of byte-shuffled array data
+    footer                       UTF-8 JSON: metadata, arrays and histories
+                                 with the offset and size of every block
+    uint64 (little endian)       length of the footer
+    b'M2MR'                      magic
+
+Static arrays (node coordinates, members, periods, mode shapes) are one
+block each. Time histories are split into blocks of chunk_steps steps by
+node_block nodes, so reading one node or one time window only inflates the
+blocks that hold it. The footer is written last, which lets the writer
+stream chunks to disk while the analysis runs.
+"""
+import argparse
+import hashlib
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from frame_results import NodeResults
+
+MAGIC = b'M2MR'
+VERSION = 1
+EXTENSION = '.m2mr'
+
+
+def model_hash(nodes, members, **properties):
+    """Short hash of the model geometry, connectivity and properties
+
+    Array properties (masses, supports, section ids, ...) are hashed with
+    their dtype and shape, the others as sorted JSON, so equal models give
+    equal hashes however they were built.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(np.round(np.asarray(nodes, dtype=np.float64), 9)).tobytes())
+    digest.update(np.ascontiguousarray(np.asarray(members, dtype=np.int64)).tobytes())
+    plain = {}
+    for key in sorted(properties):
+        value = properties[key]
+        if isinstance(value, np.ndarray):
+            digest.update(f"{key}:{value.dtype.str}:{value.shape}".encode('utf-8'))
+            digest.update(np.ascontiguousarray(value).tobytes())
+        else:
+            plain[key] = value
+    digest.update(json.dumps(plain, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def shuffle(array):
+    """Bytes of array grouped by significance, which compresses far better"""
+    array = np.ascontiguousarray(array)
+    return array.view(np.uint8).reshape(-1, array.itemsize).T.tobytes()
+
+
+def unshuffle(data, dtype, shape):
+    dtype = np.dtype(dtype)
+    raw = np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, -1).T
+    return np.ascontiguousarray(raw).view(dtype).reshape(shape)
+
+
+class ResultWriter:
+    """Write a model, static arrays and chunked time histories to a .m2mr file"""
+
+    def __init__(self, path, nodes, members, metadata=None, chunk_steps=256, node_block=1024, level=6):
+        self.path = path
+        self.handle = open(path, 'wb')
+        self.handle.write(MAGIC)
+        self.level = level
+        self.chunk_steps = chunk_steps
+        self.node_block = node_block
+        self.footer = {'version': VERSION, 'metadata': dict(metadata or {}), 'arrays': {}, 'histories': {}}
+        self.footer['metadata'].setdefault('model_hash', model_hash(nodes, members))
+        self._pending = {}
+        self.add_array('nodes', np.asarray(nodes, dtype=np.float64))
+        self.add_array('members', np.asarray(members, dtype=np.int64))
+
+    def write_block(self, array):
+        data = zlib.compress(shuffle(array), self.level)
+        offset = self.handle.tell()
+        self.handle.write(data)
+        return [offset, len(data)]
+
+    def add_array(self, name, array):
+        array = np.asarray(array)
+        self.footer['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape),
+                                       'block': self.write_block(array)}
+
+    def create_history(self, name, node_tags, dofs, dtype='<f8', **attributes):
+        """Start a (steps, nodes, dofs) time history filled by append()"""
+        self.footer['histories'][name] = {'dtype': np.dtype(dtype).str, 'node_tags': np.asarray(node_tags).tolist(),
+                                          'dofs': list(dofs), 'steps': 0, 'chunk_steps': self.chunk_steps,
+                                          'node_block': self.node_block, 'chunks': [], 'times': None,
+                                          'attributes': attributes}
+        self._pending[name] = ([], [])
+
+    def append(self, name, values, times):
+        """Add steps (steps, nodes, dofs) with their times; full chunks go to disk"""
+        values_list, times_list = self._pending[name]
+        values_list.extend(np.asarray(values)[None] if np.ndim(values) == 2 else np.asarray(values))
+        times_list.extend(np.atleast_1d(times).tolist())
+        while len(values_list) >= self.chunk_steps:
+            self.flush_chunk(name, self.chunk_steps)
+
+    def flush_chunk(self, name, steps):
+        history = self.footer['histories'][name]
+        values_list, times_list = self._pending[name]
+        chunk = np.array(values_list[:steps], dtype=history['dtype'])
+        del values_list[:steps]
+        blocks = []
+        for start in range(0, chunk.shape[1], self.node_block):
+            blocks.append(self.write_block(chunk[:, start:start + self.node_block]))
+        history['chunks'].append({'start': history['steps'], 'steps': len(chunk), 'blocks': blocks})
+        history['steps'] += len(chunk)
+
+    def add_history(self, name, results, **attributes):
+        """Write a whole NodeResults as a history"""
+        self.create_history(name, results.node_tags, results.dofs, **attributes)
+        for start in range(0, len(results), self.chunk_steps):
+            stop = start + self.chunk_steps
+            self.append(name, results.values[start:stop], results.times[start:stop])
+
+    def close(self):
+        for name, (values_list, times_list) in self._pending.items():
+            if values_list:
+                self.flush_chunk(name, len(values_list))
+            times = np.array(times_list, dtype=np.float64)
+            self.footer['histories'][name]['times'] = {'dtype': times.dtype.str, 'shape': list(times.shape),
+                                                       'block': self.write_block(times)}
+        footer = json.dumps(self.footer, separators=(',', ':')).encode('utf-8')
+        self.handle.write(footer)
+        self.handle.write(struct.pack('<Q', len(footer)))
+        self.handle.write(MAGIC)
+        self.handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ResultStore:
+    """Read a .m2mr file; arrays and history slices are inflated on demand"""
+
+    def __init__(self, path):
+        self.path = path
+        self.handle = open(path, 'rb')
+        if self.handle.read(4) != MAGIC:
+            raise ValueError(f"{path} is not a result store")
+        self.handle.seek(-12, os.SEEK_END)
+        length, = struct.unpack('<Q', self.handle.read(8))
+        if self.handle.read(4) != MAGIC:
+            raise ValueError(f"{path} is incomplete (the writer was not closed)")
+        self.handle.seek(-12 - length, os.SEEK_END)
+        self.footer = json.loads(self.handle.read(length).decode('utf-8'))
+        if self.footer['version'] > VERSION:
+            raise ValueError(f"Unsupported result store version {self.footer['version']}")
+
+    @property
+    def metadata(self):
+        return self.footer['metadata']
+
+    @property
+    def arrays(self):
+        return sorted(self.footer['arrays'])
+
+    @property
+    def histories(self):
+        return sorted(self.footer['histories'])
+
+    def read_block(self, block, dtype, shape):
+        offset, size = block
+        self.handle.seek(offset)
+        return unshuffle(zlib.decompress(self.handle.read(size)), dtype, shape)
+
+    def array(self, name):
+        entry = self.footer['arrays'][name]
+        return self.read_block(entry['block'], entry['dtype'], entry['shape'])
+
+    def times(self, name):
+        entry = self.footer['histories'][name]['times']
+        return self.read_block(entry['block'], entry['dtype'], entry['shape'])
+
+    def history(self, name, node_tags=None, start=None, stop=None, dofs=None):
+        """NodeResults of a history, sliced by node tags, time window and dofs
+
+        Only the blocks overlapping the requested steps and nodes are read.
+        """
+        history = self.footer['histories'][name]
+        all_tags = np.array(history['node_tags'], dtype=np.int64)
+        times = self.times(name)
+        first = 0 if start is None else int(np.searchsorted(times, start, side='left'))
+        last = len(times) if stop is None else int(np.searchsorted(times, stop, side='right'))
+
+        lookup = NodeResults(np.zeros((0, len(all_tags), 0)), [], all_tags, ())
+        columns = np.arange(len(all_tags)) if node_tags is None else lookup.node_index(node_tags)
+        dof_index = slice(None) if dofs is None else [history['dofs'].index(d) for d in dofs]
+        width = len(history['dofs']) if dofs is None else len(dofs)
+        values = np.empty((last - first, len(columns), width), dtype=history['dtype'])
+
+        block_of = columns // history['node_block']
+        for chunk in history['chunks']:
+            lo, hi = max(first, chunk['start']), min(last, chunk['start'] + chunk['steps'])
+            if lo >= hi:
+                continue
+            for block in np.unique(block_of).tolist():
+                node_start = block * history['node_block']
+                node_count = min(history['node_block'], len(all_tags) - node_start)
+                data = self.read_block(chunk['blocks'][block], history['dtype'],
+                                       (chunk['steps'], node_count, len(history['dofs'])))
+                wanted = block_of == block
+                rows = data[lo - chunk['start']:hi - chunk['start'], columns[wanted] - node_start]
+                values[lo - first:hi - first, wanted] = rows[..., dof_index]
+
+        tags = all_tags[columns]
+        return NodeResults(values, times[first:last], tags, history['dofs'] if dofs is None else dofs)
+
+    def close(self):
+        self.handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_results(path, frame, histories, metadata=None, arrays=None, **options):
+    """Store a FrameGraph, named NodeResults and extra arrays in one call"""
+    with ResultWriter(path, frame.nodes, frame.members, metadata, **options) as writer:
+        writer.add_array('supports', frame.supports)
+        for name, array in (arrays or {}).items():
+            writer.add_array(name, array)
+        for name, results in histories.items():
+            writer.add_history(name, results)
+    return path
+
+
+def describe(path):
+    """One line per entry of a result store"""
+    with ResultStore(path) as store:
+        lines = [f"{path}: {os.path.getsize(path) / 1024:.1f} KB, metadata {json.dumps(store.metadata)}"]
+        for name in store.arrays:
+            entry = store.footer['arrays'][name]
+            lines.append(f"  array   {name}: {entry['dtype']} {tuple(entry['shape'])}")
+        for name in store.histories:
+            history = store.footer['histories'][name]
+            lines.append(f"  history {name}: {history['steps']} steps x {len(history['node_tags'])} nodes x "
+                         f"dofs {history['dofs']} in {len(history['chunks'])} chunks")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect analysis result stores")
+    parser.add_argument('paths', nargs='+', help="Result store files (" + EXTENSION + ")")
+    args = parser.parse_args(argv)
+    for path in args.paths:
+        print(describe(path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Compact binary sway animation for the three.js web viewer
+
+Layout of a .m2ms file:
+
+    b'M2MS'                      magic
+    uint32 (little endian)       length of the JSON header
+    header                       UTF-8 JSON, see encode_sway()
+    payload                      one zlib stream with the node coordinates,
+                                 the member connectivity, the frame times
+                                 and the displacements in one of the
+                                 encodings below
+
+Encodings of the (frames, nodes, components) displacements:
+
+    float32   as is
+    float16   half precision, about 3 significant digits
+    int16     integers times a scale per component, error below scale / 2
+    modal     a few shapes (modes, nodes, components) and their
+              (frames, modes) time coefficients
+
+The viewer only needs the base geometry once and rebuilds every frame as
+coordinates + displacements, so a sway of a few hundred frames is a few
+hundred KB instead of a multi-MB GIF, and it can be played at the display
+rate by interpolating between frames.
+"""
+import argparse
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b'M2MS'
+VERSION = 1
+EXTENSION = '.m2ms'
+ENCODINGS = ('float32', 'float16', 'int16', 'modal')
+
+
+def modal_reduction(displacements, num_modes, shapes=None):
+    """(shapes, coefficients) that reproduce the displacements with num_modes modes
+
+    Without shapes the modes are the principal components of the response
+    (SVD), which capture the most motion for the number of modes. Given
+    shapes (e.g. mode shapes from an eigen analysis) are fitted by least
+    squares.
+    """
+    frames = len(displacements)
+    flat = displacements.reshape(frames, -1)
+    if shapes is None:
+        u, s, vt = np.linalg.svd(flat, full_matrices=False)
+        num_modes = min(num_modes, len(s))
+        return vt[:num_modes].reshape((num_modes,) + displacements.shape[1:]), u[:, :num_modes] * s[:num_modes]
+    shapes = np.asarray(shapes, dtype=np.float64)[:num_modes]
+    coefficients = np.linalg.lstsq(shapes.reshape(len(shapes), -1).T, flat.T, rcond=None)[0].T
+    return shapes, coefficients
+
+
+def encode_sway(nodes, members, displacements, times, components=None, encoding='int16', num_modes=6,
+                shapes=None, up='z', level=9):
+    """Encode a sway animation into the binary container, returns bytes
+
+    nodes: (N, 3) coordinates; members: (M, 2) node indices
+    displacements: (frames, N, C) moving coordinate axes components
+        (default: the first C axes)
+
+    The header holds the sizes, the encoding and the byte ranges of every
+    block inside the decompressed payload:
+
+        {'format', 'version', 'encoding', 'up', 'nodeCount', 'memberCount',
+         'frameCount', 'components', 'scale', 'peak', 'modeCount',
+         'nodes', 'members', 'times', 'displacements' | 'shapes' + 'coefficients':
+             {'dtype', 'offset', 'size'}}
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown encoding {encoding} (use one of {', '.join(ENCODINGS)})")
+    nodes = np.asarray(nodes, dtype=np.float64)
+    members = np.asarray(members, dtype=np.int64)
+    displacements = np.asarray(displacements, dtype=np.float64)
+    components = list(range(displacements.shape[2])) if components is None else list(components)
+    peak = np.abs(displacements).max(axis=(0, 1)) if displacements.size else np.zeros(len(components))
+
+    blocks = []
+    header = {
+        'format': 'm2ms',
+        'version': VERSION,
+        'encoding': encoding,
+        'up': up,
+        'nodeCount': len(nodes),
+        'memberCount': len(members),
+        'frameCount': len(displacements),
+        'components': components,
+        'peak': peak.tolist(),
+        'scale': None,
+        'modeCount': 0
+    }
+
+    def add(key, array):
+        array = np.ascontiguousarray(array)
+        offset = sum(len(block) for block in blocks)
+        blocks.append(array.tobytes())
+        header[key] = {'dtype': array.dtype.str, 'offset': offset, 'size': array.nbytes}
+
+    add('nodes', nodes.astype('<f4'))
+    add('members', members.astype('<u2' if len(nodes) <= np.iinfo('<u2').max else '<u4'))
+    add('times', np.asarray(times, dtype='<f4'))
+
+    if encoding == 'float32':
+        add('displacements', displacements.astype('<f4'))
+    elif encoding == 'float16':
+        add('displacements', displacements.astype('<f2'))
+    elif encoding == 'int16':
+        scale = np.where(peak > 0, peak / np.iinfo('<i2').max, 1.0)
+        header['scale'] = scale.tolist()
+        add('displacements', np.round(displacements / scale).astype('<i2'))
+    else:
+        mode_shapes, coefficients = modal_reduction(displacements, num_modes, shapes)
+        header['modeCount'] = len(mode_shapes)
+        add('shapes', mode_shapes.astype('<f4'))
+        add('coefficients', coefficients.astype('<f4'))
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    payload = zlib.compress(b''.join(blocks), level)
+    return MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes + payload
+
+
+def read_container(blob):
+    """Split a container into (header, decompressed payload)"""
+    if blob[:4] != MAGIC:
+        raise ValueError("Not a sway animation (bad magic)")
+    header_size = struct.unpack('<I', blob[4:8])[0]
+    header = json.loads(blob[8:8 + header_size].decode('utf-8'))
+    if header.get('version', 0) > VERSION:
+        raise ValueError(f"Unsupported sway animation version {header['version']}")
+    return header, zlib.decompress(blob[8 + header_size:])
+
+
+def block_array(payload, block, shape):
+    dtype = np.dtype(block['dtype'])
+    return np.frombuffer(payload, dtype=dtype, count=block['size'] // dtype.itemsize,
+                         offset=block['offset']).reshape(shape)
+
+
+def decode_sway(blob):
+    """(header, nodes, members, times, (frames, N, C) displacements) of a container"""
+    header, payload = read_container(blob)
+    frames, count, width = header['frameCount'], header['nodeCount'], len(header['components'])
+    nodes = block_array(payload, header['nodes'], (count, 3)).astype(np.float64)
+    members = block_array(payload, header['members'], (header['memberCount'], 2)).astype(np.int64)
+    times = block_array(payload, header['times'], (frames,)).astype(np.float64)
+    if header['encoding'] == 'modal':
+        shapes = block_array(payload, header['shapes'], (header['modeCount'], count * width))
+        coefficients = block_array(payload, header['coefficients'], (frames, header['modeCount']))
+        displacements = (coefficients.astype(np.float64) @ shapes).reshape(frames, count, width)
+    else:
+        displacements = block_array(payload, header['displacements'], (frames, count, width)).astype(np.float64)
+        if header['scale'] is not None:
+            displacements *= header['scale']
+    return header, nodes, members, times, displacements
+
+
+def sway_from_results(nodes, members, results, encoding='int16', num_modes=6, shapes=None):
+    """Encode NodeResults of translations; the dofs give the moving axes"""
+    translations = [i for i, dof in enumerate(results.dofs) if dof <= 3]
+    components = [results.dofs[i] - 1 for i in translations]
+    if shapes is not None:
+        shapes = np.asarray(shapes)[..., components]
+    return encode_sway(nodes, members, np.asarray(results.values)[..., translations], results.times,
+                       components, encoding, num_modes, shapes)
+
+
+def write_sway(path, nodes, members, results, encoding='int16', num_modes=6, shapes=None):
+    blob = sway_from_results(nodes, members, results, encoding, num_modes, shapes)
+    with open(path, 'wb') as f:
+        f.write(blob)
+    return len(blob)
+
+
+def export_store(store_path, path=None, history='displacement', encoding='int16', num_modes=6):
+    """Write the sway animation of a result store (.m2mr) history"""
+    from frame_store import ResultStore
+
+    path = path or os.path.splitext(store_path)[0] + EXTENSION
+    with ResultStore(store_path) as store:
+        results = store.history(history)
+        size = write_sway(path, store.array('nodes'), store.array('members'), results, encoding, num_modes)
+    return path, size
+
+
+def compare_encodings(nodes, members, results, num_modes=6):
+    """Size and largest error of every encoding of the same results"""
+    rows = []
+    reference = None
+    for encoding in ENCODINGS:
+        blob = sway_from_results(nodes, members, results, encoding, num_modes)
+        header, _, _, _, displacements = decode_sway(blob)
+        if reference is None:
+            reference = np.asarray(results.values)[..., [i for i, dof in enumerate(results.dofs) if dof <= 3]]
+        peak = max(float(np.abs(reference).max(initial=0.0)), 1e-30)
+        error = float(np.abs(displacements - reference).max(initial=0.0))
+        rows.append({'encoding': encoding, 'bytes': len(blob), 'max_error': error, 'relative_error': error / peak,
+                     'modes': header['modeCount']})
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export sway animations of result stores for the web viewer")
+    parser.add_argument('stores', nargs='+', help="Result store files (.m2mr)")
+    parser.add_argument('-e', '--encoding', choices=ENCODINGS, default='int16')
+    parser.add_argument('-m', '--modes', type=int, default=6, help="Modes of the modal encoding")
+    parser.add_argument('--history', default='displacement', help="History to export")
+    parser.add_argument('--compare', action='store_true', help="Print size and error of every encoding")
+    args = parser.parse_args(argv)
+
+    for store_path in args.stores:
+        if args.compare:
+            from frame_store import ResultStore
+
+            with ResultStore(store_path) as store:
+                results = store.history(args.history)
+                raw = np.asarray(results.values).nbytes
+                rows = compare_encodings(store.array('nodes'), store.array('members'), results, args.modes)
+            print(f"{store_path}: {results.values.shape[0]} frames x {results.values.shape[1]} nodes, "
+                  f"float64 {raw / 1024:.1f} KB")
+            for row in rows:
+                modes = f" ({row['modes']} modes)" if row['modes'] else ''
+                print(f"  {row['encoding']:8s} {row['bytes'] / 1024:8.1f} KB  max error {row['max_error']:.2e} "
+                      f"({100 * row['relative_error']:.3f}% of peak){modes}")
+        else:
+            path, size = export_store(store_path, encoding=args.encoding, num_modes=args.modes,
+                                      history=args.history)
+            print(f"{store_path} -> {path} ({size / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
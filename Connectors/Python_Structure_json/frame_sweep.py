@@ -0,0 +1,212 @@
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import openseespy.opensees as ops
+
+from frame_analysis import TransientDriver, choose_time_step, modal_periods
+from frame_builder import FrameModelBuilder
+from frame_graph import regular_frame
+from frame_results import OnlineReductions
+from frame_solver import configure_solver
+
+# Base variants: the 3D frame of mind_to_model_test_building.py and the 2D
+# tower of mind_to_model_burj_khalifa.py
+BASE_VARIANTS = {
+    '3d': {'model': '3d', 'stories': 15, 'bays_x': 4, 'bays_y': 3, 'bay_width': 6.0, 'story_height': 3.5,
+           'E': 32000000.0, 'A': 0.09, 'I': 0.4, 'J': 1.0, 'mass': 100.0, 'transf': 'Linear',
+           'load_period': 2.0, 'duration': 5.0, 'output_dt': 0.1, 'damping': 0.0},
+    '2d': {'model': '2d', 'stories': 163, 'bays_x': 1, 'bays_y': 0, 'bay_width': 30.0, 'story_height': 4.0,
+           'E': 32000000.0, 'A': 4.0, 'I': 2.0, 'J': 0.0, 'mass': 100.0, 'transf': 'PDelta',
+           'load_period': 2.0, 'duration': 15.0, 'output_dt': 0.1, 'damping': 0.02},
+}
+VARIANT_KEYS = ('variant',) + tuple(BASE_VARIANTS['3d'])
+METRIC_KEYS = ('T1', 'T2', 'T3', 'peak_drift', 'peak_roof', 'peak_roof_time', 'rms_roof', 'dt', 'analyze_calls', 'failed_at', 'time',
+               'error')
+NUM_MODES = 3
+
+
+def variant_grid(model='3d', **axes):
+    """Every combination of the given parameter lists on top of a base variant
+
+    variant_grid('3d', stories=[10, 15], I=[0.2, 0.4]) gives four variants.
+    """
+    base = BASE_VARIANTS[model]
+    unknown = set(axes) - set(base)
+    if unknown:
+        raise ValueError(f"Unknown variant parameters: {sorted(unknown)}")
+    names = list(axes)
+    variants = []
+    for values in itertools.product(*(axes[name] for name in names)):
+        variant = dict(base, **dict(zip(names, values)))
+        variant['variant'] = len(variants)
+        variants.append(variant)
+    return variants
+
+
+def build_variant(variant):
+    """Build the frame of one variant in a fresh OpenSees model; returns its FrameGraph"""
+    frame = regular_frame(variant['bays_x'], variant['bays_y'], variant['stories'], variant['bay_width'],
+                          variant['bay_width'], variant['story_height'])
+    mass = variant['mass']
+
+    if variant['model'] == '3d':
+        masses = np.zeros((len(frame.nodes), 6))
+        masses[~frame.supports] = [mass, mass, mass, 1.0, 1.0, 1.0]
+        section = {'A': variant['A'], 'E': variant['E'], 'G': variant['E'] / 2.4, 'J': variant['J'],
+                   'Iy': variant['I'], 'Iz': variant['I']}
+        FrameModelBuilder(frame.nodes, frame.members, section, supports=frame.supports, masses=masses,
+                          transf_type=variant['transf']).build()
+        return frame
+
+    # Planar frame in the x-z plane of the grid
+    ops.wipe()
+    ops.model('basic', '-ndm', 2, '-ndf', 3)
+    for tag, (x, _, z) in enumerate(frame.nodes.tolist(), start=1):
+        ops.node(tag, x, z)
+    for tag in frame.node_tags[frame.supports].tolist():
+        ops.fix(tag, 1, 1, 1)
+    for tag in frame.node_tags[~frame.supports].tolist():
+        ops.mass(tag, mass, mass, 0.0)
+    ops.geomTransf(variant['transf'], 1)
+    for tag, (i, j) in enumerate(frame.member_tags.tolist(), start=1):
+        ops.element('elasticBeamColumn', tag, i, j, variant['A'], variant['E'], variant['I'], 1)
+    return frame
+
+
+def column_line(variant):
+    """Node tags of the first column line, from the base to the roof"""
+    per_floor = (variant['bays_x'] + 1) * (variant['bays_y'] + 1)
+    return np.arange(variant['stories'] + 1) * per_floor + 1
+
+
+def run_variant(variant):
+    """Build, analyze and reduce one variant to summary metrics (runs in a worker)
+
+    Every worker process has its own OpenSees domain, which is wiped before
+    each variant is built.
+    """
+    start = time.perf_counter()
+    frame = build_variant(variant)
+
+    periods = modal_periods(NUM_MODES)
+    dt = choose_time_step(periods, 1.0 / variant['load_period'], variant['output_dt'])
+
+    ops.timeSeries('Sine', 1, 0.0, variant['duration'], variant['load_period'])
+    ops.pattern('UniformExcitation', 1, 1, '-accel', 1)
+    if variant['damping']:
+        ops.rayleigh(variant['damping'], 0.0, 0.0, 0.0)
+    configure_solver(frame.nodes, frame.members, 6 if variant['model'] == '3d' else 3, frame.supports,
+                     symmetric=variant['transf'] != 'Corotational', verbose=False)
+    ops.integrator('Newmark', 0.5, 0.25)
+    ops.analysis('Transient')
+
+    # Running envelopes of the first column line at the output times; memory
+    # does not grow with the duration
+    driver = TransientDriver(dt, variant['output_dt'], variant['duration'])
+    line = column_line(variant)
+    reductions = OnlineReductions(line, dofs=(1,), drift_pairs=(line[:-1], line[1:], variant['story_height']))
+    driver.run(on_output=reductions.record)
+    ops.wipe()
+
+    row = {key: variant[key] for key in VARIANT_KEYS}
+    row.update({f'T{mode + 1}': float(period) for mode, period in enumerate(periods)})
+    row.update({
+        'peak_drift': float(reductions.drift_peak.max(initial=0.0)),
+        'peak_roof': float(reductions.peak[-1, 0]),
+        'peak_roof_time': float(reductions.peak_time[-1, 0]),
+        'rms_roof': float(reductions.rms[-1, 0]),
+        'dt': dt,
+        'analyze_calls': driver.report['analyze_calls'],
+        'failed_at': driver.report['failed_at'],
+        'time': time.perf_counter() - start
+    })
+    return row
+
+
+def run_sweep(variants, output=None, workers=None):
+    """Run all variants on a process pool, streaming rows into a CSV table
+
+    Rows are written (and flushed) as soon as a variant finishes, so a long
+    sweep can be watched or interrupted; the returned rows are in variant
+    order.
+    """
+    rows = []
+    table = None
+    handle = None
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        handle = open(output, 'w', newline='')
+        table = csv.DictWriter(handle, fieldnames=VARIANT_KEYS + METRIC_KEYS)
+        table.writeheader()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            jobs = {pool.submit(run_variant, variant): variant for variant in variants}
+            for future in as_completed(jobs):
+                variant = jobs[future]
+                try:
+                    row = future.result()
+                except Exception as e:
+                    row = {key: variant[key] for key in VARIANT_KEYS}
+                    row['error'] = str(e)
+                rows.append(row)
+                print_row(row)
+                if table is not None:
+                    table.writerow(row)
+                    handle.flush()
+    finally:
+        if handle is not None:
+            handle.close()
+
+    return sorted(rows, key=lambda row: row['variant'])
+
+
+def print_row(row):
+    """Print a single line summary of one variant"""
+    name = f"#{row['variant']} {row['model']} {row['stories']}st {row['bays_x']}x{row['bays_y']}"
+    if row.get('error'):
+        print(f"[failed] {name}: {row['error']}")
+    else:
+        print(f"[ok]     {name}: T1 {row['T1']:.3f}s, peak drift {row['peak_drift']:.2e}, "
+              f"peak roof {row['peak_roof']:.4f} m in {row['time']:.2f}s")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run a parametric sweep of frame variants on a process pool")
+    parser.add_argument('--model', choices=sorted(BASE_VARIANTS), default='3d',
+                        help="Base frame: 3d test building or 2d tower (default: 3d)")
+    parser.add_argument('--stories', type=int, nargs='+', help="Story counts")
+    parser.add_argument('--bays-x', type=int, nargs='+', help="Bay counts in x")
+    parser.add_argument('--bays-y', type=int, nargs='+', help="Bay counts in y (3d only)")
+    parser.add_argument('--inertia', type=float, nargs='+', help="Moments of inertia of the sections")
+    parser.add_argument('--area', type=float, nargs='+', help="Cross-sectional areas of the sections")
+    parser.add_argument('--load-period', type=float, nargs='+', help="Periods of the sine excitation")
+    parser.add_argument('-o', '--output', default='sweep.csv', help="CSV table of results (default: sweep.csv)")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="Number of worker processes (default: number of CPUs)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    options = {'stories': args.stories, 'bays_x': args.bays_x, 'bays_y': args.bays_y, 'I': args.inertia,
+               'A': args.area, 'load_period': args.load_period}
+    variants = variant_grid(args.model, **{name: values for name, values in options.items() if values})
+
+    print(f"Running {len(variants)} variant(s) on {args.workers or os.cpu_count()} worker(s)...")
+    start = time.perf_counter()
+    rows = run_sweep(variants, args.output, args.workers)
+    elapsed = time.perf_counter() - start
+
+    failed = sum(1 for row in rows if row.get('error'))
+    print(f"\nDone in {elapsed:.2f}s: {len(rows) - failed} variants, {failed} failed, table in {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -8,6 +8,13 @@ import matplotlib
 
 matplotlib.use('tkAgg')
 
+from frame_builder import FrameModelBuilder
+from frame_cache import cached_model, format_cached
+from frame_graph import floor_elevations, floor_levels, json_to_frame
+from frame_analysis import TransientDriver, choose_time_step
+from frame_results import RecorderResults
+from frame_solver import configure_solver
+
 # Initialize OpenSees model
 wipe()
 model('basic', '-ndm', 3, '-ndf', 6)  # 3D model, 6 DOFs per node
@@ -40,114 +47,57 @@ section('Elastic', sectionTag, E, A, Iz, Iy, G, J)
 with open('building_geometry.json', 'r') as f:
     data = json.load(f)
 
-# Extract and create nodes
-nodes = set()
-for wall in data["components"]["walls"]:
-    for vertex in wall["vertices"]:
-        nodes.add((vertex["x"], vertex["y"], vertex["z"]))
-for floor in data["components"]["floors"]:
-    for vertex in floor["vertices"]:
-        nodes.add((vertex["x"], vertex["y"], vertex["z"]))
-
-nodes = list(nodes)
-
-# Create nodes in OpenSees
-for i, node_coords in enumerate(nodes, 1):
-    node(i, *node_coords)
-
-# Create member elements and store their vectors
-member_elements = []
-member_vectors = []
-for wall in data["components"]["walls"]:
-    vertices = wall["vertices"]
-    for i in range(len(vertices)):
-        current = (vertices[i]["x"], vertices[i]["y"], vertices[i]["z"])
-        next_vertex = vertices[(i + 1) % len(vertices)]
-        next_coords = (next_vertex["x"], next_vertex["y"], next_vertex["z"])
-        member_elements.append((nodes.index(current) + 1, nodes.index(next_coords) + 1))
-
-        # Calculate member vector
-        dx = next_coords[0] - current[0]
-        dy = next_coords[1] - current[1]
-        dz = next_coords[2] - current[2]
-        member_vectors.append((dx, dy, dz))
-
-for floor in data["components"]["floors"]:
-    vertices = floor["vertices"]
-    for i in range(len(vertices)):
-        current = (vertices[i]["x"], vertices[i]["y"], vertices[i]["z"])
-        next_vertex = vertices[(i + 1) % len(vertices)]
-        next_coords = (next_vertex["x"], next_vertex["y"], next_vertex["z"])
-        member_elements.append((nodes.index(current) + 1, nodes.index(next_coords) + 1))
-
-        # Calculate member vector
-        dx = next_coords[0] - current[0]
-        dy = next_coords[1] - current[1]
-        dz = next_coords[2] - current[2]
-        member_vectors.append((dx, dy, dz))
-
-
-# Function to create appropriate transformation for each element
-def create_geometric_transformation(member_vector):
-    dx, dy, dz = member_vector
-
-    # Calculate vector magnitude
-    length = np.sqrt(dx ** 2 + dy ** 2 + dz ** 2)
-
-    # Normalize the vector
-    x_axis = np.array([dx / length, dy / length, dz / length])
-
-    # Choose appropriate perpendicular vector for local y-axis
-    if abs(dx) < 1e-6 and abs(dy) < 1e-6:  # Vertical member
-        y_axis = np.array([1.0, 0.0, 0.0])
-    else:
-        # Use cross product with vertical direction to get perpendicular vector
-        temp = np.cross(x_axis, np.array([0.0, 0.0, 1.0]))
-        y_axis = temp / np.linalg.norm(temp)
-
-    # Calculate local z-axis using cross product
-    z_axis = np.cross(x_axis, y_axis)
-    z_axis = z_axis / np.linalg.norm(z_axis)
-
-    return y_axis[0], y_axis[1], y_axis[2], z_axis[0], z_axis[1], z_axis[2]
-
-
-# Create elements with appropriate transformations
-for i, ((node_i, node_j), member_vector) in enumerate(zip(member_elements, member_vectors), 1):
-    # Create unique transformation for each element
-    y_vec, z_vec = create_geometric_transformation(member_vector)[:3], create_geometric_transformation(member_vector)[
-                                                                       3:]
-
-    # Create geometric transformation
-    geomTransfTag = i
-    geomTransf('Linear', geomTransfTag, *y_vec)
-
-    # Create element
-    element('elasticBeamColumn', i, node_i, node_j, A, E, G, J, Iy, Iz, geomTransfTag)
-
-# Find bottom and top nodes
-bottom_z = min(node[2] for node in nodes)
-top_z = max(node[2] for node in nodes)
-bottom_nodes = [i + 1 for i, node in enumerate(nodes) if node[2] == bottom_z]
-top_nodes = [i + 1 for i, node in enumerate(nodes) if node[2] == top_z]
-
-# Fix bottom nodes
-for node_tag in bottom_nodes:
-    fix(node_tag, 1, 1, 1, 1, 1, 1)  # Fix all 6 DOFs
-
-# Define mass
-for node_tag in range(1, len(nodes) + 1):
-    mass(node_tag, rho * A, rho * A, rho * A, rho * J, rho * Iy, rho * Iz)
-
-# Time series for seismic loading
-dt = 0.1  # Time step
+# Weld vertices into nodes, dedupe shared wall/floor edges and find the
+# supports; the full-height wall edges are split at the floors so the floor
+# outlines are connected to the walls
+elevations = floor_elevations(data)
+frame = json_to_frame(data, categories=('walls', 'floors')).split_at(elevations)
+nodes = frame.nodes
+
+# Member elements as node tag pairs and their vectors
+member_elements = frame.member_tags.tolist()
+member_vectors = frame.member_vectors()
+
+
+# Vectors in the local x-z plane of every member: horizontal and perpendicular
+# to the member, global X for vertical members
+x_axes = member_vectors / np.linalg.norm(member_vectors, axis=1, keepdims=True)
+vertical = (np.abs(x_axes[:, 0]) < 1e-6) & (np.abs(x_axes[:, 1]) < 1e-6)
+vecxz = np.cross(x_axes, [0.0, 0.0, 1.0])
+vecxz[vertical] = [1.0, 0.0, 0.0]
+vecxz /= np.linalg.norm(vecxz, axis=1, keepdims=True)
+
+# Create nodes, fixed bottom nodes, elements (one geomTransf per unique
+# orientation) and mass on every node
+masses = np.tile([rho * A, rho * A, rho * A, rho * J, rho * Iy, rho * Iz], (len(nodes), 1))
+section_properties = {'A': A, 'E': E, 'G': G, 'J': J, 'Iy': Iy, 'Iz': Iz}
+# Optional rigid diaphragms at the elevations of the JSON floors
+rigid_floors = False
+diaphragm_levels = floor_levels(nodes, frame.supports, elevations) if rigid_floors else None
+builder = FrameModelBuilder(nodes, frame.members, section_properties, supports=frame.supports,
+                            masses=masses, vecxz=vecxz, diaphragm_levels=diaphragm_levels)
+# Modes and matrix statistics of an unchanged model come from .frame_cache
+model = cached_model(builder, 3, wipe=False)
+print(builder.format_report())
+print(format_cached(model))
+
+# Find top nodes
+top_z = nodes[:, 2].max()
+top_nodes = frame.node_tags[frame.level_mask(top_z)].tolist()
+
+# Time series for seismic loading: results every output_dt, analysis step
+# chosen from the first periods and the load period
+output_dt = 0.1  # Output interval
 duration = 10.0  # Duration in seconds
-num_steps = int(duration / dt)
+load_period = 2.0  # Period of the Sine series in seconds
+periods = model['periods']
+print(f"Structure periods: {periods.tolist()}")
+dt = choose_time_step(periods, 1.0 / load_period, output_dt)
 tStart = 0.0
 
 # Create time series (simulated earthquake)
 tsTag = 1
-timeSeries('Sine', tsTag, 0.0, duration, 2.0)  # 2.0 Hz frequency
+timeSeries('Sine', tsTag, 0.0, duration, load_period)
 
 # Create load pattern
 patternTag = 1
@@ -167,36 +117,25 @@ a1 = 2 * zeta / (omega1 + omega2)
 rayleigh(a0, a1, 0.0, 0.0)
 
 # Analysis settings
-constraints('Plain')
-numberer('RCM')
-system('BandGen')
+configure_solver(nodes, frame.members, 6, frame.supports, mp_constraints=rigid_floors, statistics=model['statistics'])
 test('NormDispIncr', 1.0e-6, 10)
 algorithm('Newton')
 integrator('Newmark', 0.5, 0.25)
 analysis('Transient')
 
-# Storage for results
-time_history = []
-top_displacements = {node: {'x': [], 'y': [], 'z': []} for node in top_nodes}
-
-# Perform the analysis
+# Perform the analysis; a binary recorder stores the top node displacements
 print("Starting analysis...")
-for i in range(num_steps):
-    t = i * dt
-    ok = analyze(1, dt)
-
-    if ok != 0:
-        print(f"Convergence issue at time {t}")
-        break
-
-    time_history.append(t)
-    for node in top_nodes:
-        top_displacements[node]['x'].append(nodeDisp(node, 1))
-        top_displacements[node]['y'].append(nodeDisp(node, 2))
-        top_displacements[node]['z'].append(nodeDisp(node, 3))
-
-    if i % 10 == 0:
-        print(f"Analysis at {t:.1f}s completed")
+recorder = RecorderResults('top_displacements.bin', top_nodes).start()
+driver = TransientDriver(dt, output_dt, duration, test=('NormDispIncr', 1.0e-6, 10))
+driver.run()
+print(driver.format_report())
+if driver.report['failed_at'] is not None:
+    print(f"Convergence issue at time {driver.report['failed_at']}")
+results = recorder.results().sample(driver.report['times'])
+
+time_history = results.times
+top_displacements = {node: {'x': results.node(node, 1), 'y': results.node(node, 2), 'z': results.node(node, 3)}
+                     for node in top_nodes}
 
 # Plot results
 fig= plt.figure(figsize=(12, 8))
@@ -7,6 +7,8 @@ from mpl_toolkits.mplot3d import Axes3D
 import matplotlib
 matplotlib.use('tkAgg')
 
+from frame_graph import json_to_frame
+
 # Load JSON file
 with open('building_geometry.json', 'r') as f:
     data = json.load(f)
@@ -19,59 +21,22 @@ floors = data["components"]["floors"]
 wipe()
 model('basic', '-ndm', 3, '-ndf', 6)  # 3D model, 6 DOFs per node
 
-# Extract all coordinates (vertices) from walls and floors
-nodes = set()
-
-# Collect vertices from walls
-for wall in data["components"]["walls"]:
-    for vertex in wall["vertices"]:
-        nodes.add((vertex["x"], vertex["y"], vertex["z"]))
-
-# Collect vertices from floors
-for floor in data["components"]["floors"]:
-    for vertex in floor["vertices"]:
-        nodes.add((vertex["x"], vertex["y"], vertex["z"]))
-
-# Convert nodes to a list for easier handling
-nodes = list(nodes)
-
-# Initialize a list to store member elements (edges)
-member_elements = []
-
-# Create member elements for walls
-for wall in data["components"]["walls"]:
-    vertices = wall["vertices"]
-    for i in range(len(vertices)):
-        current_vertex = (vertices[i]["x"], vertices[i]["y"], vertices[i]["z"])
-        next_vertex = (vertices[(i + 1) % len(vertices)]["x"], vertices[(i + 1) % len(vertices)]["y"],
-                       vertices[(i + 1) % len(vertices)]["z"])
-        member_elements.append((current_vertex, next_vertex))
-
-# Create member elements for floors
-for floor in data["components"]["floors"]:
-    vertices = floor["vertices"]
-    for i in range(len(vertices)):
-        current_vertex = (vertices[i]["x"], vertices[i]["y"], vertices[i]["z"])
-        next_vertex = (vertices[(i + 1) % len(vertices)]["x"], vertices[(i + 1) % len(vertices)]["y"],
-                       vertices[(i + 1) % len(vertices)]["z"])
-        member_elements.append((current_vertex, next_vertex))
-
-# Find bottom nodes
-def find_bottom_nodes(nodes):
-    min_z = min([node[2] for node in nodes])
-    bottom_nodes = [node for node in nodes if node[2] == min_z]
-    return bottom_nodes
+# Weld vertices into nodes, dedupe shared wall/floor edges and find the supports
+frame = json_to_frame(data, categories=('walls', 'floors'))
+
+nodes = frame.nodes
+member_elements = frame.member_coordinates()
 
 # Get bottom nodes and non-bottom nodes
-bottom_nodes = find_bottom_nodes(nodes)
-non_bottom_nodes = [node for node in nodes if node not in bottom_nodes]
+bottom_nodes = nodes[frame.supports]
+non_bottom_nodes = nodes[~frame.supports]
 
 # Create a 3D plot
 fig = plt.figure(figsize=(12, 8))
 ax = fig.add_subplot(111, projection='3d')
 
 # Plot non-bottom nodes as red dots
-if non_bottom_nodes:  # Check if there are any non-bottom nodes
+if len(non_bottom_nodes):  # Check if there are any non-bottom nodes
     x_nodes = [node[0] for node in non_bottom_nodes]
     y_nodes = [node[1] for node in non_bottom_nodes]
     z_nodes = [node[2] for node in non_bottom_nodes]
@@ -1,12 +1,14 @@
 import json
 import numpy as np
-import math
 from openseespy.opensees import *
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 import matplotlib
 matplotlib.use('tkAgg')
 
+from frame_builder import FrameModelBuilder, lumped_member_masses
+from frame_graph import json_to_frame, support_mask
+
 # Load JSON file
 with open('test_image_geometry.json', 'r') as f:
     data = json.load(f)
@@ -19,52 +21,16 @@ floors = data["components"]["floors"]
 wipe()
 model('basic', '-ndm', 3, '-ndf', 6)  # 3D model, 6 DOFs per node
 
-# Extract all coordinates (vertices) from walls and floors
-nodes = set()
-
-# Collect vertices from walls
-for wall in data["components"]["walls"]:
-    for vertex in wall["vertices"]:
-        nodes.add((vertex["x"], vertex["y"], vertex["z"]))
-
-# Collect vertices from floors
-for floor in data["components"]["floors"]:
-    for vertex in floor["vertices"]:
-        nodes.add((vertex["x"], vertex["y"], vertex["z"]))
+# Weld vertices into nodes with integer ids and dedupe the shared wall/floor edges
+frame = json_to_frame(data, categories=('walls', 'floors'))
+nodes = frame.nodes
 
 # Display the unique nodes (coordinates)
 for node in nodes:
-    print(node)
-
-# Convert nodes to a list for easier handling
-nodes = list(nodes)
-
-# Initialize a list to store member elements (edges)
-member_elements = []
-
-# Create member elements for walls
-for wall in data["components"]["walls"]:
-    vertices = wall["vertices"]
-    for i in range(len(vertices)):
-        # Get the current and next vertices
-        current_vertex = (vertices[i]["x"], vertices[i]["y"], vertices[i]["z"])
-        next_vertex = (vertices[(i + 1) % len(vertices)]["x"], vertices[(i + 1) % len(vertices)]["y"],
-                       vertices[(i + 1) % len(vertices)]["z"])
-
-        # Create member element (edge) between the two vertices
-        member_elements.append((current_vertex, next_vertex))
-
-# Create member elements for floors
-for floor in data["components"]["floors"]:
-    vertices = floor["vertices"]
-    for i in range(len(vertices)):
-        # Get the current and next vertices
-        current_vertex = (vertices[i]["x"], vertices[i]["y"], vertices[i]["z"])
-        next_vertex = (vertices[(i + 1) % len(vertices)]["x"], vertices[(i + 1) % len(vertices)]["y"],
-                       vertices[(i + 1) % len(vertices)]["z"])
-
-        # Create member element (edge) between the two vertices
-        member_elements.append((current_vertex, next_vertex))
+    print(tuple(node))
+
+# Member elements (edges) as pairs of node coordinates
+member_elements = frame.member_coordinates()
 
 # Display the member elements (edges)
 for member in member_elements:
@@ -81,13 +47,8 @@ z = [node[2] for node in nodes]
 ## BOUNDARY CONDITIONS
 # Function to find the bottom nodes
 def find_bottom_nodes(nodes):
-    # Find the minimum Z-coordinate value (bottom of the structure)
-    min_z = min([node[2] for node in nodes])
-
-    # Identify all nodes with the minimum Z value (bottom nodes)
-    bottom_nodes = [node for node in nodes if node[2] == min_z]
-
-    return bottom_nodes
+    # Nodes at the minimum Z-coordinate value (bottom of the structure)
+    return nodes[support_mask(nodes)]
 
 
 # Function to apply boundary conditions
@@ -95,13 +56,10 @@ def apply_boundary_conditions(nodes):
     # Create a dictionary to store the boundary conditions
     boundary_conditions = {}
 
-    # Identify the bottom nodes
-    bottom_nodes = find_bottom_nodes(nodes)
-
-    # For each node, apply the boundary condition (fix it in all directions if it's a bottom node)
-    for node in nodes:
-        # If it's a bottom node, apply boundary conditions (fix in all directions)
-        if node in bottom_nodes:
+    # Fix bottom nodes in all directions, leave the others unconstrained
+    bottom = support_mask(nodes)
+    for node, fixed in zip(map(tuple, nodes), bottom):
+        if fixed:
             boundary_conditions[node] = {"x": 0, "y": 0, "z": 0}  # Fix all directions
         else:
             boundary_conditions[node] = {"x": None, "y": None, "z": None}  # No constraint
@@ -169,79 +127,13 @@ gamma=b*h*7850 #(kg/m)
 # Cross-section for visualisation purposes only
 shape='rect'
 
-# Elements
-transfType='Linear'
-shapes={}
-memberLengths=[]
-for n, mbr in enumerate(member):
-    transfTag = n + 1  # transform tag for this element
-    eleTag = n + 1  # element tag for this element
-
-    shapes[eleTag] = [shape, [b, h]]
-
-    node_i = mbr[0]
-    node_j = mbr[1]
-
-    # Accessing the coordinates correctly
-    ix = nodes[node_i - 1][0]  # x-coordinate of node_i
-    iy = nodes[node_i - 1][1]  # y-coordinate of node_i
-    iz = nodes[node_i - 1][2]  # z-coordinate of node_i
-
-    jx = nodes[node_j - 1][0]  # x-coordinate of node_j
-    jy = nodes[node_j - 1][1]  # y-coordinate of node_j
-    jz = nodes[node_j - 1][2]  # z-coordinate of node_j
-
-    dx = jx - ix
-    dy = iy - jy
-    dz = iz - jz
-    length = math.sqrt(dx**2 + dy**2 + dz**2)
-    memberLengths.append(length)
-
-    local_x_unit = np.array([dx, dy, dz]) / length
-
-    i_offset = np.array([ix, iy, iz + 1])  # Adding 1 to the z-coordinate of node_i
-    j_offset = np.array([jx, jy, jz])
-    node_k = i_offset + 0.5 * (j_offset - i_offset)
-    node_i = np.array([ix, iy, iz])
-    vector_in_plane = node_k - node_i
-    local_y_vector = vector_in_plane - np.dot(vector_in_plane, local_x_unit) * local_x_unit
-    magY = math.sqrt(local_y_vector[0]**2 + local_y_vector[1]**2 + local_y_vector[2]**2)
-    local_y_unit = local_y_vector / magY
-
-    local_z_unit = np.cross(local_x_unit, local_y_unit)
-
-    vecxz = local_z_unit
-
-
-    # Define a geometric transformation for this member
-    #geomTransf(transfType, transfTag, vecxz[0], vecxz[1], vecxz[2])
-
-    # Create the beam element using the transformation
-    #element('elasticBeamColumn', eleTag, node_i, node_j, A, E, G, J, Iy, Iz, transfTag)
-
-    # Define geometric transformation for beam element
-    # geomTransf('Linear', transfTag, dx / length, dy / length, dz / length)
-
-    # Create the elastic beam-column element
-    # element('elasticBeamColumn', eleTag, node_i, node_j, A, E, G, J, Iy, Iz, transfTag)
-
-
-    #geomTransf('Linear', transfTag, *local_x_unit)
-
-    # Create the elastic beam-column element
-    #element('elasticBeamColumn', eleTag, node_i, node_j, A, E, G, J, Iy, Iz, transfTag)
-
-
-# Define geometric transformations for 3D elements
-# For columns: local z-axis along global Y axis
-#geomTransf('Linear', 1, 0, 1, 0)  # columns
-# For beams in X direction: local y-axis along global Z axis
-#ops.geomTransf('Linear', 2, 0, 0, 1)  # beams in X direction
-# For beams in Y direction: local y-axis along global Z axis
-#ops.geomTransf('Linear', 3, 1, 0, 0)  # beams in Y direction
-
-# Create elements
-#element_counter = 1
-
-#element('elasticBeamColumn', element_counter, node_i, node_j, A, E, G, J, Iy, Iz, 1)
+# Elements: one geomTransf per member orientation, base nodes fixed and the
+# member self weight lumped at the nodes
+section_properties = {'A': A, 'E': E, 'G': G, 'J': J, 'Iy': Iy, 'Iz': Iz}
+builder = FrameModelBuilder(frame.nodes, frame.members, section_properties, supports=frame.supports,
+                            masses=lumped_member_masses(frame.nodes, frame.members, gamma))
+builder.build(wipe=False)
+print(builder.format_report())
 
+shapes = {tag: [shape, [b, h]] for tag in range(1, len(frame.members) + 1)}
+memberLengths = np.linalg.norm(frame.member_vectors(), axis=1).tolist()
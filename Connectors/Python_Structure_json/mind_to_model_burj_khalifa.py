@@ -55,10 +55,23 @@ Can you also add some additional plotting to get some insight into the analysis?
 
 import openseespy.opensees as ops
 import numpy as np
+import time
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation, PillowWriter
+from matplotlib.animation import FuncAnimation
 from matplotlib.gridspec import GridSpec
-plt.switch_backend('TkAgg')
+
+from frame_analysis import TransientDriver, choose_time_step, modal_periods
+from frame_animation import FrameAnimator
+from frame_export import backend, export_animation
+from frame_graph import regular_frame
+from frame_response import FrameResponse
+from frame_results import RecorderResults
+from frame_solver import configure_solver
+from frame_stick import StickModel, compare_periods, format_comparison, format_stick
+from frame_store import model_hash, write_results
+from frame_sway import write_sway
+
+plt.switch_backend(backend('TkAgg'))  # Agg on servers without a display
 
 # [Previous initialization code remains the same up to the analysis part]
 # Initialize model
@@ -113,34 +126,62 @@ for floor in range(1, num_stories + 1):
         node_tag = node_tags[(floor, bay)]
         ops.mass(node_tag, 100.0, 100.0, 0.0)
 
-# Analysis parameters
-dt = 0.1
+# Connectivity of the frame (node (floor, bay) has index node_tag - 1) for
+# the stick preview and for choosing the system of equations
+frame = regular_frame(num_bays, 0, num_stories, bay_width, bay_width, story_height)
+
+# Preview: condensed stick model with one mass and one story element per
+# floor (the 2D members bend like the 3D ones in the xz plane)
+start = time.perf_counter()
+stick = StickModel.from_frame(frame.nodes, frame.members, {'E': E, 'A': A, 'Iy': I, 'Iz': I},
+                              masses=np.where(frame.supports, 0.0, 100.0), supports=frame.supports)
+stick_time = time.perf_counter() - start
+print(format_stick(stick, directions=(0,), elapsed=stick_time))
+
+# Analysis parameters: results every output_dt, analysis step chosen from
+# the first periods and the load period (the Sine series takes the period)
+output_dt = 0.1
 duration = 15.0
-num_steps = int(duration / dt)
-time_points = np.linspace(0, duration, num_steps)
+load_period = 2.0
+start = time.perf_counter()
+periods = modal_periods(3)
+print(format_comparison(compare_periods(stick, periods, num_modes=3, full_time=time.perf_counter() - start,
+                                        stick_time=stick_time)))
+dt = choose_time_step(periods, 1.0 / load_period, output_dt)
 
 # Create load pattern
-ops.timeSeries('Sine', 1, 0.0, duration, 2.0)
+ops.timeSeries('Sine', 1, 0.0, duration, load_period)
 ops.pattern('UniformExcitation', 1, 1, '-accel', 1)
 
 # Rayleigh Damping
 ops.rayleigh(0.02, 0.0, 0.0, 0.0)
+stick_roof = stick.sway(np.arange(0.0, duration + output_dt / 2, output_dt), load_period,
+                        zeta=0.02 / (2 * stick.modes()[0]))[:, -1]
+print(f"Stick preview: peak roof displacement {np.abs(stick_roof).max():.4f} m")
 
 # Analysis settings
 ops.wipeAnalysis()
 ops.algorithm('Newton')
-ops.system('BandGen')
-ops.numberer('RCM')
-ops.constraints('Plain')
+configure_solver(frame.nodes, frame.members, 3, frame.supports)
 ops.integrator('Newmark', 0.5, 0.25)
 ops.analysis('Transient')
 
-# Perform analysis and store results
-displacements = {node: [] for node in node_tags.values()}
-for t in time_points:
-    ops.analyze(1, dt)
-    for node in node_tags.values():
-        displacements[node].append(ops.nodeDisp(node, 1))
+# Perform analysis; a binary recorder stores the horizontal displacements
+recorder = RecorderResults('displacements.bin', list(node_tags.values()), dofs=(1,)).start()
+driver = TransientDriver(dt, output_dt, duration)
+driver.run()
+print(driver.format_report())
+results = recorder.results().sample(driver.report['times'])
+time_points = results.times
+
+# Keep the model and results for replaying in plots, the web viewer and reports
+write_results('tower_results.m2mr', frame, {'displacement': results},
+              {'load': f'UniformExcitation Sine period {load_period} s', 'dt': dt, 'output_dt': output_dt,
+               'duration': duration, 'plane': 'xz'},
+              arrays={'periods': periods})
+
+# Sway animation for the three.js viewer (upload with PUT /sway/{name} to the backend)
+write_sway('tower_sway.m2ms', frame.nodes, frame.members, results)
 
 # Create main figure with subplots
 fig = plt.figure(figsize=(20, 15))
@@ -160,104 +201,83 @@ ax_time_history = fig.add_subplot(gs[0, 1])
 ax_drift = fig.add_subplot(gs[1, 1])
 ax_envelope = fig.add_subplot(gs[2, 1])
 
-# Process data for additional plots
-top_floor_node = node_tags[(num_stories, 0)]
-top_floor_disp = np.array(displacements[top_floor_node])
+# Process data for additional plots: drifts and envelopes for all floors at
+# once from the (steps, nodes, dofs) results
+response = FrameResponse(frame.nodes[:, [0, 2]], frame.members, results)
+top_floor_disp = response.level_displacement[:, -1, 0]
+story_drifts = response.story_drift[:, :, 0] * 100  # (steps, stories) in percent
+max_disps = response.level_peak[:, 0]
+summary = response.summary()
+print(f"Peak story drift {100 * summary['peak_drift']:.3f}% at story {summary['peak_drift_story']}, "
+      f"peak roof displacement {summary['peak_roof']:.4f} m")
+
+# Static panel setup; the animation only updates the artists created here
+ax_building.grid(True, linestyle='--', alpha=0.7)
+ax_building.set_xlabel('Width (m)')
+ax_building.set_ylabel('Height (m)')
+ax_building.set_title('Building Dynamic Response')
+ax_building.set_xlim(-bay_width * 2, bay_width * 3)
+ax_building.set_ylim(-1, story_height * (num_stories + 1))
+ax_building.set_aspect('equal')
+
+# Columns blue, beams red, as one line collection each
+animator = FrameAnimator(ax_building, frame.nodes[:, [0, 2]], frame.members, results.values,
+                         classes=frame.member_categories,
+                         styles={'columns': {'colors': 'b'}, 'beams': {'colors': 'r'}},
+                         scale=scale_factor, times=time_points, linewidth=1)
+
+time_history_line, = ax_time_history.plot([], [], 'b-', linewidth=2, label='Top Floor')
+ax_time_history.set_xlim(0, time_points[-1])
+ax_time_history.set_ylim(-1.1 * np.abs(top_floor_disp).max(), 1.1 * np.abs(top_floor_disp).max())
+ax_time_history.set_xlabel('Time (s)')
+ax_time_history.set_ylabel('Displacement (m)')
+ax_time_history.set_title('Top Floor Displacement Time History')
+ax_time_history.grid(True, linestyle='--', alpha=0.7)
+ax_time_history.legend()
+
+selected_floors = [1, num_stories//4, num_stories//2, num_stories]  # Selected floors for clarity
+colors = ['b', 'g', 'r', 'purple']  # Different colors for each floor
+drift_lines = [ax_drift.plot([], [], color=color, linewidth=2, label=f'Floor {floor}')[0]
+               for floor, color in zip(selected_floors, colors)]
+peak_drift = np.abs(story_drifts[:, np.array(selected_floors) - 1]).max()
+ax_drift.set_xlim(0, time_points[-1])
+ax_drift.set_ylim(-1.1 * peak_drift, 1.1 * peak_drift)
+ax_drift.set_xlabel('Time (s)')
+ax_drift.set_ylabel('Story Drift (%)')
+ax_drift.set_title('Story Drift Time History')
+ax_drift.grid(True, linestyle='--', alpha=0.7)
+ax_drift.legend()
+
+floors = np.arange(num_stories + 1)
+level_disps = np.abs(response.level_displacement[:, :, 0])
+ax_envelope.plot(max_disps, floors, 'r-', linewidth=2, label='Maximum')
+current_line, = ax_envelope.plot([], [], 'b--', linewidth=2, label='Current', alpha=0.7)
+ax_envelope.set_xlabel('Maximum Displacement (m)')
+ax_envelope.set_ylabel('Floor')
+ax_envelope.set_title('Displacement Envelope')
+ax_envelope.grid(True, linestyle='--', alpha=0.7)
+ax_envelope.legend()
+
+# Adjust layout
+plt.tight_layout()
 
-# Calculate story drifts
-story_drifts = {}
-for floor in range(1, num_stories + 1):
-    node_bottom = node_tags[(floor-1, 0)]
-    node_top = node_tags[(floor, 0)]
-    drift = np.array(displacements[node_top]) - np.array(displacements[node_bottom])
-    story_drifts[floor] = drift / story_height * 100  # Convert to percentage
-
-# Calculate maximum displacement envelope
-max_disps = []
-for floor in range(num_stories + 1):
-    node = node_tags[(floor, 0)]
-    max_disp = max(abs(np.array(displacements[node])))
-    max_disps.append(max_disp)
 
 def animate(frame):
-    # Clear building animation
-    ax_building.clear()
-    ax_building.grid(True, linestyle='--', alpha=0.7)
-    ax_building.set_xlabel('Width (m)')
-    ax_building.set_ylabel('Height (m)')
-    ax_building.set_title('Building Dynamic Response')
+    artists = animator.update(frame)
+    time_history_line.set_data(time_points[:frame+1], top_floor_disp[:frame+1])
+    for line, floor in zip(drift_lines, selected_floors):
+        line.set_data(time_points[:frame+1], story_drifts[:frame+1, floor - 1])
+    current_line.set_data(level_disps[frame], floors)
+    return artists + [time_history_line, current_line] + drift_lines
 
-    # Plot deformed shape
-    for floor in range(num_stories):
-        for bay in range(num_bays + 1):
-            # Draw columns
-            node1 = node_tags[(floor, bay)]
-            node2 = node_tags[(floor + 1, bay)]
-            x1 = bay * bay_width + scale_factor * displacements[node1][frame]
-            y1 = floor * story_height
-            x2 = bay * bay_width + scale_factor * displacements[node2][frame]
-            y2 = (floor + 1) * story_height
-            ax_building.plot([x1, x2], [y1, y2], 'b-', linewidth=1)
-
-    # Draw beams
-    for floor in range(1, num_stories + 1):
-        for bay in range(num_bays):
-            node1 = node_tags[(floor, bay)]
-            node2 = node_tags[(floor, bay + 1)]
-            x1 = bay * bay_width + scale_factor * displacements[node1][frame]
-            y1 = floor * story_height
-            x2 = (bay + 1) * bay_width + scale_factor * displacements[node2][frame]
-            y2 = floor * story_height
-            ax_building.plot([x1, x2], [y1, y2], 'r-', linewidth=1)
-
-    ax_building.set_xlim(-bay_width * 2, bay_width * 3)
-    ax_building.set_ylim(-1, story_height * (num_stories + 1))
-    ax_building.set_aspect('equal')
-
-    # Update time history plot
-    ax_time_history.clear()
-    ax_time_history.plot(time_points[:frame+1], top_floor_disp[:frame+1], 'b-', linewidth=2, label='Top Floor')
-    ax_time_history.set_xlabel('Time (s)')
-    ax_time_history.set_ylabel('Displacement (m)')
-    ax_time_history.set_title('Top Floor Displacement Time History')
-    ax_time_history.grid(True, linestyle='--', alpha=0.7)
-    ax_time_history.legend()
-
-    # Update story drift plot
-    ax_drift.clear()
-    selected_floors = [1, num_stories//4, num_stories//2, num_stories]  # Selected floors for clarity
-    colors = ['b', 'g', 'r', 'purple']  # Different colors for each floor
-    for floor, color in zip(selected_floors, colors):
-        ax_drift.plot(time_points[:frame+1], story_drifts[floor][:frame+1],
-                     color=color, linewidth=2, label=f'Floor {floor}')
-    ax_drift.set_xlabel('Time (s)')
-    ax_drift.set_ylabel('Story Drift (%)')
-    ax_drift.set_title('Story Drift Time History')
-    ax_drift.grid(True, linestyle='--', alpha=0.7)
-    ax_drift.legend()
-
-    # Update max displacement envelope
-    ax_envelope.clear()
-    floors = np.arange(num_stories + 1)
-    ax_envelope.plot(max_disps, floors, 'r-', linewidth=2, label='Maximum')
-    if frame > 0:
-        current_disps = [abs(displacements[node_tags[(floor, 0)]][frame]) for floor in floors]
-        ax_envelope.plot(current_disps, floors, 'b--', linewidth=2, label='Current', alpha=0.7)
-    ax_envelope.set_xlabel('Maximum Displacement (m)')
-    ax_envelope.set_ylabel('Floor')
-    ax_envelope.set_title('Displacement Envelope')
-    ax_envelope.grid(True, linestyle='--', alpha=0.7)
-    ax_envelope.legend()
-
-    # Adjust layout
-    plt.tight_layout()
-    return ax_building, ax_time_history, ax_drift, ax_envelope
 
 # Create animation
-anim = FuncAnimation(fig, animate, frames=len(time_points), interval=50, blit=False)
+anim = FuncAnimation(fig, animate, frames=len(time_points), interval=50, blit=True)
 
-# Save animation
-writer = PillowWriter(fps=20)
-anim.save('building_analysis.gif', writer=writer)
+# Save animation: frames are rendered headless on a process pool; rerunning
+# after an interruption resumes from the frames already on disk, as long as
+# they were drawn from the same results
+export_animation(fig, animate, len(time_points), 'building_analysis.gif', fps=20,
+                 key=model_hash(frame.nodes, frame.members, displacement=results.values))
 
 plt.show()
\ No newline at end of file
@@ -63,15 +63,27 @@ plt.show()
 
 import openseespy.opensees as ops
 import numpy as np
+import time
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 import matplotlib
 
-matplotlib.use('tkagg')
+from frame_export import backend
+
+matplotlib.use(backend('tkagg'))  # Agg on servers without a display
+
+from frame_builder import FrameModelBuilder
+from frame_cache import cached_model, format_cached
+from frame_graph import floor_levels, regular_frame
+from frame_analysis import TransientDriver, choose_time_step
+from frame_animation import FrameAnimator
+from frame_results import RecorderResults
+from frame_solver import configure_solver
+from frame_stick import StickModel, compare_periods, format_comparison, format_stick
+from frame_store import write_results
+from frame_sway import write_sway
 
 # Model generation
-ops.wipe()
-ops.model('basic', '-ndm', 3, '-ndf', 6)
 
 # Structure parameters (based on image proportions)
 num_stories = 15
@@ -90,80 +102,59 @@ Iz = 0.4  # moment of inertia about z axis
 A = 0.09  # cross-sectional area in m²
 
 # Create nodes and elements
-node_tags = {}
-for floor in range(num_stories + 1):
-    for x in range(num_bays_x + 1):
-        for y in range(num_bays_y + 1):
-            node_tag = floor * 1000 + x * 100 + y
-            node_tags[(floor, x, y)] = node_tag
-            ops.node(node_tag, x * bay_width_x, y * bay_width_y, floor * story_height)
-
-            # Add mass to nodes (except ground level)
-            if floor > 0:
-                ops.mass(node_tag, 100.0, 100.0, 100.0, 1.0, 1.0, 1.0)
-
-# Fix base nodes
-for x in range(num_bays_x + 1):
-    for y in range(num_bays_y + 1):
-        ops.fix(node_tags[(0, x, y)], 1, 1, 1, 1, 1, 1)
-
-# Define geometric transformations
-# Columns
-ops.geomTransf('Linear', 1, 0, 1, 0)  # x-direction
-ops.geomTransf('Linear', 2, 1, 0, 0)  # y-direction
-
-# Beams
-ops.geomTransf('Linear', 3, 0, 0, 1)  # x-direction beams
-ops.geomTransf('Linear', 4, 0, 0, 1)  # y-direction beams
-
-# Create material
-ops.uniaxialMaterial('Elastic', 1, E)
-
-# Create elements
-# Columns (element tags 1-4999)
-column_tag = 1
-for floor in range(num_stories):
-    for x in range(num_bays_x + 1):
-        for y in range(num_bays_y + 1):
-            node1 = node_tags[(floor, x, y)]
-            node2 = node_tags[(floor + 1, x, y)]
-            ops.element('elasticBeamColumn', column_tag, node1, node2, A, E, G, J, Iy, Iz, 1)
-            column_tag += 1
-
-# Beams in x-direction (element tags 5000-9999)
-beam_x_tag = 5000
-for floor in range(1, num_stories + 1):
-    for x in range(num_bays_x):
-        for y in range(num_bays_y + 1):
-            node1 = node_tags[(floor, x, y)]
-            node2 = node_tags[(floor, x + 1, y)]
-            ops.element('elasticBeamColumn', beam_x_tag, node1, node2, A, E, G, J, Iy, Iz, 3)
-            beam_x_tag += 1
-
-# Beams in y-direction (element tags 10000-14999)
-beam_y_tag = 10000
-for floor in range(1, num_stories + 1):
-    for x in range(num_bays_x + 1):
-        for y in range(num_bays_y):
-            node1 = node_tags[(floor, x, y)]
-            node2 = node_tags[(floor, x, y + 1)]
-            ops.element('elasticBeamColumn', beam_y_tag, node1, node2, A, E, G, J, Iy, Iz, 4)
-            beam_y_tag += 1
-
-# Eigenvalue analysis
+# Grid frame as arrays: node (floor, x, y) has index (floor * (num_bays_x + 1) + x) * (num_bays_y + 1) + y
+frame = regular_frame(num_bays_x, num_bays_y, num_stories, bay_width_x, bay_width_y, story_height)
+grid = np.stack(np.meshgrid(np.arange(num_stories + 1), np.arange(num_bays_x + 1), np.arange(num_bays_y + 1),
+                            indexing='ij'), axis=-1).reshape(-1, 3)
+node_tags = {tuple(key): tag for key, tag in zip(grid.tolist(), frame.node_tags.tolist())}
+
+# Add mass to nodes (except ground level)
+masses = np.zeros((len(frame.nodes), 6))
+masses[~frame.supports] = [100.0, 100.0, 100.0, 1.0, 1.0, 1.0]
+
+# Rigid floors: every floor follows the in-plane motion of one master node,
+# which roughly halves the equations of tall buildings
+rigid_floors = False
+diaphragm_levels = floor_levels(frame.nodes, frame.supports) if rigid_floors else None
+
+# Build the model: one section for columns and beams, one geomTransf per
+# member orientation, base nodes fixed
+section = {'A': A, 'E': E, 'G': G, 'J': J, 'Iy': Iy, 'Iz': Iz}
+builder = FrameModelBuilder(frame.nodes, frame.members, section, supports=frame.supports, masses=masses,
+                            diaphragm_levels=diaphragm_levels)
+
+# Preview: condensed stick model with one mass and one story element per
+# floor, ready in milliseconds before the full model is built
+start = time.perf_counter()
+stick = StickModel.from_builder(builder)
+stick_time = time.perf_counter() - start
+print(format_stick(stick, elapsed=stick_time))
+
+# Build the model and run the eigenvalue analysis; an unchanged model reuses
+# the modes and matrix statistics cached in .frame_cache
 num_modes = 3
-eigenValues = ops.eigen(num_modes)
-periods = [2 * np.pi / np.sqrt(omega) for omega in eigenValues]
-print(f"Structure periods: {periods}")
-
-# Dynamic analysis parameters
-dt = 0.1
+model = cached_model(builder, num_modes)
+print(builder.format_report())
+print(format_cached(model))
+periods = model['periods']
+print(f"Structure periods: {periods.tolist()}")
+mode_shapes = model['shapes']
+print(format_comparison(compare_periods(stick, periods, mode_shapes, model['masses'], frame.nodes,
+                                        full_time=model['time'], stick_time=stick_time)))
+
+# Dynamic analysis parameters: results every output_dt, analysis step chosen
+# from the shortest period and the load frequency
+load_period = 2.0  # the Sine time series takes the period in seconds
+load_start, load_end = 0.0, 100.0  # the series is zero outside this time window
+load_factor = 1.0
+output_dt = 0.1
 duration = 5.0
-time_points = np.arange(0, duration + dt, dt)
-num_steps = len(time_points)
+dt = choose_time_step(periods, 1.0 / load_period, output_dt)
+stick_roof = stick.sway(np.arange(0.0, duration + output_dt / 2, output_dt), load_period)[:, -1]
+print(f"Stick preview: peak roof displacement {np.abs(stick_roof).max():.4f} m")
 
 # Create time series
-ops.timeSeries('Sine', 1, 0.0, 100.0, 2.0)  # 2.0 Hz frequency
+ops.timeSeries('Sine', 1, load_start, load_end, load_period, '-factor', load_factor)
 
 # Create load pattern
 ops.pattern('UniformExcitation', 1, 1, '-accel', 1)
@@ -172,125 +163,70 @@ ops.pattern('UniformExcitation', 1, 1, '-accel', 1)
 ops.wipeAnalysis()
 ops.algorithm('Newton')
 ops.integrator('Newmark', 0.5, 0.25)
+configure_solver(frame.nodes, frame.members, 6, frame.supports, mp_constraints=rigid_floors,
+                 statistics=model['statistics'])
 ops.analysis('Transient')
-ops.system('BandGeneral')
-ops.numberer('RCM')
-ops.constraints('Plain')
-
-# Store initial node coordinates
-node_coords = {}
-for floor in range(num_stories + 1):
-    for x in range(num_bays_x + 1):
-        for y in range(num_bays_y + 1):
-            node_tag = node_tags[(floor, x, y)]
-            node_coords[node_tag] = ops.nodeCoord(node_tag)
-
-# Run analysis and store displacements
-displacements = {}
-for node_tag in node_tags.values():
-    displacements[node_tag] = []
-
-for t in time_points:
-    ops.analyze(1, dt)
-    for node_tag in node_tags.values():
-        displacements[node_tag].append(ops.nodeDisp(node_tag))
-
-# Add these imports at the top of the file
-import matplotlib.animation as animation
-
-# Replace the animation section with this (everything after "# Animation"):
+
+# Run analysis; a binary recorder stores the displacements of all nodes
+recorder = RecorderResults('displacements.bin', list(node_tags.values())).start()
+driver = TransientDriver(dt, output_dt, duration)
+driver.run()
+print(driver.format_report())
+results = recorder.results().sample(driver.report['times'])
+time_points = results.times
+
+# Keep the model and results for replaying in plots, the web viewer and reports
+write_results('building_results.m2mr', frame, {'displacement': results},
+              {'model_hash': model['key'],
+               'load': f'UniformExcitation Sine period {load_period} s from {load_start} to {load_end} s, '
+                       f'factor {load_factor}',
+               'dt': dt, 'output_dt': output_dt, 'duration': duration},
+              arrays={'periods': periods, 'mode_shapes': mode_shapes})
+
+# Sway animation for the three.js viewer (upload with PUT /sway/{name} to the backend)
+write_sway('building_sway.m2ms', frame.nodes, frame.members, results)
+
 # Animation
 fig = plt.figure(figsize=(12, 8))
 ax = fig.add_subplot(111, projection='3d')
 scale_factor = 10  # Adjust this to make displacements visible
 
+# Deformed shape: one line collection per member direction (columns blue,
+# beams in x red, beams in y green) updated in place every frame
+directions = np.argmax(np.abs(frame.member_vectors()), axis=1)
+animator = FrameAnimator(ax, frame.nodes, frame.members, results.values, classes=directions,
+                         styles={2: {'colors': 'b'}, 0: {'colors': 'r'}, 1: {'colors': 'g'}},
+                         scale=scale_factor, times=time_points)
+ax.grid(True)
+ax.set_xlabel('X (m)')
+ax.set_ylabel('Y (m)')
+ax.set_zlabel('Z (m)')
+ax.set_title('Dynamic Response')
 
-def update(frame):
-    ax.clear()
-    ax.grid(True)
-    ax.set_xlabel('X (m)')
-    ax.set_ylabel('Y (m)')
-    ax.set_zlabel('Z (m)')
-    ax.set_title(f'Dynamic Response at t = {time_points[frame]:.2f} s')
-
-    # Plot deformed shape
-    # Columns
-    for floor in range(num_stories):
-        for x in range(num_bays_x + 1):
-            for y in range(num_bays_y + 1):
-                node1 = node_tags[(floor, x, y)]
-                node2 = node_tags[(floor + 1, x, y)]
-
-                # Get original coordinates and add displacements
-                x1, y1, z1 = node_coords[node1]
-                x2, y2, z2 = node_coords[node2]
-
-                dx1, dy1, dz1 = displacements[node1][frame][:3]
-                dx2, dy2, dz2 = displacements[node2][frame][:3]
-
-                ax.plot([x1 + scale_factor * dx1, x2 + scale_factor * dx2],
-                        [y1 + scale_factor * dy1, y2 + scale_factor * dy2],
-                        [z1 + scale_factor * dz1, z2 + scale_factor * dz2], 'b-', linewidth=2)
-
-    # Beams in X direction
-    for floor in range(1, num_stories + 1):
-        for x in range(num_bays_x):
-            for y in range(num_bays_y + 1):
-                node1 = node_tags[(floor, x, y)]
-                node2 = node_tags[(floor, x + 1, y)]
-
-                x1, y1, z1 = node_coords[node1]
-                x2, y2, z2 = node_coords[node2]
-
-                dx1, dy1, dz1 = displacements[node1][frame][:3]
-                dx2, dy2, dz2 = displacements[node2][frame][:3]
-
-                ax.plot([x1 + scale_factor * dx1, x2 + scale_factor * dx2],
-                        [y1 + scale_factor * dy1, y2 + scale_factor * dy2],
-                        [z1 + scale_factor * dz1, z2 + scale_factor * dz2], 'r-', linewidth=2)
-
-    # Beams in Y direction
-    for floor in range(1, num_stories + 1):
-        for x in range(num_bays_x + 1):
-            for y in range(num_bays_y):
-                node1 = node_tags[(floor, x, y)]
-                node2 = node_tags[(floor, x, y + 1)]
-
-                x1, y1, z1 = node_coords[node1]
-                x2, y2, z2 = node_coords[node2]
-
-                dx1, dy1, dz1 = displacements[node1][frame][:3]
-                dx2, dy2, dz2 = displacements[node2][frame][:3]
-
-                ax.plot([x1 + scale_factor * dx1, x2 + scale_factor * dx2],
-                        [y1 + scale_factor * dy1, y2 + scale_factor * dy2],
-                        [z1 + scale_factor * dz1, z2 + scale_factor * dz2], 'g-', linewidth=2)
-
-    # Set axis limits
-    ax.set_xlim(-5, bay_width_x * (num_bays_x + 1) + 5)
-    ax.set_ylim(-5, bay_width_y * (num_bays_y + 1) + 5)
-    ax.set_zlim(-1, story_height * (num_stories + 1))
-
-    # Set equal aspect ratio
-    ax.set_box_aspect([1, 1, 1])
+# Set axis limits
+ax.set_xlim(-5, bay_width_x * (num_bays_x + 1) + 5)
+ax.set_ylim(-5, bay_width_y * (num_bays_y + 1) + 5)
+ax.set_zlim(-1, story_height * (num_stories + 1))
 
-    # Set viewing angle
-    ax.view_init(elev=20, azim=45)  # You can adjust these angles
+# Set equal aspect ratio
+ax.set_box_aspect([1, 1, 1])
 
-    return ax,
+# Set viewing angle
+ax.view_init(elev=20, azim=45)  # You can adjust these angles
 
 
 # Create animation
-anim = animation.FuncAnimation(fig, update, frames=len(time_points),
-                               interval=20, blit=False)
+anim = animator.animation(fig, interval=20)
 
 # Save animation
 print("Saving animation... This might take a few minutes...")
 
-# Save as MP4
-# anim.save('building_dynamic.mp4', writer='ffmpeg', fps=30)
+# Save as MP4 (frames are rendered on all cores, needs ffmpeg; import
+# export_animation from frame_export and model_hash from frame_store first)
+# key = model_hash(frame.nodes, frame.members, displacement=results.values)
+# export_animation(fig, animator.update, len(time_points), 'building_dynamic.mp4', fps=30, key=key)
 
 # Save as GIF (optional)
-# anim.save('building_dynamic.gif', writer='pillow', fps=30)
+# export_animation(fig, animator.update, len(time_points), 'building_dynamic.gif', fps=30, key=key)
 
 plt.show()
\ No newline at end of file
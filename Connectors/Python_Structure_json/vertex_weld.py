@@ -0,0 +1,108 @@
+"""Tolerance-based vertex welding with spatial hashing
+
+Shared by the geometry validation (hackathon-backend/json_scripts) and the
+JSON -> frame conversion (Connectors/Python_Structure_json), which keep
+identical copies of this module.
+"""
+import numpy as np
+
+# Offsets of the 3x3x3 block of grid cells around a cell
+NEIGHBOR_CELLS = np.stack(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1], indexing='ij'), axis=-1).reshape(-1, 3)
+
+
+def weld_pairs(vertices, tolerance):
+    """All pairs (i, j), i < j, of vertices closer than tolerance
+
+    Vertices are hashed into cells of size tolerance, so every vertex closer
+    than tolerance lies in the 3x3x3 block of cells around a vertex's cell.
+    A pair of cells is visited once, from the cell with the lower offset,
+    one offset at a time to bound memory. Cells are keyed by their linear
+    index in the (padded) grid when that fits into an int64, otherwise by
+    records of three int64 that sort and compare field by field.
+    """
+    empty = np.empty(0, dtype=np.int64)
+    if len(vertices) < 2:
+        return empty, empty
+
+    cells = np.floor(vertices / tolerance).astype(np.int64)
+    low = cells.min(axis=0) - 1
+    dims = cells.max(axis=0) - low + 2
+    if np.prod(dims.astype(np.float64)) < 2.0 ** 62:
+        strides = np.array([dims[1] * dims[2], dims[2], 1])
+        keys = (cells - low) @ strides
+
+        def neighbor_keys(offset):
+            return keys + offset @ strides
+    else:
+        record = np.dtype([('x', '<i8'), ('y', '<i8'), ('z', '<i8')])
+
+        def neighbor_keys(offset):
+            return np.ascontiguousarray(cells + offset).view(record)[:, 0]
+        keys = neighbor_keys(np.zeros(3, dtype=np.int64))
+
+    order = np.argsort(keys, kind='stable')
+    occupied, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+
+    first, second = [], []
+    # The zero offset and one of every pair of opposite offsets
+    for offset in NEIGHBOR_CELLS[len(NEIGHBOR_CELLS) // 2:]:
+        neighbor = neighbor_keys(offset)
+        slot = np.minimum(np.searchsorted(occupied, neighbor), len(occupied) - 1)
+        found = np.flatnonzero(occupied[slot] == neighbor)
+        slot = slot[found]
+        a = np.repeat(found, counts[slot])
+        local = np.arange(len(a)) - np.repeat(np.cumsum(counts[slot]) - counts[slot], counts[slot])
+        b = order[np.repeat(starts[slot], counts[slot]) + local]
+        keep = (a < b) if not offset.any() else np.ones(len(a), dtype=bool)
+        keep &= np.linalg.norm(vertices[a] - vertices[b], axis=1) <= tolerance
+        first.append(np.minimum(a[keep], b[keep]))
+        second.append(np.maximum(a[keep], b[keep]))
+    return np.concatenate(first), np.concatenate(second)
+
+
+def connected_roots(count, first, second):
+    """Lowest index in the connected component of every node of an edge list
+
+    Union-find as label propagation: both ends of every edge take the
+    smaller label, then labels jump to their label's label, until nothing
+    changes. Symmetric in the edge ends, so the result does not depend on
+    the edge or node order.
+    """
+    labels = np.arange(count)
+    while True:
+        smaller = np.minimum(labels[first], labels[second])
+        updated = labels.copy()
+        np.minimum.at(updated, first, smaller)
+        np.minimum.at(updated, second, smaller)
+        updated = updated[updated]
+        while True:
+            jumped = updated[updated]
+            if np.array_equal(jumped, updated):
+                break
+            updated = jumped
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def weld_vertices(vertices, tolerance):
+    """Map every vertex to a canonical vertex within tolerance (spatial hashing)
+
+    Vertices closer than tolerance are joined, and so are chains of them;
+    every vertex maps to the lowest index of its cluster. Identical vertices
+    are merged first, so shared corners cost nothing. The result does not
+    depend on the vertex order.
+
+    Returns an index array: canonical[n] is the vertex that vertex n welds to.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+    count = len(vertices)
+    if count == 0:
+        return np.arange(0)
+
+    points, first_index, inverse = np.unique(vertices, axis=0, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    roots = connected_roots(len(points), *weld_pairs(points, tolerance))
+    lowest = np.full(len(points), count)
+    np.minimum.at(lowest, roots, first_index)
+    return lowest[roots[inverse]]
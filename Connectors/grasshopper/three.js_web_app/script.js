@@ -29,6 +29,42 @@ controls.maxDistance = 50;
 // Set the camera position for better view
 camera.position.set(0, 5, 20);
 
+// Aim the camera at objects and let the view reach all of them; a tall
+// building needs a larger zoom range and far plane than the sample model
+function frameObject(...objects) {
+    const box = new THREE.Box3();
+    const matrix = new THREE.Matrix4();
+    objects.forEach((object) => {
+        object.updateMatrixWorld(true);
+        object.traverse((child) => {
+            if (!child.geometry) {
+                return;
+            }
+            // Box3.setFromObject only sees the prototype of an InstancedMesh
+            child.geometry.computeBoundingBox();
+            const count = child.isInstancedMesh ? child.count : 1;
+            for (let n = 0; n < count; n++) {
+                if (child.isInstancedMesh) {
+                    child.getMatrixAt(n, matrix);
+                    matrix.premultiply(child.matrixWorld);
+                } else {
+                    matrix.copy(child.matrixWorld);
+                }
+                box.union(child.geometry.boundingBox.clone().applyMatrix4(matrix));
+            }
+        });
+    });
+    const center = box.getCenter(new THREE.Vector3());
+    const radius = box.getSize(new THREE.Vector3()).length() / 2;
+    const distance = radius / Math.sin((camera.fov * Math.PI) / 360);
+
+    controls.target.copy(center);
+    camera.position.copy(center).add(new THREE.Vector3(1, 0.5, 1).normalize().multiplyScalar(distance));
+    controls.maxDistance = Math.max(controls.maxDistance, 4 * distance);
+    camera.far = Math.max(camera.far, 10 * distance);
+    camera.updateProjectionMatrix();
+}
+
 function loadModel(filePath, position, scale, rotation) {
     const loader = new THREE.GLTFLoader();
     loader.load(
@@ -62,6 +98,385 @@ function loadModel(filePath, position, scale, rotation) {
     );
 }
 
+// Colors per component category (openings use their type)
+const instanceColors = {
+    walls: 0xd3d3d3,
+    floors: 0xadd8e6,
+    columns: 0xa9a9a9,
+    beams: 0xa52a2a,
+    door: 0xff0000,
+    window: 0x87ceeb
+};
+
+// Load a building exported with instancing.to_threejs: every repeated
+// component is drawn as one THREE.InstancedMesh (one draw call per group);
+// repeated columns and beams become one THREE.LineSegments per group
+function loadInstancedBuilding(url) {
+    return fetch(url)
+        .then((response) => response.json())
+        .then((data) => {
+            const building = new THREE.Group();
+            // The building JSON is z-up, three.js is y-up
+            if (data.up === 'z') {
+                building.rotation.x = -Math.PI / 2;
+            }
+
+            data.instancedMeshes.forEach((group) => {
+                if (group.primitive === 'lines') {
+                    building.add(createInstancedLines(group));
+                    return;
+                }
+
+                const geometry = new THREE.BufferGeometry();
+                geometry.setAttribute('position', new THREE.Float32BufferAttribute(group.positions, 3));
+                geometry.setIndex(group.indices);
+                geometry.computeVertexNormals();
+
+                const material = new THREE.MeshStandardMaterial({
+                    color: instanceColors[group.type] || instanceColors[group.category] || 0xcccccc,
+                    side: THREE.DoubleSide,
+                    transparent: group.category === 'walls',
+                    opacity: group.category === 'walls' ? 0.5 : 1.0
+                });
+
+                const count = group.ids.length;
+                const mesh = new THREE.InstancedMesh(geometry, material, count);
+                const matrix = new THREE.Matrix4();
+                for (let n = 0; n < count; n++) {
+                    matrix.fromArray(group.matrices, n * 16);
+                    mesh.setMatrixAt(n, matrix);
+                }
+                mesh.instanceMatrix.needsUpdate = true;
+                mesh.userData.ids = group.ids;
+                building.add(mesh);
+            });
+
+            scene.add(building);
+            // Components that are not repeated go through the live geometry path
+            addComponents(data.components || {});
+            return building;
+        });
+}
+
+// Line instances are transformed on the CPU: there is no instanced line
+// primitive, but every copy still shares one geometry and draw call
+function createInstancedLines(group) {
+    const count = group.ids.length;
+    const points = group.indices.length;
+    const positions = new Float32Array(count * points * 3);
+    const matrix = new THREE.Matrix4();
+    const point = new THREE.Vector3();
+    for (let n = 0; n < count; n++) {
+        matrix.fromArray(group.matrices, n * 16);
+        group.indices.forEach((index, k) => {
+            point.fromArray(group.positions, index * 3).applyMatrix4(matrix);
+            point.toArray(positions, (n * points + k) * 3);
+        });
+    }
+
+    const geometry = new THREE.BufferGeometry();
+    geometry.setAttribute('position', new THREE.BufferAttribute(positions, 3));
+    const color = instanceColors[group.type] || instanceColors[group.category] || 0xcccccc;
+    const lines = new THREE.LineSegments(geometry, new THREE.LineBasicMaterial({ color: color }));
+    lines.userData.ids = group.ids;
+    return lines;
+}
+
+// Live geometry from the backend push channel (/ws/geometry/{buildingId}):
+// one mesh per component, keyed by id, so a patch only touches the
+// components that were added, modified or removed
+const liveComponents = new Map();
+const liveBuilding = new THREE.Group();
+liveBuilding.rotation.x = -Math.PI / 2; // building JSON is z-up
+scene.add(liveBuilding);
+
+function componentColor(category, component) {
+    return instanceColors[component.type] || instanceColors[category] || 0xcccccc;
+}
+
+function createComponentObject(category, component) {
+    const points = component.vertices.map((v) => new THREE.Vector3(v.x, v.y, v.z));
+
+    // Columns and beams are drawn as lines between their end points
+    if (points.length < 3) {
+        const geometry = new THREE.BufferGeometry().setFromPoints(points);
+        return new THREE.Line(geometry, new THREE.LineBasicMaterial({ color: componentColor(category, component) }));
+    }
+
+    // Triangulate the polygon in the plane it is most parallel to
+    const normal = new THREE.Vector3();
+    points.forEach((p, n) => normal.add(new THREE.Vector3().crossVectors(p, points[(n + 1) % points.length])));
+    const axis = ['x', 'y', 'z'].reduce((a, b) => (Math.abs(normal[a]) >= Math.abs(normal[b]) ? a : b));
+    const [u, v] = ['x', 'y', 'z'].filter((a) => a !== axis);
+    const faces = THREE.ShapeUtils.triangulateShape(points.map((p) => new THREE.Vector2(p[u], p[v])), []);
+
+    const geometry = new THREE.BufferGeometry().setFromPoints(points);
+    geometry.setIndex(faces.flat());
+    geometry.computeVertexNormals();
+    const material = new THREE.MeshStandardMaterial({
+        color: componentColor(category, component),
+        side: THREE.DoubleSide,
+        transparent: category === 'walls',
+        opacity: category === 'walls' ? 0.5 : 1.0
+    });
+    return new THREE.Mesh(geometry, material);
+}
+
+function removeComponent(id) {
+    const object = liveComponents.get(id);
+    if (object) {
+        liveBuilding.remove(object);
+        object.geometry.dispose();
+        object.material.dispose();
+        liveComponents.delete(id);
+    }
+}
+
+function addComponents(changes) {
+    Object.entries(changes).forEach(([category, components]) => {
+        components.forEach((component) => {
+            removeComponent(component.id);
+            const object = createComponentObject(category, component);
+            liveComponents.set(component.id, object);
+            liveBuilding.add(object);
+        });
+    });
+}
+
+function connectGeometryStream(url) {
+    const socket = new WebSocket(url);
+    let version = null;
+
+    socket.onmessage = (event) => {
+        const message = JSON.parse(event.data);
+        if (message.type === 'snapshot') {
+            Array.from(liveComponents.keys()).forEach(removeComponent);
+            const components = {};
+            Object.entries(message.geometry.components).forEach(([category, items]) => {
+                if (Array.isArray(items) && category !== 'instances') {
+                    components[category] = items;
+                }
+            });
+            addComponents(components);
+            version = message.hash;
+        } else if (message.type === 'patch') {
+            const patch = message.patch;
+            // A patch for another version means an update was missed
+            if (patch.from !== version || Object.keys(patch.replaced).length > 0) {
+                socket.send(JSON.stringify({ type: 'resync' }));
+                return;
+            }
+            Object.values(patch.removed).forEach((ids) => ids.forEach(removeComponent));
+            addComponents(patch.modified);
+            addComponents(patch.added);
+            version = patch.to;
+        }
+    };
+
+    socket.onerror = (error) => {
+        console.error('Geometry stream error:', error);
+    };
+    return socket;
+}
+
+// Typed array per dtype string of the binary geometry container (.m2mg)
+const containerDtypes = {
+    '|i1': Int8Array, '|u1': Uint8Array,
+    '<i2': Int16Array, '<u2': Uint16Array,
+    '<i4': Int32Array, '<u4': Uint32Array,
+    '<i8': BigInt64Array, '<u8': BigUint64Array
+};
+
+function containerBlock(payload, block) {
+    // slice() copies the bytes, so the typed array is always aligned
+    const bytes = payload.slice(block.offset, block.offset + block.size);
+    return Array.from(new containerDtypes[block.dtype](bytes.buffer), Number);
+}
+
+// Load a building from the quantized binary container written by
+// geometry_codec.py: JSON header, then a zlib stream with the meta block and
+// delta encoded integer coordinates per category
+async function loadCompressedBuilding(url) {
+    const buffer = await (await fetch(url)).arrayBuffer();
+    const view = new DataView(buffer);
+    if (new TextDecoder().decode(new Uint8Array(buffer, 0, 4)) !== 'M2MG') {
+        throw new Error('Not a geometry container: ' + url);
+    }
+    const headerSize = view.getUint32(4, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerSize)));
+
+    const stream = new Blob([new Uint8Array(buffer, 8 + headerSize)]).stream()
+        .pipeThrough(new DecompressionStream('deflate'));
+    const payload = new Uint8Array(await new Response(stream).arrayBuffer());
+
+    const metaBytes = payload.subarray(header.meta.offset, header.meta.offset + header.meta.size);
+    const meta = JSON.parse(new TextDecoder().decode(metaBytes));
+    const [ox, oy, oz] = header.origin;
+    const step = header.precision;
+
+    const components = {};
+    header.categories.forEach((entry) => {
+        const counts = containerBlock(payload, entry.counts);
+        const deltas = containerBlock(payload, entry.coords);
+        const items = meta.categories[entry.name];
+        let x = 0, y = 0, z = 0, d = 0;
+        components[entry.name] = items.map((extra, n) => {
+            const vertices = [];
+            for (let c = 0; c < counts[n]; c++, d += 3) {
+                x += deltas[d]; y += deltas[d + 1]; z += deltas[d + 2];
+                vertices.push({ x: ox + x * step, y: oy + y * step, z: oz + z * step });
+            }
+            return Object.assign({}, extra, { vertices: vertices });
+        });
+    });
+
+    addComponents(components);
+    return header;
+}
+
+// Typed array per dtype string of the sway animation container (.m2ms);
+// float16 values are read as raw bits and converted with halfToFloat
+const swayDtypes = Object.assign({ '<f4': Float32Array, '<f2': Uint16Array }, containerDtypes);
+
+function swayBlock(payload, block) {
+    // slice() copies the bytes, so the typed array is always aligned
+    const bytes = payload.slice(block.offset, block.offset + block.size);
+    return new swayDtypes[block.dtype](bytes.buffer);
+}
+
+function halfToFloat(bits) {
+    const sign = bits & 0x8000 ? -1 : 1;
+    const exponent = (bits >> 10) & 0x1f;
+    const fraction = bits & 0x3ff;
+    if (exponent === 0) {
+        return sign * Math.pow(2, -14) * (fraction / 1024);
+    }
+    if (exponent === 0x1f) {
+        return fraction ? NaN : sign * Infinity;
+    }
+    return sign * Math.pow(2, exponent - 15) * (1 + fraction / 1024);
+}
+
+// Sway animations being played, updated every rendered frame
+const swayAnimations = [];
+
+// Load a sway animation from the backend (/sway/{name}, written by
+// frame_sway.py): the frame is drawn once as line segments and every
+// rendered frame moves the vertices to coordinates + displacements,
+// interpolated between the stored frames so playback runs at the display rate
+async function loadSwayAnimation(url, amplification = 1, speed = 1) {
+    const buffer = await (await fetch(url)).arrayBuffer();
+    const view = new DataView(buffer);
+    if (new TextDecoder().decode(new Uint8Array(buffer, 0, 4)) !== 'M2MS') {
+        throw new Error('Not a sway animation: ' + url);
+    }
+    const headerSize = view.getUint32(4, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerSize)));
+
+    const stream = new Blob([new Uint8Array(buffer, 8 + headerSize)]).stream()
+        .pipeThrough(new DecompressionStream('deflate'));
+    const payload = new Uint8Array(await new Response(stream).arrayBuffer());
+
+    const nodes = swayBlock(payload, header.nodes);
+    const width = header.components.length;
+    const sway = {
+        header: header,
+        nodes: nodes,
+        times: swayBlock(payload, header.times),
+        frames: null,
+        shapes: null,
+        coefficients: null,
+        values: new Float32Array(header.nodeCount * width),
+        amplification: amplification,
+        speed: speed,
+        start: performance.now()
+    };
+
+    // Quantized displacements are expanded once to (frames, nodes * width) floats
+    if (header.encoding === 'modal') {
+        sway.shapes = swayBlock(payload, header.shapes);
+        sway.coefficients = swayBlock(payload, header.coefficients);
+    } else {
+        const raw = swayBlock(payload, header.displacements);
+        sway.frames = new Float32Array(raw.length);
+        for (let n = 0; n < raw.length; n++) {
+            if (header.encoding === 'float16') {
+                sway.frames[n] = halfToFloat(raw[n]);
+            } else if (header.encoding === 'int16') {
+                sway.frames[n] = raw[n] * header.scale[n % width];
+            } else {
+                sway.frames[n] = raw[n];
+            }
+        }
+    }
+
+    const geometry = new THREE.BufferGeometry();
+    geometry.setAttribute('position', new THREE.BufferAttribute(new Float32Array(nodes), 3));
+    geometry.setIndex(new THREE.BufferAttribute(swayBlock(payload, header.members), 1));
+    const lines = new THREE.LineSegments(geometry, new THREE.LineBasicMaterial({ color: 0x1f4e9c }));
+    lines.frustumCulled = false; // the bounding sphere of the undeformed frame does not move
+    if (header.up === 'z') {
+        lines.rotation.x = -Math.PI / 2;
+    }
+    scene.add(lines);
+
+    sway.geometry = geometry;
+    sway.lines = lines;
+    swayAnimations.push(sway);
+    return sway;
+}
+
+function updateSway(sway, now) {
+    const header = sway.header;
+    const times = sway.times;
+    const width = header.components.length;
+    const size = header.nodeCount * width;
+
+    // Stored frames around the playback time and the blend between them
+    const duration = times[times.length - 1] - times[0];
+    const t = times[0] + (duration > 0 ? (((now - sway.start) / 1000) * sway.speed) % duration : 0);
+    let lo = 0;
+    let hi = times.length - 1;
+    while (hi - lo > 1) {
+        const mid = (lo + hi) >> 1;
+        if (times[mid] <= t) {
+            lo = mid;
+        } else {
+            hi = mid;
+        }
+    }
+    const span = times[hi] - times[lo];
+    const w = span > 0 ? Math.min(Math.max((t - times[lo]) / span, 0), 1) : 0;
+
+    const values = sway.values;
+    if (sway.frames) {
+        const a = lo * size;
+        const b = hi * size;
+        for (let n = 0; n < size; n++) {
+            values[n] = sway.frames[a + n] * (1 - w) + sway.frames[b + n] * w;
+        }
+    } else {
+        const modes = header.modeCount;
+        values.fill(0);
+        for (let m = 0; m < modes; m++) {
+            const c = sway.coefficients[lo * modes + m] * (1 - w) + sway.coefficients[hi * modes + m] * w;
+            const offset = m * size;
+            for (let n = 0; n < size; n++) {
+                values[n] += c * sway.shapes[offset + n];
+            }
+        }
+    }
+
+    const positions = sway.geometry.attributes.position.array;
+    positions.set(sway.nodes);
+    for (let node = 0; node < header.nodeCount; node++) {
+        for (let c = 0; c < width; c++) {
+            positions[node * 3 + header.components[c]] += sway.amplification * values[node * width + c];
+        }
+    }
+    sway.geometry.attributes.position.needsUpdate = true;
+}
+
 // Define the models to load
 const models = [
     { file: './assets/model_whole.glb', position: {x: 0, y: 0, z: 0}, scale: {x: 1, y: 1, z: 1}, rotation: {x: 0, y: 0, z: 0} }
@@ -69,10 +484,53 @@ const models = [
     // { file: './assets/model3.glb', position: {x: -2, y: 1, z: 1}, scale: {x: 0.8, y: 0.8, z: 0.8}, rotation: {x: 0, y: 0, z: Math.PI / 2} }
 ];
 
+// Viewer options from the query string, e.g. index.html?building=tower_1
+const params = new URLSearchParams(window.location.search);
+// Backend serving the geometry endpoints (hackathon-backend/app/api.py)
+const apiBase = params.get('api') || 'http://127.0.0.1:8000';
+// Query parameters that load a building instead of the sample models
+const buildingSources = ['building', 'sway', 'instanced', 'compressed'];
+
+// Follow a stored building over the push channel: a snapshot first, then patches
+if (params.has('building')) {
+    const building = encodeURIComponent(params.get('building'));
+    connectGeometryStream(apiBase.replace(/^http/, 'ws') + '/ws/geometry/' + building);
+}
+
+// Load an instanced scene written by instancing.py, e.g. ?instanced=./assets/tower.threejs.json
+if (params.has('instanced')) {
+    loadInstancedBuilding(params.get('instanced'))
+        .then((building) => frameObject(building, liveBuilding))
+        .catch((error) => {
+            console.error('An error occurred while loading the instanced building:', error);
+        });
+}
+
+// Load a binary geometry container written by geometry_codec.py, e.g. ?compressed=./assets/tower.m2mg
+if (params.has('compressed')) {
+    loadCompressedBuilding(params.get('compressed'))
+        .then(() => frameObject(liveBuilding))
+        .catch((error) => {
+            console.error('An error occurred while loading the compressed building:', error);
+        });
+}
+
+// Play a stored sway animation, e.g. ?sway=tower_1&amplification=50&speed=0.5
+if (params.has('sway')) {
+    const sway = encodeURIComponent(params.get('sway'));
+    loadSwayAnimation(apiBase + '/sway/' + sway, Number(params.get('amplification') || 1), Number(params.get('speed') || 1))
+        .then((animation) => frameObject(animation.lines))
+        .catch((error) => {
+            console.error('An error occurred while loading the sway animation:', error);
+        });
+}
+
 // Load all models
-models.forEach((modelData) => {
-    loadModel(modelData.file, modelData.position, modelData.scale, modelData.rotation);
-});
+if (!buildingSources.some((name) => params.has(name))) {
+    models.forEach((modelData) => {
+        loadModel(modelData.file, modelData.position, modelData.scale, modelData.rotation);
+    });
+}
 
 // Create a flat green plane under the models
 function addPlane() {
@@ -101,6 +559,10 @@ function animate() {
     // Update controls for smooth interaction
     controls.update();
 
+    // Move the sway animations to the current time
+    const now = performance.now();
+    swayAnimations.forEach((sway) => updateSway(sway, now));
+
     renderer.render(scene, camera);
 }
 
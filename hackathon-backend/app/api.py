@@ -1,6 +1,9 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from app.utils.image_to_3d import generate_3d_geometry
+from json_scripts.geometry_validation import validate_geometry
+from json_scripts.geometry_diff import diff_geometry, geometry_hash, is_empty
+from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import requests
@@ -18,6 +21,11 @@ logger = logging.getLogger(__name__)
 IMAGE_DIRECTORY = "Sample_Images"
 os.makedirs(IMAGE_DIRECTORY, exist_ok=True)  # Ensure the directory exists
 
+# Directory of the sway animations (.m2ms, written by frame_sway.py) served to the viewer
+SWAY_DIRECTORY = "Sway_Animations"
+SWAY_MAGIC = b"M2MS"
+os.makedirs(SWAY_DIRECTORY, exist_ok=True)
+
 # Initialize FastAPI app
 app = FastAPI()
 
@@ -39,6 +47,10 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+# Latest geometry version per buildingId and the viewers subscribed to it
+geometry_versions = {}
+geometry_subscribers = {}
+
 # Define the data model for incoming requests
 class PromptRequest(BaseModel):
     prompt: str
@@ -213,6 +225,185 @@ async def generate_3d_endpoint():
 
 
 
+@app.post("/validate-geometry/")
+async def validate_geometry_endpoint(geometry: dict, repair: bool = False, tolerance: float = 0.01):
+    """
+    API endpoint to validate (and optionally repair) building geometry JSON before it is served.
+
+    Args:
+        geometry (dict): Building geometry with "buildingId" and "components".
+        repair (bool): Return a repaired copy of the geometry as well.
+        tolerance (float): Distance in meters below which vertices are considered equal.
+
+    Returns:
+        dict: The validation report and, when repairing, the repaired geometry.
+    """
+    if "components" not in geometry:
+        raise HTTPException(status_code=422, detail="Geometry has no 'components'")
+
+    try:
+        report, repaired = validate_geometry(geometry, tolerance=tolerance, repair=repair)
+    except Exception as e:
+        logger.error(f"Geometry validation failed: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Geometry validation failed: {e}")
+
+    logger.debug(f"Validated geometry in {report['elapsed_ms']:.1f} ms: {report['summary']}")
+    response = {"report": report}
+    if repair:
+        response["geometry"] = repaired
+    return response
+
+
+@app.put("/geometry/{building_id}")
+async def update_geometry_endpoint(building_id: str, geometry: dict, repair: bool = True,
+                                   tolerance: float = 0.01):
+    """
+    API endpoint to store a new version of a building and push the changes to open viewers.
+
+    The geometry is validated inline before it is stored and served, and repaired
+    unless repair is false.
+
+    Args:
+        building_id (str): The buildingId of the geometry.
+        geometry (dict): The full new geometry with "components".
+        repair (bool): Store the repaired geometry instead of the input.
+        tolerance (float): Distance in meters below which vertices are considered equal.
+
+    Returns:
+        dict: The new version hash, a summary of the changed components and the validation report.
+    """
+    if "components" not in geometry:
+        raise HTTPException(status_code=422, detail="Geometry has no 'components'")
+
+    try:
+        report, geometry = validate_geometry(geometry, tolerance=tolerance, repair=repair)
+    except Exception as e:
+        logger.error(f"Geometry validation failed: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Geometry validation failed: {e}")
+    logger.debug(f"Validated {building_id} in {report['elapsed_ms']:.1f} ms: {report['summary']}")
+
+    geometry = dict(geometry, buildingId=building_id)
+    previous = geometry_versions.get(building_id)
+    geometry_versions[building_id] = geometry
+
+    if previous is None:
+        # Viewers that connected before the first version get it in full
+        version = geometry_hash(geometry)
+        await broadcast_geometry(building_id, {"type": "snapshot", "hash": version, "geometry": geometry})
+        logger.debug(f"Stored first geometry version of {building_id}")
+        return {"hash": version, "summary": None, "validation": report}
+
+    patch = diff_geometry(previous, geometry)
+    if not is_empty(patch):
+        # Only the delta goes out; viewers that missed a version resync on reconnect
+        await broadcast_geometry(building_id, {"type": "patch", "patch": patch})
+
+    logger.debug(f"Updated geometry {building_id}: {patch['summary']}")
+    return {"hash": patch["to"], "summary": patch["summary"], "validation": report}
+
+
+async def broadcast_geometry(building_id: str, message: dict):
+    """Send a message to every viewer of a building, dropping the ones that are gone."""
+    for websocket in list(geometry_subscribers.get(building_id, [])):
+        try:
+            await websocket.send_json(message)
+        except Exception as e:
+            logger.debug(f"Dropping geometry subscriber of {building_id}: {str(e)}")
+            geometry_subscribers[building_id].discard(websocket)
+
+
+@app.get("/geometry/{building_id}")
+async def get_geometry_endpoint(building_id: str):
+    """
+    API endpoint to fetch the latest full version of a building.
+
+    Args:
+        building_id (str): The buildingId of the geometry.
+
+    Returns:
+        dict: The version hash and the geometry.
+    """
+    if building_id not in geometry_versions:
+        raise HTTPException(status_code=404, detail=f"No geometry for {building_id}")
+    geometry = geometry_versions[building_id]
+    return {"hash": geometry_hash(geometry), "geometry": geometry}
+
+
+@app.websocket("/ws/geometry/{building_id}")
+async def geometry_stream(websocket: WebSocket, building_id: str):
+    """
+    Push channel for a viewer: a full snapshot on connect, then one patch per update.
+    """
+    await websocket.accept()
+    geometry = geometry_versions.get(building_id)
+    if geometry is not None:
+        await websocket.send_json({"type": "snapshot", "hash": geometry_hash(geometry), "geometry": geometry})
+
+    geometry_subscribers.setdefault(building_id, set()).add(websocket)
+    try:
+        while True:
+            # Viewers only send keep-alives or resync requests
+            message = await websocket.receive_json()
+            if message.get("type") == "resync" and building_id in geometry_versions:
+                geometry = geometry_versions[building_id]
+                await websocket.send_json({"type": "snapshot", "hash": geometry_hash(geometry), "geometry": geometry})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        geometry_subscribers.get(building_id, set()).discard(websocket)
+
+
+def sway_path(name: str) -> str:
+    """File of a sway animation; only plain names inside SWAY_DIRECTORY are allowed."""
+    if not re.fullmatch(r"[\w\-.]+", name) or name.startswith("."):
+        raise HTTPException(status_code=400, detail=f"Invalid animation name: {name}")
+    if not name.endswith(".m2ms"):
+        name += ".m2ms"
+    return os.path.join(SWAY_DIRECTORY, name)
+
+
+@app.put("/sway/{name}")
+async def upload_sway_endpoint(name: str, request: Request):
+    """
+    API endpoint to store a sway animation exported by the structural analysis.
+
+    Args:
+        name (str): Name of the animation, e.g. the buildingId.
+        request (Request): The raw .m2ms container as the request body.
+
+    Returns:
+        dict: The name and size of the stored animation.
+    """
+    blob = await request.body()
+    if blob[:4] != SWAY_MAGIC:
+        raise HTTPException(status_code=422, detail="Body is not a sway animation container")
+
+    path = sway_path(name)
+    partial = path + ".part"
+    with open(partial, "wb") as f:
+        f.write(blob)
+    os.replace(partial, path)  # viewers never read a half written file
+    logger.debug(f"Stored sway animation {path} ({len(blob)} bytes)")
+    return {"name": os.path.basename(path), "bytes": len(blob)}
+
+
+@app.get("/sway/{name}")
+async def get_sway_endpoint(name: str):
+    """
+    API endpoint to fetch a sway animation for the three.js viewer.
+
+    Args:
+        name (str): Name of the animation.
+
+    Returns:
+        FileResponse: The binary container; the viewer decodes it and animates the frames itself.
+    """
+    path = sway_path(name)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"No sway animation {name}")
+    return FileResponse(path, media_type="application/octet-stream")
+
+
 @app.get("/test-3d/")
 async def test_3d_endpoint():
     try:
@@ -0,0 +1,203 @@
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from figure_encoding import compact_figure
+from geometry_codec import EXTENSION
+from plot_structure import plot_building_geometry
+
+# Output formats that plotly can write without a browser
+IMAGE_FORMATS = ('png', 'jpg', 'jpeg', 'webp', 'svg', 'pdf')
+
+
+def collect_input_files(inputs):
+    """Expand directories and glob patterns into a sorted list of geometry files"""
+    files = set()
+
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            patterns = [os.path.join(pattern, '*.json'), os.path.join(pattern, '*' + EXTENSION)]
+        else:
+            patterns = [pattern]
+        for path in (p for pattern in patterns for p in glob.glob(pattern, recursive=True)):
+            if os.path.isfile(path):
+                files.add(os.path.abspath(path))
+
+    return sorted(files)
+
+
+def output_paths(json_file, output_dir, formats, base_dir=None):
+    """Map an input file to one output path per requested format
+
+    With an output_dir the input's directory relative to base_dir is kept,
+    so inputs from different directories with the same name do not collide.
+    """
+    stem = os.path.splitext(os.path.basename(json_file))[0]
+    target_dir = os.path.dirname(json_file)
+    if output_dir:
+        relative = os.path.relpath(target_dir, base_dir or target_dir)
+        target_dir = os.path.normpath(os.path.join(output_dir, relative))
+    return {fmt: os.path.join(target_dir, f"{stem}.{fmt}") for fmt in formats}
+
+
+def output_plan(json_files, output_dir, formats):
+    """Output paths of every input file; raises ValueError when two inputs share an output
+
+    That happens for inputs with the same stem in one directory, e.g.
+    building.json next to building.m2mg.
+    """
+    base_dir = os.path.commonpath([os.path.dirname(f) for f in json_files]) if json_files else None
+    plan = {}
+    owners = {}
+    for json_file in json_files:
+        outputs = output_paths(json_file, output_dir, formats, base_dir)
+        for path in outputs.values():
+            if path in owners:
+                raise ValueError(f"{owners[path]} and {json_file} would both be rendered to {path}")
+            owners[path] = json_file
+        plan[json_file] = outputs
+    return plan
+
+
+def is_up_to_date(json_file, outputs):
+    """True when every output exists and is newer than the input file"""
+    source_mtime = os.path.getmtime(json_file)
+    return all(
+        os.path.exists(path) and os.path.getmtime(path) >= source_mtime
+        for path in outputs.values()
+    )
+
+
+def render_file(json_file, outputs, width=1600, height=1000, compact=False, host_labels=False,
+                hover_labels=True):
+    """Render one geometry file to every requested output (runs in a worker)"""
+    start = time.perf_counter()
+
+    fig = plot_building_geometry(json_file, host_labels)
+    if compact:
+        fig = compact_figure(fig, hover_labels=hover_labels)
+    build_time = time.perf_counter() - start
+
+    for fmt, path in outputs.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if fmt == 'html':
+            fig.write_html(path, include_plotlyjs='cdn')
+        else:
+            # Static export needs the kaleido package on the render server
+            fig.write_image(path, format=fmt, width=width, height=height)
+
+    return {
+        'file': json_file,
+        'traces': len(fig.data),
+        'build_time': build_time,
+        'total_time': time.perf_counter() - start
+    }
+
+
+def render_batch(json_files, output_dir=None, formats=('html',), workers=None, force=False,
+                 width=1600, height=1000, compact=False, host_labels=False, hover_labels=True):
+    """Render many geometry files in parallel, skipping ones that are up to date
+
+    Returns a list of per-file result dicts with timings or the error message.
+    Raises ValueError before rendering when two inputs map to the same output.
+    """
+    results = []
+    jobs = {}
+    plan = output_plan(json_files, output_dir, formats)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for json_file, outputs in plan.items():
+            if not force and is_up_to_date(json_file, outputs):
+                result = {'file': json_file, 'status': 'skipped'}
+                results.append(result)
+                print_result(result)
+                continue
+            future = pool.submit(render_file, json_file, outputs, width, height, compact, host_labels,
+                                 hover_labels)
+            jobs[future] = json_file
+
+        for future in as_completed(jobs):
+            json_file = jobs[future]
+            try:
+                result = future.result()
+                result['status'] = 'ok'
+            except Exception as e:
+                result = {'file': json_file, 'status': 'failed', 'error': str(e)}
+            results.append(result)
+            print_result(result)
+
+    return results
+
+
+def print_result(result):
+    """Print a single line timing report for one file"""
+    name = os.path.basename(result['file'])
+    if result['status'] == 'ok':
+        print(f"[ok]      {name}: {result['traces']} traces, "
+              f"build {result['build_time']:.2f}s, total {result['total_time']:.2f}s")
+    elif result['status'] == 'failed':
+        print(f"[failed]  {name}: {result['error']}")
+    else:
+        print(f"[skipped] {name}: output is up to date")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render building geometry JSON files to HTML and/or static images without a GUI"
+    )
+    parser.add_argument('inputs', nargs='+',
+                        help="JSON files, directories or glob patterns (quote patterns with **)")
+    parser.add_argument('-o', '--output-dir', default=None,
+                        help="Directory for rendered files, keeping the input subdirectories "
+                             "(default: next to each input)")
+    parser.add_argument('-f', '--format', action='append', dest='formats',
+                        choices=('html',) + IMAGE_FORMATS,
+                        help="Output format, can be given several times (default: html)")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="Number of worker processes (default: number of CPUs)")
+    parser.add_argument('--force', action='store_true',
+                        help="Re-render even if the output is newer than the input")
+    parser.add_argument('--compact', action='store_true',
+                        help="Merge equally styled meshes and embed binary typed arrays")
+    parser.add_argument('--no-hover', action='store_false', dest='hover_labels',
+                        help="With --compact, drop the per-component hover text of merged meshes "
+                             "(the largest part of a compact figure)")
+    parser.add_argument('--host-labels', action='store_true',
+                        help="Name the host wall of every opening in its hover text")
+    parser.add_argument('--width', type=int, default=1600, help="Static image width in pixels")
+    parser.add_argument('--height', type=int, default=1000, help="Static image height in pixels")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    formats = tuple(dict.fromkeys(args.formats or ['html']))
+
+    json_files = collect_input_files(args.inputs)
+    if not json_files:
+        print("No JSON files found. Exiting...")
+        return 1
+
+    print(f"Rendering {len(json_files)} file(s) to {', '.join(formats)}...")
+    start = time.perf_counter()
+    try:
+        results = render_batch(json_files, args.output_dir, formats, args.workers, args.force,
+                               args.width, args.height, args.compact, args.host_labels,
+                               args.hover_labels)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+
+    rendered = sum(1 for r in results if r['status'] == 'ok')
+    skipped = sum(1 for r in results if r['status'] == 'skipped')
+    failed = sum(1 for r in results if r['status'] == 'failed')
+    print(f"\nDone in {elapsed:.2f}s: {rendered} rendered, {skipped} skipped, {failed} failed")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
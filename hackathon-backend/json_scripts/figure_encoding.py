@@ -0,0 +1,208 @@
+import base64
+import hashlib
+import json
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+# Mesh3d properties that define how a trace looks; traces that share all of
+# them can be drawn as one trace without changing the picture
+STYLE_KEYS = ('color', 'opacity', 'flatshading', 'lighting', 'lightposition', 'hoverinfo',
+              'showscale', 'alphahull', 'delaunayaxis')
+
+
+def encode_typed_array(values, dtype):
+    """Encode an array as a plotly base64 typed array spec ({'dtype', 'bdata'})"""
+    array = np.ascontiguousarray(values, dtype=dtype)
+    return {
+        'dtype': array.dtype.str.lstrip('<|='),
+        'bdata': base64.b64encode(array.tobytes()).decode('ascii')
+    }
+
+
+def index_dtype(vertex_count):
+    """Smallest unsigned integer type that can address vertex_count vertices"""
+    if vertex_count <= np.iinfo(np.uint8).max:
+        return np.uint8
+    if vertex_count <= np.iinfo(np.uint16).max:
+        return np.uint16
+    return np.uint32
+
+
+def decode_array(values):
+    """Turn plain lists, numpy arrays or typed array specs back into a numpy array"""
+    if isinstance(values, dict) and 'bdata' in values:
+        return np.frombuffer(base64.b64decode(values['bdata']), dtype=values['dtype'])
+    return np.asarray(values)
+
+
+def style_key(trace):
+    """Hashable key of the styling properties of a Mesh3d trace"""
+    plotly_json = trace.to_plotly_json()
+    return json.dumps({key: plotly_json.get(key) for key in STYLE_KEYS}, sort_keys=True,
+                      default=str)
+
+
+def merge_mesh_traces(traces, name=None, hover_labels=True, uid=None):
+    """Merge Mesh3d traces with identical styling into a single trace
+
+    Per-trace hover text becomes per-vertex hover text, so hovering still
+    identifies the individual component. With hover_labels=False the merged
+    trace only shows its legend name, which keeps the payload much smaller.
+    The uids of the merged traces and where their vertices start are kept in
+    meta, so single components can still be removed (see drop_components).
+    """
+    xs, ys, zs, i_all, j_all, k_all, hover = [], [], [], [], [], [], []
+    uids, offsets = [], [0]
+    offset = 0
+
+    for trace in traces:
+        x = decode_array(trace.x).astype(np.float64)
+        y = decode_array(trace.y).astype(np.float64)
+        z = decode_array(trace.z).astype(np.float64)
+        n = len(x)
+
+        if trace.i is None:
+            # Without explicit triangles plotly would triangulate the points
+            # on its own, which only works for traces drawn separately
+            raise ValueError(f"Cannot merge trace '{trace.name or trace.text}' without i/j/k")
+
+        xs.append(x)
+        ys.append(y)
+        zs.append(z)
+        i_all.append(decode_array(trace.i).astype(np.int64) + offset)
+        j_all.append(decode_array(trace.j).astype(np.int64) + offset)
+        k_all.append(decode_array(trace.k).astype(np.int64) + offset)
+        hover.extend([trace.text or trace.name or ''] * n)
+        offset += n
+        uids.append(trace.uid)
+        offsets.append(offset)
+
+    first = traces[0].to_plotly_json()
+    style = {key: first[key] for key in STYLE_KEYS if key in first}
+    if hover_labels:
+        style['hoverinfo'] = 'text'
+    else:
+        hover = None
+        style['hoverinfo'] = 'name'
+
+    return go.Mesh3d(
+        x=np.concatenate(xs),
+        y=np.concatenate(ys),
+        z=np.concatenate(zs),
+        i=np.concatenate(i_all),
+        j=np.concatenate(j_all),
+        k=np.concatenate(k_all),
+        hovertext=hover,
+        name=name or first.get('name'),
+        showlegend=name is not None,
+        uid=uid,
+        meta={'uids': uids, 'offsets': offsets},
+        **style
+    )
+
+
+def drop_components(trace, uids):
+    """Remove the components with the given uids from a merged trace in place
+
+    Returns the number of components left in the trace.
+    """
+    meta = trace.meta
+    counts = np.diff(meta['offsets'])
+    keep = np.array([uid not in uids for uid in meta['uids']], dtype=bool)
+    if keep.all() or not keep.any():
+        return int(keep.sum())
+
+    # Triangles never span components, so keeping the vertices of the kept
+    # components also keeps exactly their triangles
+    vertices = np.repeat(keep, counts)
+    index = np.cumsum(vertices) - 1
+    i, j, k = (decode_array(trace[axis]).astype(np.int64) for axis in ('i', 'j', 'k'))
+    triangles = vertices[i]
+    dtype = index_dtype(int(vertices.sum()))
+
+    update = {axis: encode_typed_array(decode_array(trace[axis])[vertices], np.float32)
+              for axis in ('x', 'y', 'z')}
+    update.update({axis: encode_typed_array(index[values[triangles]], dtype)
+                   for axis, values in (('i', i), ('j', j), ('k', k))})
+    if trace.hovertext is not None:
+        update['hovertext'] = [text for text, kept in zip(trace.hovertext, vertices) if kept]
+    update['meta'] = {
+        'uids': [uid for uid, kept in zip(meta['uids'], keep) if kept],
+        'offsets': [0] + np.cumsum(counts[keep]).tolist()
+    }
+    trace.update(update)
+    return int(keep.sum())
+
+
+def is_merged(trace):
+    """True for traces built by merge_mesh_traces"""
+    return isinstance(trace.meta, dict) and 'uids' in trace.meta
+
+
+def legend_name(trace):
+    """Legend label for a merged group, e.g. 'Window' for 'Window opening_3'"""
+    label = trace.name or trace.text or 'Mesh'
+    return str(label).split(' ')[0]
+
+
+def compact_figure(fig, merge=True, hover_labels=True):
+    """Return a copy of fig with deduplicated styling and binary typed arrays
+
+    Mesh3d traces with identical styling are merged into one trace per style
+    (merge=False keeps one trace per component, hover_labels=False drops the
+    per-component hover text of merged traces). Every merged trace has a uid
+    derived from its styling, so it keeps its uid between renders. Coordinates are stored as
+    float32 and triangle indices as the smallest unsigned integer type, both
+    as base64 typed arrays that plotly.js decodes without parsing JSON numbers.
+    """
+    traces = list(fig.data)
+    compact = go.Figure(layout=fig.layout)
+
+    if merge:
+        groups = {}
+        passthrough = []
+        for trace in traces:
+            if isinstance(trace, go.Mesh3d) and trace.i is not None:
+                groups.setdefault(style_key(trace), []).append(trace)
+            else:
+                passthrough.append(trace)
+
+        traces = passthrough + [
+            merge_mesh_traces(group, name=legend_name(group[0]), hover_labels=hover_labels,
+                              uid='merged-' + hashlib.sha1(key.encode()).hexdigest()[:12])
+            for key, group in groups.items()
+        ]
+
+    for trace in traces:
+        if isinstance(trace, go.Mesh3d):
+            trace = go.Mesh3d(trace)
+            n = len(decode_array(trace.x))
+            for axis in ('x', 'y', 'z'):
+                trace[axis] = encode_typed_array(decode_array(trace[axis]), np.float32)
+            if trace.i is not None:
+                dtype = index_dtype(n)
+                for axis in ('i', 'j', 'k'):
+                    trace[axis] = encode_typed_array(decode_array(trace[axis]), dtype)
+        compact.add_trace(trace)
+
+    return compact
+
+
+def write_compact_json(fig, path, merge=True, hover_labels=True):
+    """Write the compact figure JSON to path"""
+    compact = compact_figure(fig, merge=merge, hover_labels=hover_labels)
+    with open(path, 'w') as f:
+        f.write(pio.to_json(compact, validate=False))
+
+
+def write_compact_html(fig, path, merge=True, hover_labels=True, plotly_js='cdn'):
+    """Write the compact figure as HTML that loads plotly.js from plotly_js
+
+    plotly_js can be 'cdn' (the plotly.js version matching the installed
+    plotly), 'directory' (expects plotly.min.js next to the HTML file) or any
+    URL/path ending in '.js'.
+    """
+    compact = compact_figure(fig, merge=merge, hover_labels=hover_labels)
+    compact.write_html(path, include_plotlyjs=plotly_js)
@@ -0,0 +1,311 @@
+"""
+Quantized binary container for the building geometry JSON
+
+Layout of a .m2mg file:
+
+    b'M2MG'                      magic
+    uint32 (little endian)       length of the JSON header
+    header                       UTF-8 JSON, see encode_geometry()
+    payload                      one zlib stream with the meta JSON block and,
+                                 per category, the vertex counts and the
+                                 delta encoded integer coordinates
+
+Coordinates are stored as integers in units of `precision` meters relative
+to the bounding box minimum, so decoding is exact up to precision / 2.
+"""
+import argparse
+import json
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+
+MAGIC = b'M2MG'
+VERSION = 1
+EXTENSION = '.m2mg'
+# Suffix of decoded containers, so decoding never replaces the source JSON
+DECODED_SUFFIX = '.decoded.json'
+
+# Default quantization step in meters (1 mm)
+DEFAULT_PRECISION = 0.001
+
+
+def smallest_int_dtype(values, signed=True):
+    """Smallest little-endian integer dtype that holds all values"""
+    candidates = ('<i1', '<i2', '<i4', '<i8') if signed else ('<u1', '<u2', '<u4', '<u8')
+    if len(values) == 0:
+        return np.dtype(candidates[0])
+    low, high = int(values.min()), int(values.max())
+    for name in candidates:
+        info = np.iinfo(name)
+        if info.min <= low and high <= info.max:
+            return np.dtype(name)
+    raise OverflowError("Values do not fit in 64 bits")
+
+
+def delta_encode(quantized):
+    """Differences between consecutive vertices (first vertex kept as is)"""
+    deltas = np.empty_like(quantized)
+    if len(quantized):
+        deltas[0] = quantized[0]
+        deltas[1:] = quantized[1:] - quantized[:-1]
+    return deltas
+
+
+def category_arrays(components):
+    """Vertex counts and (V, 3) coordinates of one category"""
+    counts = np.array([len(c['vertices']) for c in components], dtype=np.int64)
+    coords = np.array([(v['x'], v['y'], v['z']) for c in components for v in c['vertices']],
+                      dtype=np.float64).reshape(-1, 3)
+    return counts, coords
+
+
+def encode_geometry(data, precision=DEFAULT_PRECISION, level=6):
+    """Encode a geometry dict into the binary container, returns bytes
+
+    The header holds the buildingId, the quantization (precision, origin)
+    and the byte ranges of every block inside the decompressed payload:
+
+        {'format', 'version', 'buildingId', 'precision', 'origin',
+         'meta': {'offset', 'size'},
+         'categories': [{'name', 'count',
+                         'counts': {'dtype', 'offset', 'size'},
+                         'coords': {'dtype', 'offset', 'size'}}, ...]}
+
+    The meta block is JSON with everything that is not a vertex: ids, other
+    component keys (type, holes, ...), non-list component entries and the
+    top-level keys besides 'components'.
+    """
+    components = data.get('components', {})
+    categories = [key for key, value in components.items()
+                  if isinstance(value, list) and all('vertices' in c for c in value)]
+
+    arrays = {name: category_arrays(components[name]) for name in categories}
+    all_coords = [coords for _, coords in arrays.values() if len(coords)]
+    origin = np.vstack(all_coords).min(axis=0) if all_coords else np.zeros(3)
+    origin = np.floor(origin / precision) * precision
+
+    meta = {
+        'data': {key: value for key, value in data.items() if key != 'components'},
+        'components': {key: value for key, value in components.items() if key not in categories},
+        'categories': {
+            name: [{key: value for key, value in c.items() if key != 'vertices'}
+                   for c in components[name]]
+            for name in categories
+        }
+    }
+    meta_bytes = json.dumps(meta, separators=(',', ':')).encode('utf-8')
+
+    blocks = [meta_bytes]
+    offset = len(meta_bytes)
+    header_categories = []
+
+    for name in categories:
+        counts, coords = arrays[name]
+        quantized = np.round((coords - origin) / precision).astype(np.int64)
+        deltas = delta_encode(quantized)
+
+        entry = {'name': name, 'count': len(counts)}
+        for key, values, signed in (('counts', counts, False), ('coords', deltas, True)):
+            dtype = smallest_int_dtype(values, signed)
+            raw = values.astype(dtype).tobytes()
+            entry[key] = {'dtype': dtype.str, 'offset': offset, 'size': len(raw)}
+            blocks.append(raw)
+            offset += len(raw)
+        header_categories.append(entry)
+
+    header = {
+        'format': 'm2mg',
+        'version': VERSION,
+        'buildingId': data.get('buildingId'),
+        'precision': precision,
+        'origin': origin.tolist(),
+        'meta': {'offset': 0, 'size': len(meta_bytes)},
+        'categories': header_categories
+    }
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    payload = zlib.compress(b''.join(blocks), level)
+    return MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes + payload
+
+
+def read_container(blob):
+    """Split a container into (header, decompressed payload)"""
+    if blob[:4] != MAGIC:
+        raise ValueError("Not a geometry container (bad magic)")
+    header_size = struct.unpack('<I', blob[4:8])[0]
+    header = json.loads(blob[8:8 + header_size].decode('utf-8'))
+    if header.get('version', 0) > VERSION:
+        raise ValueError(f"Unsupported container version {header['version']}")
+    payload = zlib.decompress(blob[8 + header_size:])
+    return header, payload
+
+
+def block_array(payload, block):
+    return np.frombuffer(payload, dtype=block['dtype'], count=block['size'] // np.dtype(block['dtype']).itemsize,
+                         offset=block['offset'])
+
+
+def decode_arrays(blob):
+    """Decode to arrays only: {category: (counts, (V, 3) float64 coords)}
+
+    This is the fast path for renderers that take flat vertex arrays and
+    never need per-vertex dicts.
+    """
+    header, payload = read_container(blob)
+    precision = header['precision']
+    origin = np.asarray(header['origin'], dtype=np.float64)
+
+    arrays = {}
+    for entry in header['categories']:
+        counts = block_array(payload, entry['counts']).astype(np.int64)
+        deltas = block_array(payload, entry['coords']).astype(np.int64).reshape(-1, 3)
+        coords = np.cumsum(deltas, axis=0) * precision + origin
+        arrays[entry['name']] = (counts, coords)
+    return header, payload, arrays
+
+
+def decode_geometry(blob, decimals=None):
+    """Decode a container back into the geometry dict of the JSON schema
+
+    Coordinates are rounded to the number of decimals of the precision
+    (pass decimals to override), so 1 mm data comes back as e.g. 2.345.
+    """
+    header, payload, arrays = decode_arrays(blob)
+    if decimals is None:
+        decimals = max(0, int(np.ceil(-np.log10(header['precision']))))
+
+    meta_block = header['meta']
+    meta = json.loads(payload[meta_block['offset']:meta_block['offset'] + meta_block['size']])
+
+    components = {}
+    for entry in header['categories']:
+        counts, coords = arrays[entry['name']]
+        points = np.round(coords, decimals).tolist()
+        starts = np.concatenate([[0], np.cumsum(counts)]).tolist()
+        items = []
+        for n, extra in enumerate(meta['categories'][entry['name']]):
+            component = dict(extra)
+            component['vertices'] = [{'x': x, 'y': y, 'z': z} for x, y, z in points[starts[n]:starts[n + 1]]]
+            items.append(component)
+        components[entry['name']] = items
+    components.update(meta['components'])
+
+    data = dict(meta['data'])
+    data['components'] = components
+    return data
+
+
+def is_container(path):
+    with open(path, 'rb') as f:
+        return f.read(4) == MAGIC
+
+
+def write_geometry(data, path, precision=DEFAULT_PRECISION):
+    with open(path, 'wb') as f:
+        f.write(encode_geometry(data, precision))
+
+
+def read_geometry(path):
+    with open(path, 'rb') as f:
+        return decode_geometry(f.read())
+
+
+def load_geometry_file(path):
+    """Load a geometry file that is either JSON or a binary container"""
+    if is_container(path):
+        return read_geometry(path)
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def max_error(data, decoded):
+    """Largest coordinate difference between two versions of the same geometry"""
+    error = 0.0
+    for category, items in data.get('components', {}).items():
+        if not isinstance(items, list) or not items or 'vertices' not in items[0]:
+            continue
+        _, a = category_arrays(items)
+        _, b = category_arrays(decoded['components'][category])
+        if len(a):
+            error = max(error, float(np.abs(a - b).max()))
+    return error
+
+
+def benchmark(path, precision=DEFAULT_PRECISION, repeat=5):
+    """Compare size and decode time of the container against the JSON file"""
+    with open(path, 'r') as f:
+        text = f.read()
+    data = json.loads(text)
+
+    compact_json = json.dumps(data, separators=(',', ':'))
+    start = time.perf_counter()
+    blob = encode_geometry(data, precision)
+    encode_time = time.perf_counter() - start
+
+    def best(fn):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    return {
+        'file': path,
+        'json_bytes': len(text.encode('utf-8')),
+        'compact_json_bytes': len(compact_json.encode('utf-8')),
+        'container_bytes': len(blob),
+        'ratio': len(text.encode('utf-8')) / len(blob),
+        'encode_ms': encode_time * 1000,
+        'json_decode_ms': best(lambda: json.loads(text)) * 1000,
+        'container_decode_ms': best(lambda: decode_geometry(blob)) * 1000,
+        'container_arrays_ms': best(lambda: decode_arrays(blob)) * 1000,
+        'max_error': max_error(data, decode_geometry(blob))
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Encode, decode or benchmark the binary geometry container.")
+    parser.add_argument('command', choices=('encode', 'decode', 'benchmark'))
+    parser.add_argument('inputs', nargs='+', help="Input files")
+    parser.add_argument('-p', '--precision', type=float, default=DEFAULT_PRECISION,
+                        help="Quantization step in meters (default: 0.001)")
+    parser.add_argument('--force', action='store_true', help="Overwrite existing decoded files")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    for path in args.inputs:
+        stem = path.rsplit('.', 1)[0]
+        if args.command == 'encode':
+            with open(path, 'r') as f:
+                write_geometry(json.load(f), stem + EXTENSION, args.precision)
+            print(f"{path} -> {stem + EXTENSION}")
+        elif args.command == 'decode':
+            # Never next to (and over) the JSON the container was encoded from
+            output = stem + DECODED_SUFFIX
+            if os.path.exists(output) and not args.force:
+                print(f"{output} exists, skipping {path} (use --force to overwrite)")
+                continue
+            with open(output, 'w') as f:
+                json.dump(read_geometry(path), f)
+            print(f"{path} -> {output}")
+        else:
+            result = benchmark(path, args.precision)
+            print(f"{path}: JSON {result['json_bytes'] / 1024:.1f} KB "
+                  f"(compact {result['compact_json_bytes'] / 1024:.1f} KB), "
+                  f"container {result['container_bytes'] / 1024:.1f} KB ({result['ratio']:.1f}x smaller); "
+                  f"decode JSON {result['json_decode_ms']:.2f} ms, "
+                  f"container {result['container_decode_ms']:.2f} ms "
+                  f"(arrays only {result['container_arrays_ms']:.2f} ms); "
+                  f"max error {result['max_error']:.2e} m")
+
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,167 @@
+import copy
+import hashlib
+import json
+
+import numpy as np
+
+# Coordinates are rounded to this many decimals (0.1 mm) before hashing, so
+# float noise from regenerating a building does not count as a change
+HASH_DECIMALS = 4
+
+# Keys of 'components' that are not lists of components with ids
+OPAQUE_KEYS = ('prototypes', 'instances')
+
+
+def component_hashes(components, decimals=HASH_DECIMALS):
+    """Hash of every component of one category, keyed by component id
+
+    Vertices are rounded and hashed as raw bytes; all other keys (type,
+    holes, ...) are hashed as canonical JSON.
+    """
+    hashes = {}
+    if not components:
+        return hashes
+
+    counts = [len(c.get('vertices', [])) for c in components]
+    coords = np.array([(v['x'], v['y'], v['z']) for c in components for v in c.get('vertices', [])],
+                      dtype=np.float64).reshape(-1, 3)
+    coords = np.round(coords, decimals) + 0.0
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    for n, component in enumerate(components):
+        extra = {key: value for key, value in component.items() if key != 'vertices'}
+        digest = hashlib.blake2b(coords[offsets[n]:offsets[n + 1]].tobytes(), digest_size=8)
+        digest.update(json.dumps(extra, sort_keys=True, default=str).encode())
+        hashes[component['id']] = digest.hexdigest()
+    return hashes
+
+
+def opaque_hash(value):
+    return hashlib.blake2b(json.dumps(value, sort_keys=True, default=str).encode(),
+                           digest_size=8).hexdigest()
+
+
+def list_categories(components):
+    return [key for key, value in components.items()
+            if key not in OPAQUE_KEYS and isinstance(value, list)]
+
+
+def geometry_hashes(data, decimals=HASH_DECIMALS):
+    """{category: {id: hash}} for component lists and {key: hash} for the rest"""
+    components = data.get('components', {})
+    categories = {category: component_hashes(components[category], decimals)
+                  for category in list_categories(components)}
+    opaque = {key: opaque_hash(components[key]) for key in OPAQUE_KEYS if key in components}
+    return categories, opaque
+
+
+def geometry_hash(data, decimals=HASH_DECIMALS, hashes=None):
+    """Hash of a whole geometry version, independent of component order"""
+    categories, opaque = hashes or geometry_hashes(data, decimals)
+    digest = hashlib.blake2b(str(data.get('buildingId')).encode(), digest_size=8)
+    for category in sorted(categories):
+        for component_id, value in sorted(categories[category].items()):
+            digest.update(f"{category}/{component_id}/{value};".encode())
+    for key in sorted(opaque):
+        digest.update(f"{key}/{opaque[key]};".encode())
+    return digest.hexdigest()
+
+
+def diff_geometry(old, new, decimals=HASH_DECIMALS):
+    """Patch that turns geometry old into new
+
+    Components are matched by category and id and compared by hash. The patch
+    holds full components only for added and modified ones, so its size
+    scales with the change, not the building:
+
+        {'buildingId', 'from', 'to',
+         'added': {category: [component, ...]},
+         'modified': {category: [component, ...]},
+         'removed': {category: [id, ...]},
+         'replaced': {key: value},          # changed prototypes/instances
+         'summary': {'added', 'modified', 'removed', 'unchanged'}}
+    """
+    old_hashes = geometry_hashes(old, decimals)
+    new_hashes = geometry_hashes(new, decimals)
+    old_categories, old_opaque = old_hashes
+    new_categories, new_opaque = new_hashes
+    components = new.get('components', {})
+
+    patch = {
+        'buildingId': new.get('buildingId'),
+        'from': geometry_hash(old, decimals, old_hashes),
+        'to': geometry_hash(new, decimals, new_hashes),
+        'added': {},
+        'modified': {},
+        'removed': {},
+        'replaced': {}
+    }
+    unchanged = 0
+
+    for category in set(old_categories) | set(new_categories):
+        before = old_categories.get(category, {})
+        after = new_categories.get(category, {})
+        added, modified = [], []
+        for component in components.get(category) or []:
+            previous = before.get(component['id'])
+            if previous is None:
+                added.append(component)
+            elif previous != after[component['id']]:
+                modified.append(component)
+            else:
+                unchanged += 1
+        removed = [component_id for component_id in before if component_id not in after]
+
+        if added:
+            patch['added'][category] = added
+        if modified:
+            patch['modified'][category] = modified
+        if removed:
+            patch['removed'][category] = removed
+
+    for key in set(old_opaque) | set(new_opaque):
+        if old_opaque.get(key) != new_opaque.get(key):
+            patch['replaced'][key] = components.get(key)
+
+    patch['summary'] = {
+        'added': sum(len(c) for c in patch['added'].values()),
+        'modified': sum(len(c) for c in patch['modified'].values()),
+        'removed': sum(len(c) for c in patch['removed'].values()),
+        'unchanged': unchanged
+    }
+    return patch
+
+
+def is_empty(patch):
+    """True if the patch changes nothing"""
+    return not (patch['added'] or patch['modified'] or patch['removed'] or patch['replaced'])
+
+
+def apply_patch(data, patch, check=True, decimals=HASH_DECIMALS):
+    """Return a copy of data with the patch applied
+
+    With check=True the version hash of data must match the patch's 'from'
+    hash, otherwise a ValueError is raised (the caller should resync with a
+    full copy instead).
+    """
+    if check and geometry_hash(data, decimals) != patch['from']:
+        raise ValueError(f"Patch does not apply to this version of {data.get('buildingId')}")
+
+    components = dict(data.get('components', {}))
+    categories = set(patch['added']) | set(patch['modified']) | set(patch['removed'])
+
+    for category in categories:
+        removed = set(patch['removed'].get(category, []))
+        modified = {c['id']: c for c in patch['modified'].get(category, [])}
+        items = [copy.deepcopy(modified[c['id']]) if c['id'] in modified else c
+                 for c in components.get(category) or [] if c['id'] not in removed]
+        items.extend(copy.deepcopy(c) for c in patch['added'].get(category, []))
+        components[category] = items
+
+    for key, value in patch['replaced'].items():
+        if value is None:
+            components.pop(key, None)
+        else:
+            components[key] = copy.deepcopy(value)
+
+    return dict(data, components=components)
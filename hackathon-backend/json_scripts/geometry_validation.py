@@ -0,0 +1,438 @@
+import copy
+import time
+
+import numpy as np
+
+try:
+    from .spatial_index import ComponentIndex, SpatialIndex, component_boxes
+    from .vertex_weld import weld_vertices
+except ImportError:
+    # Run from json_scripts, like the other scripts
+    from spatial_index import ComponentIndex, SpatialIndex, component_boxes
+    from vertex_weld import weld_vertices
+
+# Components made of planar polygons and of line members
+SURFACE_CATEGORIES = ('walls', 'floors', 'openings')
+MEMBER_CATEGORIES = ('columns', 'beams')
+
+# Most (vertex, component) pairs held in memory at once when the checks
+# fall back to comparing vertices with every wall
+CHUNK_SIZE = 1 << 20
+
+
+def flatten(components, categories):
+    """All vertices of the given categories as one array plus polygon offsets"""
+    coords, counts, refs = [], [], []
+
+    for category in categories:
+        for position, component in enumerate(components.get(category) or []):
+            vertices = component['vertices']
+            coords.extend((v['x'], v['y'], v['z']) for v in vertices)
+            counts.append(len(vertices))
+            refs.append((category, position, component.get('id')))
+
+    vertices = np.array(coords, dtype=np.float64).reshape(-1, 3)
+    offsets = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+    return vertices, offsets, refs
+
+
+def next_in_polygon(offsets):
+    """Index of the next vertex around each polygon (wrapping to its start)"""
+    index = np.arange(offsets[-1])
+    nxt = index + 1
+    nxt[offsets[1:] - 1] = offsets[:-1]
+    return nxt
+
+
+def polygon_areas(vertices, offsets):
+    """Area of every (planar) polygon with Newell's method"""
+    if len(offsets) == 1:
+        return np.empty(0)
+    cross = np.cross(vertices, vertices[next_in_polygon(offsets)])
+    return 0.5 * np.linalg.norm(np.add.reduceat(cross, offsets[:-1], axis=0), axis=1)
+
+
+def polygon_frames(vertices, offsets):
+    """Origin, in-plane axes (u, v) and unit normal of every polygon"""
+    origin = vertices[offsets[:-1]]
+    cross = np.cross(vertices, vertices[next_in_polygon(offsets)])
+    normal = np.add.reduceat(cross, offsets[:-1], axis=0)
+    normal /= np.maximum(np.linalg.norm(normal, axis=1, keepdims=True), 1e-12)
+    u = vertices[offsets[:-1] + 1] - origin
+    u /= np.maximum(np.linalg.norm(u, axis=1, keepdims=True), 1e-12)
+    v = np.cross(normal, u)
+    return origin, u, v, normal
+
+
+def point_segment_distance(points, starts, ends):
+    """Distance (P, S) from every point to every segment plus the closest points"""
+    direction = ends - starts
+    length2 = np.maximum(np.einsum('ij,ij->i', direction, direction), 1e-12)
+    t = np.einsum('psk,sk->ps', points[:, None, :] - starts[None, :, :], direction) / length2
+    t = np.clip(t, 0.0, 1.0)
+    closest = starts[None, :, :] + t[..., None] * direction[None, :, :]
+    return np.linalg.norm(points[:, None, :] - closest, axis=2), closest
+
+
+def nearest_segment(points, starts, ends, chunk_size=CHUNK_SIZE):
+    """Distance from every point to its nearest segment and the closest point on it
+
+    Points are processed in chunks of about chunk_size point/segment pairs.
+    """
+    gap = np.empty(len(points))
+    closest = np.empty((len(points), 3))
+    step = max(1, chunk_size // max(len(starts), 1))
+    for first in range(0, len(points), step):
+        chunk = slice(first, first + step)
+        distance, candidates = point_segment_distance(points[chunk], starts, ends)
+        nearest = np.argmin(distance, axis=1)
+        rows = np.arange(len(nearest))
+        gap[chunk] = distance[rows, nearest]
+        closest[chunk] = candidates[rows, nearest]
+    return gap, closest
+
+
+def candidate_pairs(boxes, queries, distance):
+    """(query, box) index pairs of boxes within distance of the (Q, 2, 3) query boxes
+
+    SpatialIndex broadphase with grid cells about the size of the queries,
+    so long walls do not put every query into one big cell.
+    """
+    extents = (queries[:, 1] - queries[:, 0]).max(axis=1)
+    cell_size = max(2 * distance, float(np.median(extents)) if len(extents) else 0.0)
+    return SpatialIndex(boxes, cell_size).query_boxes(queries, distance)
+
+
+def lowest_per_query(query, score):
+    """Position of the lowest score of every query in (query, candidate) pair arrays"""
+    order = np.lexsort((score, query))
+    first = np.concatenate([[True], query[order][1:] != query[order][:-1]]) if len(query) else query
+    return order[first]
+
+
+class GeometryValidator:
+    """Validate and optionally repair a building geometry dict
+
+    Usage:
+        report, fixed = GeometryValidator(tolerance=0.01).run(data, repair=True)
+
+    All checks work on flat vertex arrays; the only Python loops are over
+    the resulting issue lists.
+    """
+
+    def __init__(self, tolerance=0.01, snap_distance=0.25):
+        self.tolerance = tolerance
+        self.snap_distance = snap_distance
+
+    def run(self, data, repair=False):
+        start = time.perf_counter()
+        data = copy.deepcopy(data) if repair else data
+        components = data.get('components', {})
+        issues = []
+
+        issues += self.weld(components, repair)
+        issues += self.opening_containment(components, repair)
+        issues += self.overlapping_openings(components)
+        issues += self.floor_wall_contact(components, repair)
+        issues += self.column_support(components, repair)
+        # Last, so components that collapsed while repairing are removed too
+        issues += self.degenerate_components(components, repair)
+
+        summary = {}
+        for issue in issues:
+            summary[issue['type']] = summary.get(issue['type'], 0) + 1
+
+        report = {
+            'valid': not issues,
+            'repaired': repair,
+            'issues': issues,
+            'summary': summary,
+            'elapsed_ms': (time.perf_counter() - start) * 1000
+        }
+        return report, data
+
+    def weld(self, components, repair):
+        """Near-duplicate vertices (closer than tolerance but not identical)"""
+        categories = SURFACE_CATEGORIES + MEMBER_CATEGORIES
+        vertices, offsets, refs = flatten(components, categories)
+        canonical = weld_vertices(vertices, self.tolerance)
+        moved = np.any(vertices[canonical] != vertices, axis=1)
+        if not moved.any():
+            return []
+
+        owner = np.repeat(np.arange(len(refs)), np.diff(offsets))
+        issues = []
+        for n in np.unique(owner[moved]):
+            category, _, component_id = refs[n]
+            issues.append({
+                'type': 'near_duplicate_vertices',
+                'category': category,
+                'id': component_id,
+                'count': int(moved[owner == n].sum())
+            })
+
+        if repair:
+            self._write_back(components, categories, vertices[canonical], offsets, refs)
+        return issues
+
+    def degenerate_components(self, components, repair):
+        """Polygons with (almost) zero area and members with zero length"""
+        issues = []
+        drop = set()
+
+        vertices, offsets, refs = flatten(components, SURFACE_CATEGORIES)
+        if refs:
+            areas = polygon_areas(vertices, offsets)
+            for n in np.flatnonzero(areas < self.tolerance ** 2):
+                category, position, component_id = refs[n]
+                issues.append({'type': 'zero_area_face', 'category': category,
+                               'id': component_id, 'area': float(areas[n])})
+                drop.add((category, position))
+
+        vertices, offsets, refs = flatten(components, MEMBER_CATEGORIES)
+        if refs:
+            lengths = np.linalg.norm(vertices[offsets[1:] - 1] - vertices[offsets[:-1]], axis=1)
+            for n in np.flatnonzero(lengths < self.tolerance):
+                category, position, component_id = refs[n]
+                issues.append({'type': 'zero_length_member', 'category': category,
+                               'id': component_id, 'length': float(lengths[n])})
+                drop.add((category, position))
+
+        if repair and drop:
+            for category in SURFACE_CATEGORIES + MEMBER_CATEGORIES:
+                if components.get(category):
+                    components[category] = [
+                        c for position, c in enumerate(components[category])
+                        if (category, position) not in drop
+                    ]
+        return issues
+
+    def opening_containment(self, components, repair):
+        """Openings that do not lie inside (the plane and outline of) a wall
+
+        Every opening is matched with the wall of smallest combined
+        off-plane and in-plane overshoot. Only walls whose box is within
+        snap_distance of the opening's box are candidates (SpatialIndex
+        broadphase); openings without any fall back to all walls. Repair
+        projects the opening onto that wall's plane and clamps it to the
+        wall's extent along the wall axes.
+        """
+        if not components.get('openings') or not components.get('walls'):
+            return []
+
+        wall_vertices, wall_offsets, _ = flatten(components, ('walls',))
+        vertices, offsets, refs = flatten(components, ('openings',))
+        origin, u, v, normal = polygon_frames(wall_vertices, wall_offsets)
+
+        # Wall extents in their own frame
+        wall_relative = wall_vertices - np.repeat(origin, np.diff(wall_offsets), axis=0)
+        wall_owner = np.repeat(np.arange(len(origin)), np.diff(wall_offsets))
+        wall_u = np.einsum('ik,ik->i', wall_relative, u[wall_owner])
+        wall_v = np.einsum('ik,ik->i', wall_relative, v[wall_owner])
+        u_min = np.minimum.reduceat(wall_u, wall_offsets[:-1])
+        u_max = np.maximum.reduceat(wall_u, wall_offsets[:-1])
+        v_min = np.minimum.reduceat(wall_v, wall_offsets[:-1])
+        v_max = np.maximum.reduceat(wall_v, wall_offsets[:-1])
+
+        host = np.full(len(refs), -1)
+        host_off_plane = np.full(len(refs), np.inf)
+        host_outside = np.full(len(refs), np.inf)
+
+        def match(opening, wall):
+            """Keep the best of the candidate (opening, wall) pairs per opening"""
+            counts = offsets[opening + 1] - offsets[opening]
+            pair = np.repeat(np.arange(len(opening)), counts)
+            local = np.arange(len(pair)) - np.repeat(np.cumsum(counts) - counts, counts)
+            w = wall[pair]
+            relative = vertices[offsets[opening][pair] + local] - origin[w]
+            local_u = np.einsum('ik,ik->i', relative, u[w])
+            local_v = np.einsum('ik,ik->i', relative, v[w])
+            outside = np.maximum.reduce([u_min[w] - local_u, local_u - u_max[w],
+                                         v_min[w] - local_v, local_v - v_max[w], np.zeros(len(w))])
+            off_plane = np.abs(np.einsum('ik,ik->i', relative, normal[w]))
+
+            # Per pair: largest distance outside the wall in-plane and off-plane
+            pair_starts = np.cumsum(counts) - counts
+            outside = np.maximum.reduceat(outside, pair_starts)
+            off_plane = np.maximum.reduceat(off_plane, pair_starts)
+            best = lowest_per_query(opening, off_plane + outside)
+            better = off_plane[best] + outside[best] < host_off_plane[opening[best]] + host_outside[opening[best]]
+            best = best[better]
+            host[opening[best]] = wall[best]
+            host_off_plane[opening[best]] = off_plane[best]
+            host_outside[opening[best]] = outside[best]
+
+        opening, wall = candidate_pairs(component_boxes(wall_vertices, wall_offsets), component_boxes(vertices, offsets),
+                                        max(self.tolerance, self.snap_distance))
+        if len(opening):
+            match(opening, wall)
+
+        # Openings far from every wall: compare with all walls, a chunk at a time
+        missing = np.flatnonzero(host < 0)
+        walls = len(origin)
+        step = max(1, CHUNK_SIZE // (walls * int(np.diff(offsets).max())))
+        for first in range(0, len(missing), step):
+            chunk = missing[first:first + step]
+            match(np.repeat(chunk, walls), np.tile(np.arange(walls), len(chunk)))
+
+        tol = self.tolerance
+        bad = (host_off_plane > tol) | (host_outside > tol)
+
+        issues = []
+        for n in np.flatnonzero(bad):
+            category, _, component_id = refs[n]
+            issues.append({
+                'type': 'opening_outside_wall',
+                'category': category,
+                'id': component_id,
+                'nearest_wall': components['walls'][host[n]].get('id'),
+                'off_plane': float(host_off_plane[n]),
+                'outside': float(host_outside[n])
+            })
+
+        if repair and bad.any():
+            owner = np.repeat(np.arange(len(refs)), np.diff(offsets))
+            wall = host[owner]
+            relative = vertices - origin[wall]
+            local_u = np.clip(np.einsum('ik,ik->i', relative, u[wall]), u_min[wall], u_max[wall])
+            local_v = np.clip(np.einsum('ik,ik->i', relative, v[wall]), v_min[wall], v_max[wall])
+            fixed = origin[wall] + local_u[:, None] * u[wall] + local_v[:, None] * v[wall]
+            fixed = np.where(bad[owner][:, None], fixed, vertices)
+            self._write_back(components, ('openings',), fixed, offsets, refs)
+        return issues
+
+    def floor_wall_contact(self, components, repair):
+        """Floors that do not rest on the walls
+
+        A floor vertex meets the walls when it lies on a wall edge within
+        tolerance. A floor rests on the walls when at least two of its
+        vertices and one of its outline edges (both ends) meet them, so
+        cantilevered slabs such as balconies pass. Vertices of a flagged
+        floor closer than snap_distance are snapped onto the nearest edge
+        when repairing.
+        """
+        if not components.get('floors') or not components.get('walls'):
+            return []
+
+        wall_vertices, wall_offsets, _ = flatten(components, ('walls',))
+        vertices, offsets, refs = flatten(components, ('floors',))
+        starts = wall_vertices
+        ends = wall_vertices[next_in_polygon(wall_offsets)]
+
+        # Nearest wall edge of every vertex among the edges whose box is
+        # within snap_distance; vertices without any are further away
+        gap = np.full(len(vertices), np.inf)
+        closest = vertices.copy()
+        edge_boxes = np.stack([np.minimum(starts, ends), np.maximum(starts, ends)], axis=1)
+        point, edge = candidate_pairs(edge_boxes, np.stack([vertices, vertices], axis=1),
+                                      max(self.tolerance, self.snap_distance))
+        if len(point):
+            direction = ends[edge] - starts[edge]
+            t = np.einsum('ij,ij->i', vertices[point] - starts[edge], direction)
+            t = np.clip(t / np.maximum(np.einsum('ij,ij->i', direction, direction), 1e-12), 0.0, 1.0)
+            candidates = starts[edge] + t[:, None] * direction
+            distance = np.linalg.norm(vertices[point] - candidates, axis=1)
+            best = lowest_per_query(point, distance)
+            gap[point[best]] = distance[best]
+            closest[point[best]] = candidates[best]
+
+        owner = np.repeat(np.arange(len(refs)), np.diff(offsets))
+        touching = gap <= self.tolerance
+        touching_vertices = np.bincount(owner, weights=touching, minlength=len(refs))
+        touching_edges = np.bincount(owner, weights=touching & touching[next_in_polygon(offsets)],
+                                     minlength=len(refs))
+        flagged = (touching_vertices < 2) | (touching_edges < 1)
+
+        # Exact gaps of the far vertices of flagged floors, for the report
+        missing = np.flatnonzero(flagged[owner] & np.isinf(gap))
+        if len(missing):
+            gap[missing], closest[missing] = nearest_segment(vertices[missing], starts, ends)
+
+        issues = []
+        for n in np.flatnonzero(flagged):
+            category, _, component_id = refs[n]
+            issues.append({
+                'type': 'floor_not_meeting_walls',
+                'category': category,
+                'id': component_id,
+                'max_gap': float(gap[owner == n].max())
+            })
+
+        if repair and flagged.any():
+            snap = flagged[owner] & ~touching & (gap <= self.snap_distance)
+            fixed = np.where(snap[:, None], closest, vertices)
+            self._write_back(components, ('floors',), fixed, offsets, refs)
+        return issues
+
+    def overlapping_openings(self, components):
+        """Openings that overlap each other; only reported, as there is no safe repair"""
+        if len(components.get('openings') or []) < 2:
+            return []
+
+        index = ComponentIndex({'openings': components['openings']})
+        return [
+            {'type': 'overlapping_openings', 'category': 'openings', 'id': a, 'other': b}
+            for a, b in index.overlapping('openings', self.tolerance)
+        ]
+
+    def column_support(self, components, repair):
+        """Columns whose lower end stands neither on a floor nor on the ground
+
+        The ground is the lowest elevation of the building. The gap is
+        measured down to the floor polygon below the base (to the ground
+        when there is none); bases within snap_distance are moved down onto
+        it when repairing.
+        """
+        if not components.get('columns'):
+            return []
+
+        index = ComponentIndex(components)
+        supports = index.supporting_floors(self.tolerance)
+        columns, bases = index.column_bases()
+        points = index.vertices[bases]
+        ground = index.vertices[:, 2].min()
+        unsupported = np.array([supports[index.ids[c]] is None for c in columns], dtype=bool)
+        loose = np.flatnonzero(unsupported & (points[:, 2] > ground + self.tolerance))
+        if len(loose) == 0:
+            return []
+
+        floors, distances = index.raycast(points[loose], np.tile([0.0, 0.0, -1.0], (len(loose), 1)),
+                                          categories=('floors',))
+        gaps = np.where(np.isfinite(distances), distances, points[loose, 2] - ground)
+
+        issues = []
+        for n, floor, gap in zip(loose, floors, gaps):
+            issues.append({
+                'type': 'column_not_supported',
+                'category': 'columns',
+                'id': index.ids[columns[n]],
+                'floor': floor,
+                'gap': float(gap)
+            })
+
+        if repair:
+            for n, gap in zip(loose, gaps):
+                if gap <= self.snap_distance:
+                    # Columns are flattened in list order, so n is the list position
+                    vertex = components['columns'][n]['vertices'][bases[n] - index.offsets[columns[n]]]
+                    vertex['z'] = float(points[n, 2] - gap)
+        return issues
+
+    @staticmethod
+    def _write_back(components, categories, vertices, offsets, refs):
+        """Copy repaired coordinates back into the component dicts"""
+        values = vertices.tolist()
+        for n, (category, position, _) in enumerate(refs):
+            component = components[category][position]
+            component['vertices'] = [
+                {'x': x, 'y': y, 'z': z} for x, y, z in values[offsets[n]:offsets[n + 1]]
+            ]
+
+
+def validate_geometry(data, tolerance=0.01, repair=False, snap_distance=0.25):
+    """Validate (and optionally repair) a building geometry dict
+
+    Returns (report, data) where data is a repaired copy when repair=True and
+    the untouched input otherwise.
+    """
+    return GeometryValidator(tolerance, snap_distance).run(data, repair=repair)
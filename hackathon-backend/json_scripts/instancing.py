@@ -0,0 +1,265 @@
+"""
+Instanced components for the building geometry JSON
+
+Repeated components (the same window hundreds of times, the same floor plate
+on every level) are stored once as a prototype plus one transform per copy:
+
+    "components": {
+        "prototypes": {
+            "openings_0": {"vertices": [[0, 0, 0], [1.2, 0, 0], [1.2, 0, 1.5], [0, 0, 1.5]]}
+        },
+        "instances": [
+            {
+                "category": "openings",
+                "prototype": "openings_0",
+                "type": "window",
+                "ids": ["opening_1", "opening_2"],
+                "translations": [[1, 0, 1], [3, 0, 1]],
+                "rotations": [0, 0]
+            }
+        ],
+        "walls": [...]
+    }
+
+Prototype vertices are local coordinates relative to the first vertex of
+the component; an instance is the prototype rotated about the vertical axis
+(rotations in degrees) and then translated. Components that are not
+repeated stay in their category lists as before.
+"""
+import argparse
+import json
+
+import numpy as np
+
+from geometry_codec import load_geometry_file
+
+# Categories whose components are worth instancing
+INSTANCED_CATEGORIES = ('openings', 'floors', 'walls', 'columns', 'beams')
+
+# Keys a component may carry and still be instanced without losing data
+INSTANCE_KEYS = {'id', 'vertices', 'type'}
+
+
+def component_array(components):
+    """Vertices of components with equal vertex counts as an (N, V, 3) array"""
+    return np.array([[[v['x'], v['y'], v['z']] for v in c['vertices']] for c in components],
+                    dtype=np.float64)
+
+
+def rotation_matrices(degrees):
+    """(N, 3, 3) rotation matrices about the z axis"""
+    radians = np.radians(np.asarray(degrees, dtype=np.float64))
+    cos, sin = np.cos(radians), np.sin(radians)
+    matrices = np.zeros((len(radians), 3, 3))
+    matrices[:, 0, 0] = cos
+    matrices[:, 0, 1] = -sin
+    matrices[:, 1, 0] = sin
+    matrices[:, 1, 1] = cos
+    matrices[:, 2, 2] = 1.0
+    return matrices
+
+
+def canonical_shapes(vertices):
+    """Split (N, V, 3) component vertices into local shapes and transforms
+
+    The shape is taken relative to the first vertex and rotated so its first
+    edge points along +x in plan. Returns (shapes, translations, rotations).
+    """
+    translations = vertices[:, 0].copy()
+    local = vertices - translations[:, None, :]
+    edge = local[:, 1, :2] if vertices.shape[1] > 1 else np.zeros((len(vertices), 2))
+    flat = np.hypot(edge[:, 0], edge[:, 1]) < 1e-9
+    rotations = np.where(flat, 0.0, np.degrees(np.arctan2(edge[:, 1], edge[:, 0])))
+    shapes = np.einsum('nij,nvj->nvi', rotation_matrices(-rotations), local)
+    return shapes, translations, rotations
+
+
+def instance_vertices(prototype, translations, rotations=None):
+    """Expand one prototype into (N, V, 3) world vertices in a single pass"""
+    prototype = np.asarray(prototype, dtype=np.float64)
+    translations = np.asarray(translations, dtype=np.float64).reshape(-1, 3)
+    if rotations is None:
+        return prototype[None, :, :] + translations[:, None, :]
+    rotated = np.einsum('nij,vj->nvi', rotation_matrices(rotations), prototype)
+    return rotated + translations[:, None, :]
+
+
+def make_instanced(data, min_count=2, decimals=4, categories=INSTANCED_CATEGORIES):
+    """Return a copy of data with repeated components replaced by instances
+
+    Components are grouped by category, opening type and their shape rounded
+    to `decimals` (after removing position and plan rotation). Groups with at
+    least min_count members become one prototype plus an instance group.
+    """
+    components = dict(data['components'])
+    prototypes = dict(components.get('prototypes', {}))
+    instances = list(components.get('instances', []))
+
+    for category in categories:
+        items = components.get(category) or []
+        candidates = {}
+        for position, component in enumerate(items):
+            if set(component) <= INSTANCE_KEYS:
+                key = (len(component['vertices']), component.get('type'))
+                candidates.setdefault(key, []).append(position)
+
+        keep = np.ones(len(items), dtype=bool)
+        for (count, kind), positions in candidates.items():
+            if len(positions) < min_count or count == 0:
+                continue
+            vertices = component_array([items[p] for p in positions])
+            shapes, translations, rotations = canonical_shapes(vertices)
+
+            rounded = np.round(shapes, decimals).reshape(len(positions), -1) + 0.0
+            _, labels, counts = np.unique(rounded, axis=0, return_inverse=True, return_counts=True)
+            labels = labels.ravel()
+
+            for label in np.flatnonzero(counts >= min_count):
+                members = np.flatnonzero(labels == label)
+                name = f"{category}_{len(prototypes)}"
+                prototypes[name] = {'vertices': shapes[members[0]].round(decimals + 2).tolist()}
+
+                group = {
+                    'category': category,
+                    'prototype': name,
+                    'ids': [items[positions[m]]['id'] for m in members],
+                    'translations': translations[members].tolist()
+                }
+                if kind is not None:
+                    group['type'] = kind
+                if np.any(rotations[members] != 0):
+                    group['rotations'] = rotations[members].tolist()
+                instances.append(group)
+                keep[[positions[m] for m in members]] = False
+
+        if items:
+            components[category] = [c for c, k in zip(items, keep) if k]
+
+    if prototypes:
+        components['prototypes'] = prototypes
+        components['instances'] = instances
+    return dict(data, components=components)
+
+
+def group_components(group, vertices):
+    """Yield the plain component dicts of one instance group"""
+    for component_id, points in zip(group['ids'], vertices.tolist()):
+        component = {'id': component_id,
+                     'vertices': [{'x': x, 'y': y, 'z': z} for x, y, z in points]}
+        if 'type' in group:
+            component['type'] = group['type']
+        yield component
+
+
+class InstancedBuilding:
+    """Geometry with instance groups that are only expanded on demand
+
+    Renderers that can draw instances use instance_groups() and never
+    materialize per-copy vertex dicts; code that expects the plain schema
+    iterates components() or calls expanded().
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.building_id = data.get('buildingId')
+        self.raw = data['components']
+        self.prototypes = {
+            name: np.asarray(p['vertices'], dtype=np.float64)
+            for name, p in self.raw.get('prototypes', {}).items()
+        }
+        self.groups = self.raw.get('instances', [])
+
+    def instance_groups(self, category=None):
+        """Yield (group, vertices) with vertices as an (N, V, 3) array"""
+        for group in self.groups:
+            if category is not None and group['category'] != category:
+                continue
+            yield group, instance_vertices(self.prototypes[group['prototype']],
+                                           group['translations'], group.get('rotations'))
+
+    def components(self, category):
+        """Yield plain component dicts of a category, expanding instances lazily"""
+        yield from self.raw.get(category) or []
+        for group, vertices in self.instance_groups(category):
+            yield from group_components(group, vertices)
+
+    def expanded(self):
+        """The geometry in the plain (non-instanced) schema"""
+        categories = [c for c in self.raw if c not in ('prototypes', 'instances')]
+        categories += [g['category'] for g in self.groups if g['category'] not in categories]
+        components = {category: list(self.components(category)) for category in categories}
+        return dict(self.data, components=components)
+
+    def instance_count(self):
+        return sum(len(g['ids']) for g in self.groups)
+
+
+def load_geometry(json_file):
+    """Load a geometry file (instanced or not, JSON or binary) as an InstancedBuilding"""
+    return InstancedBuilding(load_geometry_file(json_file))
+
+
+def expand_instances(data):
+    """Plain schema copy of data; data without instances is returned as is"""
+    if 'instances' not in data.get('components', {}):
+        return data
+    return InstancedBuilding(data).expanded()
+
+
+def to_threejs(data):
+    """Instance groups as a compact scene description for THREE.InstancedMesh
+
+    Every group becomes a prototype triangle mesh (line segments for
+    two point columns and beams) plus one column-major 4x4 matrix per copy,
+    in the z-up building frame (the viewer rotates the whole building to
+    three.js' y-up frame). Components that are not instanced are passed on
+    as they are.
+    """
+    from triangulation import triangulate_polygon
+
+    building = InstancedBuilding(data)
+    meshes = []
+    for group in building.groups:
+        prototype = building.prototypes[group['prototype']]
+        lines = len(prototype) < 3
+        count = len(group['ids'])
+        matrices = np.zeros((count, 4, 4))
+        matrices[:, :3, :3] = rotation_matrices(group.get('rotations', np.zeros(count)))
+        matrices[:, :3, 3] = group['translations']
+        matrices[:, 3, 3] = 1.0
+
+        meshes.append({
+            'category': group['category'],
+            'type': group.get('type'),
+            'primitive': 'lines' if lines else 'triangles',
+            'positions': prototype.ravel().round(6).tolist(),
+            'indices': [0, 1] if lines else triangulate_polygon(prototype).ravel().tolist(),
+            # three.js Matrix4.fromArray expects column-major order
+            'matrices': matrices.transpose(0, 2, 1).reshape(-1).round(6).tolist(),
+            'ids': group['ids']
+        })
+
+    components = {c: items for c, items in building.raw.items() if c not in ('prototypes', 'instances')}
+    return {'buildingId': data.get('buildingId'), 'up': 'z', 'instancedMeshes': meshes, 'components': components}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Write the three.js instanced scene of geometry files.")
+    parser.add_argument('inputs', nargs='+', help="Geometry files (JSON or .m2mg)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    for path in args.inputs:
+        output = path.rsplit('.', 1)[0] + '.threejs.json'
+        with open(output, 'w') as f:
+            json.dump(to_threejs(make_instanced(load_geometry_file(path))), f)
+        print(f"{path} -> {output}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,7 +1,12 @@
-import json
 import plotly.graph_objects as go
 import numpy as np
 
+from figure_encoding import drop_components, is_merged
+from geometry_codec import load_geometry_file
+from instancing import InstancedBuilding, group_components
+from spatial_index import ComponentIndex
+from triangulation import triangulate_polygon
+
 def create_wall_meshes(walls):
     """Create 3D meshes for walls"""
     wall_meshes = []
@@ -37,6 +42,7 @@ def create_wall_meshes(walls):
                 color='lightgray',
                 hoverinfo='text',
                 text=f"Wall {wall['id']}",
+                uid=wall['id'],
                 flatshading=True,
                 lighting=dict(
                     ambient=0.8,
@@ -51,38 +57,41 @@ def create_wall_meshes(walls):
     return wall_meshes
 
 def create_floor_meshes(floors):
-    """Create 3D meshes for floors"""
+    """Create 3D meshes for floors (outline plus optional 'holes' for courtyards)"""
     floor_meshes = []
 
     for floor in floors:
-        vertices = floor['vertices']
-        x = [v['x'] for v in vertices]
-        y = [v['y'] for v in vertices]
-        z = [v['z'] for v in vertices]
+        outline = [[v['x'], v['y'], v['z']] for v in floor['vertices']]
+        holes = [[[v['x'], v['y'], v['z']] for v in hole] for hole in floor.get('holes', [])]
 
-        # Add first point to close the polygon
-        x.append(x[0])
-        y.append(y[0])
-        z.append(z[0])
+        # Explicit triangles, so plotly does not fall back to its own
+        # (convex) triangulation; identical floor plates hit the cache
+        triangles = triangulate_polygon(outline, holes)
+        vertices = np.array(outline + [point for hole in holes for point in hole])
 
         floor_meshes.append(
             go.Mesh3d(
-                x=x,
-                y=y,
-                z=z,
+                x=vertices[:, 0],
+                y=vertices[:, 1],
+                z=vertices[:, 2],
+                i=triangles[:, 0],
+                j=triangles[:, 1],
+                k=triangles[:, 2],
                 opacity=0.9,
                 color='lightblue',
                 hoverinfo='text',
-                text=f"Floor {floor['id']}"
+                text=f"Floor {floor['id']}",
+                uid=floor['id']
             )
         )
 
     return floor_meshes
 
 
-def create_opening_meshes(openings):
+def create_opening_meshes(openings, host_walls=None):
     """Create 3D meshes for openings (doors and windows) using proper triangulation"""
     opening_meshes = []
+    host_walls = host_walls or {}
 
     for opening in openings:
         vertices = opening['vertices']
@@ -127,14 +136,15 @@ def create_opening_meshes(openings):
 
         opening_meshes.append(
             go.Mesh3d(
-                x=vertices_with_back[:, 0].tolist(),
-                y=vertices_with_back[:, 1].tolist(),
-                z=vertices_with_back[:, 2].tolist(),
+                x=vertices_with_back[:, 0],
+                y=vertices_with_back[:, 1],
+                z=vertices_with_back[:, 2],
                 i=i, j=j, k=k,
                 opacity=opacity,
                 color=color,
                 hoverinfo='text',
-                text=f"{opening['type'].capitalize()} {opening['id']}",
+                text=opening_label(opening, host_walls.get(opening['id'])),
+                uid=opening['id'],
                 flatshading=True,
                 lighting=dict(
                     ambient=0.8,
@@ -149,6 +159,13 @@ def create_opening_meshes(openings):
         )
     return opening_meshes
 
+def opening_label(opening, host_wall=None):
+    """Hover text of an opening, naming the wall it sits in when known"""
+    label = f"{opening['type'].capitalize()} {opening['id']}"
+    if host_wall:
+        label += f" (in {host_wall})"
+    return label
+
 def create_column_lines(columns):
     """Create 3D cylinders for columns"""
     column_meshes = []
@@ -180,7 +197,9 @@ def create_column_lines(columns):
         # Create circles at start and end
         for t in theta:
             # Create basis vectors perpendicular to column direction
-            if abs(direction[2]) < abs(direction[0]):
+            # (the first choice vanishes for columns along y, the second
+            # for vertical columns)
+            if np.hypot(direction[2], direction[0]) > np.hypot(direction[1], direction[0]):
                 u = np.array([direction[2], 0, -direction[0]])
             else:
                 u = np.array([-direction[1], direction[0], 0])
@@ -230,7 +249,8 @@ def create_column_lines(columns):
                 color='darkgray',
                 opacity=0.8,
                 hoverinfo='text',
-                text=f"Column {col['id']}"
+                text=f"Column {col['id']}",
+                uid=col['id']
             )
         )
 
@@ -298,16 +318,82 @@ def create_beam_lines(beams):
                 color='brown',
                 opacity=0.8,
                 hoverinfo='text',
-                text=f"Beam {beam['id']}"
+                text=f"Beam {beam['id']}",
+                uid=beam['id']
             )
         )
 
     return beam_meshes
 
-def plot_building_geometry(json_file):
-    """Plot complete building geometry from JSON file"""
-    with open(json_file, 'r') as f:
-        data = json.load(f)
+# Mesh styling per category for instance groups, matching the functions above
+INSTANCE_STYLES = {
+    'walls': dict(color='lightgray', opacity=0.5, flatshading=True,
+                  lighting=dict(ambient=0.8, diffuse=0.8, facenormalsepsilon=0, roughness=0.5, specular=0.05)),
+    'floors': dict(color='lightblue', opacity=0.9),
+    'door': dict(color='red', opacity=0.9, flatshading=True,
+                 lighting=dict(ambient=0.8, diffuse=0.9, facenormalsepsilon=0, roughness=0.1, specular=0.3)),
+    'window': dict(color='skyblue', opacity=0.7, flatshading=True,
+                   lighting=dict(ambient=0.8, diffuse=0.9, facenormalsepsilon=0, roughness=0.1, specular=0.3))
+}
+
+def create_instanced_meshes(building):
+    """Create one 3D mesh per instance group instead of one per copy"""
+    instanced_meshes = []
+
+    for group, vertices in building.instance_groups():
+        category = group['category']
+        if category in ('columns', 'beams'):
+            # Members are drawn as individual solids
+            members = list(group_components(group, vertices))
+            create = create_column_lines if category == 'columns' else create_beam_lines
+            instanced_meshes.extend(create(members))
+            continue
+
+        count, corners, _ = vertices.shape
+        triangles = triangulate_polygon(vertices[0])
+
+        if category == 'openings':
+            # Offset front and back faces off the wall like create_opening_meshes
+            normal = np.cross(vertices[:, 1] - vertices[:, 0], vertices[:, -1] - vertices[:, 0])
+            normal /= np.maximum(np.linalg.norm(normal, axis=1, keepdims=True), 1e-12)
+            offset = 0.01 * normal[:, None, :]
+            vertices = np.concatenate([vertices + offset, vertices - offset], axis=1)
+            triangles = np.concatenate([triangles, triangles + corners])
+            corners *= 2
+
+        # Same triangles for every copy, shifted to each copy's vertices
+        shifts = (np.arange(count) * corners)[:, None, None]
+        faces = (triangles[None, :, :] + shifts).reshape(-1, 3)
+        points = vertices.reshape(-1, 3)
+
+        style = INSTANCE_STYLES.get(group.get('type') if category == 'openings' else category,
+                                    INSTANCE_STYLES['walls'])
+        label = (group.get('type') or category).capitalize()
+        instanced_meshes.append(
+            go.Mesh3d(
+                x=points[:, 0],
+                y=points[:, 1],
+                z=points[:, 2],
+                i=faces[:, 0],
+                j=faces[:, 1],
+                k=faces[:, 2],
+                hoverinfo='name',
+                name=f"{label} x{count} ({group['prototype']})",
+                showlegend=True,
+                **style
+            )
+        )
+
+    return instanced_meshes
+
+def plot_building_geometry(json_file, host_labels=False):
+    """Plot complete building geometry from JSON file
+
+    With host_labels the hover text of every opening names its host wall,
+    which needs a spatial index over all components.
+    """
+    # JSON or the binary geometry container
+    data = load_geometry_file(json_file)
 
     fig = go.Figure()
     components = data['components']
@@ -339,10 +425,18 @@ def plot_building_geometry(json_file):
 
     # 5. Openings (on top)
     if 'openings' in components and components['openings']:
-        opening_meshes = create_opening_meshes(components['openings'])
+        # Look up the host wall of every opening for the hover text
+        host_walls = ComponentIndex(components).host_walls() if host_labels else None
+        opening_meshes = create_opening_meshes(components['openings'], host_walls)
         for mesh in opening_meshes:
             fig.add_trace(mesh)
 
+    # 6. Instance groups (repeated components stored once as a prototype)
+    if components.get('instances'):
+        instanced_meshes = create_instanced_meshes(InstancedBuilding(data))
+        for mesh in instanced_meshes:
+            fig.add_trace(mesh)
+
     # Update layout
     fig.update_layout(
         scene=dict(
@@ -368,6 +462,53 @@ def plot_building_geometry(json_file):
 
     return fig
 
+# Functions that draw one category of components
+CATEGORY_TRACES = {
+    'floors': create_floor_meshes,
+    'walls': create_wall_meshes,
+    'columns': create_column_lines,
+    'beams': create_beam_lines,
+    'openings': create_opening_meshes
+}
+
+def patch_figure(fig, patch, geometry=None):
+    """Apply a geometry patch (see geometry_diff.diff_geometry) to a figure in place
+
+    Traces are matched to components by uid, so only the traces of removed and
+    modified components are dropped and only added and modified components
+    are rebuilt. On a FigureWidget (or with Plotly.react in the browser) just
+    those traces are sent and re-rendered. In a compact figure (see
+    figure_encoding.compact_figure) stale components are cut out of their
+    merged trace and rebuilt ones are added as separate traces. Pass the
+    patched geometry to label rebuilt openings with their host wall, as
+    plot_building_geometry does with host_labels.
+    """
+    if patch['replaced']:
+        raise ValueError("Patch changes instance groups; redraw the whole figure")
+
+    stale = {component_id for ids in patch['removed'].values() for component_id in ids}
+    stale.update(c['id'] for changed in patch['modified'].values() for c in changed)
+    if stale:
+        empty = {trace.uid for trace in fig.data if is_merged(trace) and drop_components(trace, stale) == 0}
+        fig.data = [trace for trace in fig.data if trace.uid not in stale and trace.uid not in empty]
+
+    host_walls = None
+    if geometry is not None and (patch['modified'].get('openings') or patch['added'].get('openings')):
+        host_walls = ComponentIndex(geometry['components']).host_walls()
+
+    for changes in (patch['modified'], patch['added']):
+        for category, changed in changes.items():
+            if category == 'openings':
+                traces = create_opening_meshes(changed, host_walls)
+            elif category in CATEGORY_TRACES:
+                traces = CATEGORY_TRACES[category](changed)
+            else:
+                continue
+            for trace in traces:
+                fig.add_trace(trace)
+
+    return fig
+
 def main():
     # Get JSON file path from user
     import tkinter as tk
@@ -378,7 +519,7 @@ def main():
 
     json_file = filedialog.askopenfilename(
         title="Select Building Geometry JSON file",
-        filetypes=[("JSON files", "*.json")]
+        filetypes=[("Geometry files", "*.json *.m2mg")]
     )
 
     if not json_file:
@@ -386,7 +527,7 @@ def main():
         return
 
     # Create visualization
-    fig = plot_building_geometry(json_file)
+    fig = plot_building_geometry(json_file, host_labels=True)
 
     # Show the plot
     fig.show()
@@ -0,0 +1,445 @@
+import numpy as np
+
+try:
+    from .triangulation import triangulate_polygon
+except ImportError:
+    # Run from json_scripts, like the other scripts
+    from triangulation import triangulate_polygon
+
+# Component categories in the order they appear in the geometry JSON
+CATEGORIES = ('walls', 'floors', 'openings', 'columns', 'beams')
+
+# Categories drawn as planar polygons (the rest are line members)
+SURFACE_CATEGORIES = ('walls', 'floors', 'openings')
+
+# Members are lines; give them some thickness for queries (meters)
+MEMBER_RADIUS = 0.2
+
+# Most grid cells along one axis; the cell size grows for larger extents so
+# the cell keys always fit into an int64
+MAX_AXIS_CELLS = 1 << 20
+
+
+def flatten_components(components, categories=CATEGORIES):
+    """Flatten the components dict into arrays
+
+    Returns (vertices, offsets, ids, category_codes) where vertices is an
+    (M, 3) array of all vertices, offsets[n]:offsets[n + 1] is the slice of
+    vertices of component n, ids are the component ids and category_codes
+    index into categories.
+    """
+    coords = []
+    counts = []
+    ids = []
+    codes = []
+
+    for code, category in enumerate(categories):
+        for component in components.get(category) or []:
+            vertices = component['vertices']
+            coords.extend((v['x'], v['y'], v['z']) for v in vertices)
+            counts.append(len(vertices))
+            ids.append(component.get('id'))
+            codes.append(code)
+
+    vertices = np.array(coords, dtype=np.float64).reshape(-1, 3)
+    offsets = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+    return vertices, offsets, np.array(ids, dtype=object), np.array(codes, dtype=np.int8)
+
+
+def component_boxes(vertices, offsets):
+    """Axis aligned bounding boxes (N, 2, 3) of every component in one pass"""
+    starts = offsets[:-1]
+    mins = np.minimum.reduceat(vertices, starts, axis=0)
+    maxs = np.maximum.reduceat(vertices, starts, axis=0)
+    return np.stack([mins, maxs], axis=1)
+
+
+def expand_ranges(starts, counts):
+    """Indices start, start + 1, ..., start + count - 1 of every range, concatenated"""
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + local
+
+
+def polygon_triangles(vertices, offsets, owners):
+    """Triangulate the polygons in owners, concave ones included
+
+    Returns (counts, triangles): the number of triangles of every polygon
+    and a (T, 3) array of vertex indices, polygon after polygon. Repeated
+    shapes come from the triangulation cache.
+    """
+    counts = np.zeros(len(owners), dtype=np.int64)
+    triangles = []
+    for n, owner in enumerate(owners):
+        start, end = offsets[owner], offsets[owner + 1]
+        if end - start >= 3:
+            local = triangulate_polygon(vertices[start:end])
+            counts[n] = len(local)
+            triangles.append(local + start)
+    if not triangles:
+        return counts, np.empty((0, 3), dtype=np.int64)
+    return counts, np.concatenate(triangles)
+
+
+class SpatialIndex:
+    """Uniform grid over axis aligned boxes with batch queries
+
+    Every box is registered in all grid cells it touches. The cell -> box
+    table is stored as sorted integer cell keys (CSR layout), so queries are
+    a searchsorted over the keys followed by an exact box test, all in NumPy.
+    Cell keys are the linear index of the cell inside the grid, so they are
+    unique for any extent; queries are clipped to the grid.
+    """
+
+    def __init__(self, boxes, cell_size=None):
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 2, 3)
+        self.origin = self.boxes[:, 0].min(axis=0) if len(self.boxes) else np.zeros(3)
+        extent = (self.boxes[:, 1].max(axis=0) - self.origin) if len(self.boxes) else np.zeros(3)
+
+        if cell_size is None:
+            extents = self.boxes[:, 1] - self.boxes[:, 0]
+            # Median box size keeps the number of cells per box small
+            cell_size = float(np.median(extents.max(axis=1))) if len(extents) else 1.0
+        self.cell_size = max(cell_size, 1e-6, float(extent.max()) / (MAX_AXIS_CELLS - 1))
+        self.dims = np.floor(extent / self.cell_size).astype(np.int64) + 1
+
+        box_ids, keys = self._box_cells(self.boxes)
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        self.cell_boxes = box_ids[order]
+        self.cell_keys, self.cell_starts = np.unique(keys, return_index=True)
+        self.cell_ends = np.append(self.cell_starts[1:], len(keys))
+
+    def _cell_coords(self, points):
+        # Clipped just outside the grid first, so far away points cannot overflow
+        scaled = np.clip((points - self.origin) / self.cell_size, -1, self.dims)
+        return np.floor(scaled).astype(np.int64)
+
+    def _cell_key(self, cells):
+        """Linear index of cells inside the grid (cells must be inside)"""
+        return (cells[..., 0] * self.dims[1] + cells[..., 1]) * self.dims[2] + cells[..., 2]
+
+    def _box_cells(self, boxes):
+        """Expand boxes to (box index, cell key) pairs for every touched grid cell"""
+        lo = np.maximum(self._cell_coords(boxes[:, 0]), 0)
+        hi = np.minimum(self._cell_coords(boxes[:, 1]), self.dims - 1)
+        spans = np.maximum(hi - lo + 1, 0)
+        counts = spans.prod(axis=1)
+
+        box_ids = np.repeat(np.arange(len(boxes)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        span = spans[box_ids]
+        cells = np.empty((len(box_ids), 3), dtype=np.int64)
+        cells[:, 2] = local % span[:, 2]
+        cells[:, 1] = (local // span[:, 2]) % span[:, 1]
+        cells[:, 0] = local // (span[:, 2] * span[:, 1])
+        cells += lo[box_ids]
+        return box_ids, self._cell_key(cells)
+
+    def _cell_pairs(self, query_ids, keys):
+        """(query, box) pairs of the boxes registered in the cell of every key"""
+        slot = np.searchsorted(self.cell_keys, keys)
+        slot = np.minimum(slot, len(self.cell_keys) - 1)
+        found = self.cell_keys[slot] == keys
+        query_ids, slot = query_ids[found], slot[found]
+
+        starts = self.cell_starts[slot]
+        counts = self.cell_ends[slot] - starts
+        return np.repeat(query_ids, counts), self.cell_boxes[expand_ranges(starts, counts)]
+
+    def _candidates(self, query_ids, keys):
+        """Candidate (query, box) pairs sharing a cell, duplicates removed"""
+        pair_query, pair_box = self._cell_pairs(query_ids, keys)
+
+        # One int64 key per pair is much faster to dedupe than rows
+        pairs = np.unique(pair_query * len(self.boxes) + pair_box)
+        return pairs // len(self.boxes), pairs % len(self.boxes)
+
+    def query_boxes(self, boxes, tolerance=0.0):
+        """All (query, box) index pairs whose boxes overlap
+
+        boxes is an (Q, 2, 3) array; tolerance grows the query boxes (or
+        shrinks them when negative, so touching boxes do not count).
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 2, 3).copy()
+        empty = np.empty(0, dtype=np.int64)
+        if len(boxes) == 0 or len(self.boxes) == 0:
+            return empty, empty
+        boxes[:, 0] -= tolerance
+        boxes[:, 1] += tolerance
+
+        query_ids, keys = self._box_cells(boxes)
+        query, box = self._candidates(query_ids, keys)
+
+        overlap = np.all(
+            (boxes[query, 0] <= self.boxes[box, 1]) & (boxes[query, 1] >= self.boxes[box, 0]),
+            axis=1
+        )
+        return query[overlap], box[overlap]
+
+    def query_points(self, points, tolerance=0.0):
+        """All (point, box) index pairs where the point lies inside the box"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        return self.query_boxes(np.stack([points, points], axis=1), tolerance)
+
+    def self_pairs(self, tolerance=0.0):
+        """All unordered pairs (a < b) of overlapping boxes in the index"""
+        a, b = self.query_boxes(self.boxes, tolerance)
+        keep = a < b
+        return a[keep], b[keep]
+
+
+class ComponentIndex:
+    """Spatial index over the components of a building geometry JSON
+
+    Wraps SpatialIndex with the component ids and categories and provides the
+    queries the plotters and converters need (host walls, overlaps, supports
+    and ray picking).
+    """
+
+    def __init__(self, components, cell_size=None):
+        self.vertices, self.offsets, self.ids, self.codes = flatten_components(components)
+        self.boxes = component_boxes(self.vertices, self.offsets) if len(self.ids) \
+            else np.empty((0, 2, 3))
+
+        # Line members get some thickness so rays and points can hit them
+        members = np.isin(self.codes, [CATEGORIES.index(c) for c in ('columns', 'beams')])
+        self.boxes[members, 0] -= MEMBER_RADIUS
+        self.boxes[members, 1] += MEMBER_RADIUS
+
+        self.grid = SpatialIndex(self.boxes, cell_size)
+        self._triangles = None
+
+    @classmethod
+    def from_geometry(cls, data, cell_size=None):
+        return cls(data['components'], cell_size)
+
+    def category_mask(self, category):
+        return self.codes == CATEGORIES.index(category)
+
+    def indices(self, category):
+        return np.flatnonzero(self.category_mask(category))
+
+    def centroids(self, indices):
+        """Mean vertex of each component in indices"""
+        sums = np.add.reduceat(self.vertices, self.offsets[:-1], axis=0)
+        counts = np.diff(self.offsets)[:, None]
+        return sums[indices] / counts[indices]
+
+    def plane_normals(self, indices):
+        """Unit normals of planar components from their first three vertices"""
+        starts = self.offsets[indices]
+        a = self.vertices[starts]
+        b = self.vertices[starts + 1]
+        c = self.vertices[starts + 2]
+        normals = np.cross(b - a, c - a)
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        return normals / np.where(lengths > 0, lengths, 1.0)
+
+    def host_walls(self, tolerance=0.05):
+        """Map each opening id to the id of the wall it sits in (or None)
+
+        Among walls whose box overlaps the opening, the one whose plane is
+        closest to the opening centroid wins.
+        """
+        openings = self.indices('openings')
+        walls = self.category_mask('walls')
+        query, box = self.grid.query_boxes(self.boxes[openings], tolerance)
+        keep = walls[box]
+        query, box = query[keep], box[keep]
+
+        hosts = {self.ids[o]: None for o in openings}
+        if len(query) == 0:
+            return hosts
+
+        starts = self.offsets[box]
+        distance = np.abs(np.einsum(
+            'ij,ij->i',
+            self.centroids(openings[query]) - self.vertices[starts],
+            self.plane_normals(box)
+        ))
+
+        # Sort by opening then distance and keep the first wall per opening
+        order = np.lexsort((distance, query))
+        query, box, distance = query[order], box[order], distance[order]
+        first = np.concatenate([[True], query[1:] != query[:-1]])
+        for q, b, d in zip(query[first], box[first], distance[first]):
+            if d <= tolerance:
+                hosts[self.ids[openings[q]]] = self.ids[b]
+        return hosts
+
+    def overlapping(self, category, tolerance=1e-6):
+        """List of id pairs of components in category whose boxes overlap
+
+        The boxes must overlap by more than tolerance along every axis both
+        of them extend in, so components that only touch do not count while
+        flat ones in the same plane (two openings in one wall) still do.
+        """
+        members = self.indices(category)
+        boxes = self.boxes[members]
+        a, b = SpatialIndex(boxes, self.grid.cell_size).self_pairs()
+        common = np.minimum(boxes[a, 1], boxes[b, 1]) - np.maximum(boxes[a, 0], boxes[b, 0])
+        spanned = (boxes[:, 1] - boxes[:, 0] > tolerance).sum(axis=1)
+        keep = (common > tolerance).sum(axis=1) >= np.minimum(spanned[a], spanned[b])
+        return list(zip(self.ids[members[a[keep]]], self.ids[members[b[keep]]]))
+
+    def column_bases(self):
+        """(columns, vertex) index arrays of the lower end vertex of every column"""
+        columns = self.indices('columns')
+        starts = self.offsets[columns]
+        ends = self.offsets[columns + 1] - 1
+        return columns, np.where(self.vertices[starts, 2] <= self.vertices[ends, 2], starts, ends)
+
+    def supporting_floors(self, tolerance=0.05):
+        """Map each column id to the id of the floor its lower end lands on
+
+        The floor must be within tolerance of the column base, measured
+        vertically against the floor polygon (not its box), so a column next
+        to a concave floor is not supported by it. Columns standing on the
+        ground (no floor below them) map to None.
+        """
+        columns, bases = self.column_bases()
+        # Cast down from just above the base, so floors at or slightly above it are found
+        origins = self.vertices[bases] + [0.0, 0.0, tolerance]
+        ids, distances = self.raycast(origins, np.tile([0.0, 0.0, -1.0], (len(columns), 1)),
+                                      categories=('floors',))
+        return {self.ids[c]: (floor if d <= 2 * tolerance else None)
+                for c, floor, d in zip(columns, ids, distances)}
+
+    def raycast(self, origins, directions, categories=None):
+        """Nearest component hit by each ray
+
+        origins and directions are (R, 3) arrays. Returns (ids, distances)
+        with None / inf for rays that miss. All rays walk the grid together,
+        one cell per step (3D-DDA), and only the boxes registered in the
+        visited cells are tested; a ray stops at the first cell whose far
+        side is beyond its nearest hit. Boxes are tested first (slab test)
+        and planar components are then refined against their actual
+        triangles, so a ray passing through the box of a sloped wall does not
+        count as a hit.
+        """
+        origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+        directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+        directions = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+
+        allowed = np.ones(len(self.ids), dtype=bool)
+        if categories is not None:
+            allowed = np.isin(self.codes, [CATEGORIES.index(c) for c in categories])
+
+        ids = np.full(len(origins), None, dtype=object)
+        distances = np.full(len(origins), np.inf)
+        best = np.full(len(origins), -1)
+        if len(self.ids) == 0 or len(origins) == 0:
+            return list(ids), distances
+
+        grid = self.grid
+        size = grid.cell_size
+        low = grid.origin
+        high = grid.origin + grid.dims * size
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inverse = 1.0 / directions
+            t0 = np.nan_to_num((low - origins) * inverse, nan=-np.inf)
+            t1 = np.nan_to_num((high - origins) * inverse, nan=np.inf)
+        t_enter = np.maximum(np.minimum(t0, t1).max(axis=1), 0.0)
+        t_exit = np.maximum(t0, t1).min(axis=1)
+
+        # Start cell, step direction and ray parameter of the next cell wall per axis
+        active = np.flatnonzero(t_enter <= t_exit)
+        start = origins[active] + t_enter[active, None] * directions[active]
+        cell = np.clip(np.floor((start - low) / size).astype(np.int64), 0, grid.dims - 1)
+        step = np.where(directions[active] > 0, 1, -1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            walls = low + (cell + (step > 0)) * size
+            t_next = np.where(directions[active] != 0, (walls - origins[active]) * inverse[active], np.inf)
+            t_delta = np.where(directions[active] != 0, size * np.abs(inverse[active]), np.inf)
+
+        while len(active):
+            ray, comp = grid._cell_pairs(active, grid._cell_key(cell))
+            keep = allowed[comp]
+            ray, comp = ray[keep], comp[keep]
+            if len(ray):
+                distance = self._hit_distances(origins[ray], directions[ray], comp)
+                order = np.lexsort((distance, ray))
+                ray, comp, distance = ray[order], comp[order], distance[order]
+                first = np.concatenate([[True], ray[1:] != ray[:-1]])
+                ray, comp, distance = ray[first], comp[first], distance[first]
+                closer = distance < distances[ray]
+                distances[ray[closer]] = distance[closer]
+                best[ray[closer]] = comp[closer]
+
+            # Step every ray into the neighbouring cell across its nearest wall
+            t_leave = t_next.min(axis=1)
+            axis = np.argmin(t_next, axis=1)
+            rows = np.arange(len(active))
+            cell[rows, axis] += step[rows, axis]
+            t_next[rows, axis] += t_delta[rows, axis]
+            going = ((distances[active] > t_leave) & (t_leave <= t_exit[active]) &
+                     np.all((cell >= 0) & (cell < grid.dims), axis=1))
+            active, cell, step, t_next, t_delta = (active[going], cell[going], step[going], t_next[going],
+                                                   t_delta[going])
+
+        hit = best >= 0
+        ids[hit] = self.ids[best[hit]]
+        return list(ids), distances
+
+    def surface_triangles(self):
+        """(starts, triangles): triangles[starts[n]:starts[n + 1]] are those of component n
+
+        Line members have none. Computed on the first ray query.
+        """
+        if self._triangles is None:
+            surfaces = np.flatnonzero(np.isin(self.codes, [CATEGORIES.index(c) for c in SURFACE_CATEGORIES]))
+            counts = np.zeros(len(self.ids), dtype=np.int64)
+            counts[surfaces], triangles = polygon_triangles(self.vertices, self.offsets, surfaces)
+            self._triangles = (np.concatenate([[0], np.cumsum(counts)]), triangles)
+        return self._triangles
+
+    def _hit_distances(self, origins, directions, comp):
+        """Distance along every ray to its component, inf on a miss"""
+        boxes = self.boxes[comp]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inverse = 1.0 / directions
+            t0 = (boxes[:, 0] - origins) * inverse
+            t1 = (boxes[:, 1] - origins) * inverse
+        # A ray parallel to a slab gives nan when it starts on the slab plane
+        t0 = np.nan_to_num(t0, nan=-np.inf)
+        t1 = np.nan_to_num(t1, nan=np.inf)
+        t_near = np.minimum(t0, t1).max(axis=1)
+        t_far = np.maximum(t0, t1).min(axis=1)
+        distance = np.where((t_near <= t_far) & (t_far >= 0), np.maximum(t_near, 0.0), np.inf)
+
+        # Refine surface components with a ray/triangle test
+        surface = np.flatnonzero(np.isfinite(distance) & np.isin(
+            self.codes[comp], [CATEGORIES.index(c) for c in SURFACE_CATEGORIES]
+        ))
+        if len(surface):
+            starts, triangles = self.surface_triangles()
+            owners = comp[surface]
+            counts = starts[owners + 1] - starts[owners]
+            pair = np.repeat(surface, counts)
+            a, b, c = triangles[expand_ranges(starts[owners], counts)].T
+            t = ray_triangle_distance(origins[pair], directions[pair],
+                                      self.vertices[a], self.vertices[b], self.vertices[c])
+            best = np.full(len(comp), np.inf)
+            np.minimum.at(best, pair, t)
+            distance[surface] = best[surface]
+
+        return distance
+
+
+def ray_triangle_distance(origins, directions, a, b, c, eps=1e-12):
+    """Vectorized Moller-Trumbore; distance along each ray or inf on a miss"""
+    edge1 = b - a
+    edge2 = c - a
+    p = np.cross(directions, edge2)
+    det = np.einsum('ij,ij->i', edge1, p)
+    valid = np.abs(det) > eps
+    inv_det = np.where(valid, 1.0 / np.where(valid, det, 1.0), 0.0)
+
+    s = origins - a
+    u = np.einsum('ij,ij->i', s, p) * inv_det
+    q = np.cross(s, edge1)
+    v = np.einsum('ij,ij->i', directions, q) * inv_det
+    t = np.einsum('ij,ij->i', edge2, q) * inv_det
+
+    hit = valid & (u >= -eps) & (v >= -eps) & (u + v <= 1 + eps) & (t >= 0)
+    return np.where(hit, t, np.inf)
@@ -0,0 +1,144 @@
+import os
+
+import numpy as np
+
+from geometry_validation import nearest_segment, point_segment_distance, validate_geometry
+from spatial_index import ComponentIndex
+from vertex_weld import weld_vertices
+
+# Copy of vertex_weld.py used by the JSON -> frame conversion
+CONNECTOR_WELD = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Connectors',
+                              'Python_Structure_json', 'vertex_weld.py')
+
+
+def brute_force_weld(vertices, tolerance):
+    """Reference: union of every pair closer than tolerance, lowest index per cluster"""
+    parent = list(range(len(vertices)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    distance = np.linalg.norm(vertices[:, None] - vertices[None], axis=2)
+    for i, j in zip(*np.nonzero(np.triu(distance <= tolerance, 1))):
+        a, b = find(i), find(j)
+        parent[max(a, b)] = min(a, b)
+    roots = [find(i) for i in range(len(vertices))]
+    lowest = {}
+    for i, root in enumerate(roots):
+        lowest.setdefault(root, i)
+    return np.array([lowest[root] for root in roots])
+
+
+def test_weld_does_not_depend_on_order():
+    points = np.array([[0.006, 0, 0], [0.0151, 0, 0]])
+    assert weld_vertices(points, 0.01).tolist() == [0, 0]
+    assert weld_vertices(points[::-1], 0.01).tolist() == [0, 0]
+
+
+def test_weld_matches_brute_force():
+    rng = np.random.default_rng(0)
+    for _ in range(10):
+        vertices = rng.uniform(-0.1, 0.1, (300, 3))
+        # Exact duplicates, like the shared corners of walls and floors
+        vertices[::10] = vertices[5::10]
+        expected = brute_force_weld(vertices, 0.02)
+        assert np.array_equal(weld_vertices(vertices, 0.02), expected)
+
+        # The same clusters for any vertex order
+        order = rng.permutation(len(vertices))
+        welded = weld_vertices(vertices[order], 0.02)
+        assert np.array_equal(expected[order[welded]], expected[order])
+
+
+def test_connector_weld_is_identical():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vertex_weld.py'), newline='') as f:
+        shared = f.read()
+    with open(CONNECTOR_WELD, newline='') as f:
+        copy = f.read().replace('\r\n', '\n')
+    assert copy == shared
+
+
+def test_weld_far_from_origin():
+    vertices = np.array([[0.0, 0.0, 0.0], [1e15, 1e15, 1e15], [1e15 + 0.0005, 1e15, 1e15]])
+    assert weld_vertices(vertices, 1e-3).tolist() == [0, 1, 1]
+
+
+def test_nearest_segment_chunks_match_dense():
+    rng = np.random.default_rng(1)
+    points = rng.uniform(0, 10, (500, 3))
+    starts = rng.uniform(0, 10, (40, 3))
+    ends = rng.uniform(0, 10, (40, 3))
+    distance, closest = point_segment_distance(points, starts, ends)
+    nearest = np.argmin(distance, axis=1)
+    rows = np.arange(len(points))
+
+    gap, snapped = nearest_segment(points, starts, ends, chunk_size=300)
+    assert np.allclose(gap, distance[rows, nearest])
+    assert np.allclose(snapped, closest[rows, nearest])
+
+
+def rectangle(component_id, corners):
+    return {'id': component_id, 'vertices': [{'x': x, 'y': y, 'z': z} for x, y, z in corners]}
+
+
+def test_balcony_rests_on_wall():
+    walls = [rectangle('wall', [(0, 0, 0), (4, 0, 0), (4, 0, 3), (0, 0, 3)])]
+    floors = [
+        # Cantilevered slab sharing one edge with the wall top
+        rectangle('balcony', [(0, -1, 3), (2, -1, 3), (2, 0, 3), (0, 0, 3)]),
+        # Touches the wall at a single corner only
+        rectangle('corner', [(4, 0, 3), (5, 0, 3), (5, -1, 3), (4, -1, 3)]),
+        # Slab 0.1 m in front of the wall
+        rectangle('floating', [(1, -1, 3), (2, -1, 3), (2, -0.1, 3), (1, -0.1, 3)]),
+    ]
+    report, fixed = validate_geometry({'components': {'walls': walls, 'floors': floors}}, repair=True)
+    assert sorted(issue['id'] for issue in report['issues']) == ['corner', 'floating']
+
+    # Only the flagged floors are snapped
+    balcony, _, floating = fixed['components']['floors']
+    assert balcony == floors[0]
+    assert [vertex['y'] for vertex in floating['vertices']] == [-1, -1, 0, 0]
+
+
+def test_opening_far_from_walls_gets_nearest_wall():
+    walls = [rectangle('front', [(0, 0, 0), (4, 0, 0), (4, 0, 3), (0, 0, 3)]),
+             rectangle('side', [(4, 0, 0), (4, 3, 0), (4, 3, 3), (4, 0, 3)])]
+    openings = [rectangle('inside', [(1, 0, 1), (2, 0, 1), (2, 0, 2), (1, 0, 2)]),
+                # Beyond snap_distance of every wall: found by the fallback
+                rectangle('far', [(2.5, -2, 1), (3.5, -2, 1), (3.5, -2, 2), (2.5, -2, 2)])]
+    report, fixed = validate_geometry({'components': {'walls': walls, 'openings': openings}}, repair=True)
+    assert [(issue['id'], issue['nearest_wall']) for issue in report['issues']] == [('far', 'front')]
+    assert [vertex['y'] for vertex in fixed['components']['openings'][1]['vertices']] == [0, 0, 0, 0]
+
+
+def test_overlapping_openings():
+    walls = [rectangle('wall', [(0, 0, 0), (6, 0, 0), (6, 0, 3), (0, 0, 3)])]
+    openings = [rectangle('a', [(1, 0, 1), (2, 0, 1), (2, 0, 2), (1, 0, 2)]),
+                rectangle('b', [(1.5, 0, 1), (2.5, 0, 1), (2.5, 0, 2), (1.5, 0, 2)]),
+                # Shares an edge with b only
+                rectangle('c', [(2.5, 0, 1), (3.5, 0, 1), (3.5, 0, 2), (2.5, 0, 2)])]
+    report, _ = validate_geometry({'components': {'walls': walls, 'openings': openings}})
+    assert [(issue['id'], issue['other']) for issue in report['issues']] == [('a', 'b')]
+
+
+def test_column_support():
+    # L-shaped floor starting at a vertex next to the reflex corner, so a
+    # fan triangulation would also cover the notch at (4, 7)
+    floors = [rectangle('L', [(10, 2, 3), (2, 2, 3), (2, 10, 3), (0, 10, 3), (0, 0, 3), (10, 0, 3)])]
+    columns = [rectangle('ground', [(1, 1, 0), (1, 1, 3)]),
+               rectangle('on_floor', [(1, 1, 3), (1, 1, 6)]),
+               rectangle('gap', [(1, 8, 3.1), (1, 8, 6)]),
+               rectangle('notch', [(4, 7, 3), (4, 7, 6)])]
+    components = {'floors': floors, 'columns': columns}
+    index = ComponentIndex(components)
+    assert index.supporting_floors(0.01) == {'ground': None, 'on_floor': 'L', 'gap': None, 'notch': None}
+
+    report, fixed = validate_geometry({'components': components}, repair=True)
+    issues = {issue['id']: (issue['floor'], round(issue['gap'], 6)) for issue in report['issues']}
+    assert issues == {'gap': ('L', 0.1), 'notch': (None, 3.0)}
+    # Only the base within snap_distance is moved down onto the floor
+    assert fixed['components']['columns'][2]['vertices'][0]['z'] == 3.0
+    assert fixed['components']['columns'][3] == columns[3]
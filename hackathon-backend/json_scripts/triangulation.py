@@ -0,0 +1,288 @@
+from collections import OrderedDict
+
+import numpy as np
+
+# Coordinates are rounded to this many decimals (0.1 mm) before hashing
+HASH_DECIMALS = 4
+
+# Number of distinct polygon shapes kept in the cache
+CACHE_SIZE = 4096
+
+_cache = OrderedDict()
+_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def polygon_normal(points):
+    """Normal of a 3D ring with Newell's method (not normalized)"""
+    return np.cross(points, np.roll(points, -1, axis=0)).sum(axis=0)
+
+
+def project_to_plane(points, normal):
+    """Drop the coordinate axis closest to the polygon normal"""
+    axis = int(np.argmax(np.abs(normal)))
+    return points[:, [a for a in range(3) if a != axis]]
+
+
+def signed_area(points):
+    """Signed area of a 2D ring (positive for counter-clockwise)"""
+    x, y = points[:, 0], points[:, 1]
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+
+
+def remove_duplicates(ring, tolerance=1e-9):
+    """Indices of a ring without consecutive duplicates (incl. a closing point)"""
+    step = np.linalg.norm(ring - np.roll(ring, -1, axis=0), axis=1)
+    return np.flatnonzero(step > tolerance)
+
+
+def cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def point_in_triangle(p, a, b, c):
+    """True if p lies inside or on the counter-clockwise triangle abc"""
+    return cross(a, b, p) >= 0 and cross(b, c, p) >= 0 and cross(c, a, p) >= 0
+
+
+def bridge_hole(points, ring, hole):
+    """Splice a clockwise hole into a counter-clockwise outer ring
+
+    Connects the rightmost hole vertex to a visible ring vertex (Eberly's
+    method) and returns the merged ring of point indices.
+    """
+    m = max(hole, key=lambda n: (points[n][0], -points[n][1]))
+    mx, my = points[m]
+
+    # Nearest ring edge hit by a ray from m towards +x. Only upward edges
+    # have the interior on their left (-x) side; this also picks the right
+    # copy of an earlier bridge, which appears once in each direction.
+    best_x, best_edge = np.inf, None
+    for k in range(len(ring)):
+        a, b = points[ring[k]], points[ring[(k + 1) % len(ring)]]
+        if not a[1] <= my <= b[1] or a[1] == b[1]:
+            continue
+        t = (my - a[1]) / (b[1] - a[1])
+        x = a[0] + t * (b[0] - a[0])
+        if mx <= x < best_x:
+            best_x, best_edge = x, k
+
+    if best_edge is None:
+        raise ValueError("Hole is not inside the outer polygon")
+
+    # Endpoint of the hit edge with the larger x is a bridge candidate
+    a_index, b_index = best_edge, (best_edge + 1) % len(ring)
+    candidate = a_index if points[ring[a_index]][0] > points[ring[b_index]][0] else b_index
+    hit = (best_x, my)
+    p = points[ring[candidate]]
+
+    # A reflex ring vertex inside triangle (m, hit, p) blocks the view; use
+    # the one with the smallest angle to the ray instead
+    triangle = (points[m], hit, p) if cross(points[m], hit, p) > 0 else (points[m], p, hit)
+    best_angle = None
+    for k, n in enumerate(ring):
+        q = points[n]
+        # Other copies of p (from earlier bridges) must not replace the copy
+        # on the hit edge, whose sector is the one facing m
+        if k == candidate or (q == p).all() or not (q[0] >= mx):
+            continue
+        prev_q, next_q = points[ring[k - 1]], points[ring[(k + 1) % len(ring)]]
+        reflex = cross(prev_q, q, next_q) <= 0
+        if reflex and point_in_triangle(q, *triangle):
+            angle = abs(q[1] - my) / max(q[0] - mx, 1e-12)
+            if best_angle is None or angle < best_angle:
+                best_angle, candidate = angle, k
+
+    start = hole.index(m)
+    hole_loop = hole[start:] + hole[:start + 1]
+    return ring[:candidate + 1] + hole_loop + ring[candidate:]
+
+
+def filter_points(points, ring):
+    """Drop ring vertices that repeat their successor or sit on a straight run
+
+    Such vertices add no area; leaving them in can make every remaining
+    corner fail the ear test.
+    """
+    ring = list(ring)
+    k = 0
+    checked = 0
+    while len(ring) > 3 and checked < len(ring):
+        k %= len(ring)
+        prev_p, p, next_p = points[ring[k - 1]], points[ring[k]], points[ring[(k + 1) % len(ring)]]
+        if (p == next_p).all() or cross(prev_p, p, next_p) == 0:
+            del ring[k]
+            k -= 1
+            checked = 0
+        else:
+            k += 1
+            checked += 1
+    return ring
+
+
+def ear_clip(points, ring):
+    """Ear clipping of a counter-clockwise ring of point indices
+
+    Only reflex vertices can lie inside an ear, so only those are tested.
+    When no ear is found the ring is cleaned up with filter_points, then the
+    test is relaxed to ignore vertices on the ear's boundary, and only if
+    that also fails the current vertex is clipped regardless so the loop
+    terminates.
+    """
+    ring = filter_points(points, ring)
+    triangles = []
+
+    def is_reflex(k):
+        return cross(points[ring[k - 1]], points[ring[k]], points[ring[(k + 1) % len(ring)]]) <= 0
+
+    def is_ear(k, relaxed):
+        a, b, c = ring[k - 1], ring[k], ring[(k + 1) % len(ring)]
+        pa, pb, pc = points[a], points[b], points[c]
+        if cross(pa, pb, pc) <= 0:
+            return False
+        for m, n in enumerate(ring):
+            if n in (a, b, c) or not is_reflex(m):
+                continue
+            q = points[n]
+            # Copies of bridge vertices sit exactly on an ear corner and
+            # block it when they are reflex, like any other vertex
+            if relaxed:
+                inside = cross(pa, pb, q) > 0 and cross(pb, pc, q) > 0 and cross(pc, pa, q) > 0
+            else:
+                inside = point_in_triangle(q, pa, pb, pc)
+            if inside:
+                return False
+        return True
+
+    k = 0
+    stalled = 0
+    while len(ring) > 3:
+        k %= len(ring)
+        if is_ear(k, relaxed=stalled >= len(ring)):
+            triangles.append((ring[k - 1], ring[k], ring[(k + 1) % len(ring)]))
+            del ring[k]
+            stalled = 0
+            continue
+        k += 1
+        stalled += 1
+        if stalled == len(ring):
+            filtered = filter_points(points, ring)
+            if len(filtered) < len(ring):
+                ring = filtered
+                stalled = 0
+                continue
+        if stalled >= 2 * len(ring):
+            # No ear even with the relaxed test (self intersecting input)
+            triangles.append((ring[k - 2], ring[(k - 1) % len(ring)], ring[k % len(ring)]))
+            del ring[(k - 1) % len(ring)]
+            stalled = 0
+
+    triangles.append(tuple(ring))
+    return triangles
+
+
+def _triangulate_2d(outer, holes):
+    """Triangulate a 2D polygon with holes; returns (T, 3) indices into the
+    concatenation of outer and holes"""
+    rings = [outer] + list(holes)
+    points = np.concatenate(rings)
+    offsets = np.cumsum([0] + [len(r) for r in rings])
+
+    def oriented(k, ccw):
+        indices = list(range(offsets[k], offsets[k + 1]))
+        indices = [indices[n] for n in remove_duplicates(points[indices])]
+        if (signed_area(points[indices]) > 0) != ccw:
+            indices.reverse()
+        return indices
+
+    ring = oriented(0, True)
+    hole_rings = [oriented(k, False) for k in range(1, len(rings))]
+    # Bridge the holes from right to left so bridges never cross
+    hole_rings.sort(key=lambda h: -points[h, 0].max())
+    for hole in hole_rings:
+        ring = bridge_hole(points, ring, hole)
+
+    if len(ring) < 3:
+        return np.empty((0, 3), dtype=np.int64)
+    return np.array(ear_clip(points, ring), dtype=np.int64)
+
+
+def polygon_key(outer, holes):
+    """Cache key of a polygon shape, independent of its position
+
+    Stacked floors differ only by their elevation (and plan position), so
+    coordinates are taken relative to the first vertex before hashing.
+    """
+    rings = [np.asarray(outer, dtype=np.float64)] + [np.asarray(h, dtype=np.float64) for h in holes]
+    origin = rings[0][0]
+    parts = [np.round(r - origin, HASH_DECIMALS) + 0.0 for r in rings]
+    return (tuple(len(p) for p in parts), b''.join(p.tobytes() for p in parts))
+
+
+def triangulate_polygon(outer, holes=()):
+    """Triangulate one planar 3D polygon with optional holes
+
+    Returns a (T, 3) array of vertex indices into the concatenation of the
+    outer ring and the holes, with triangles wound like the outer ring.
+    Results are cached by polygon shape.
+    """
+    key = polygon_key(outer, holes)
+    triangles = _cache.get(key)
+    if triangles is not None:
+        _cache.move_to_end(key)
+        _cache_stats['hits'] += 1
+        return triangles
+
+    _cache_stats['misses'] += 1
+    outer = np.asarray(outer, dtype=np.float64)
+    holes = [np.asarray(h, dtype=np.float64) for h in holes]
+    normal = polygon_normal(outer)
+    triangles = _triangulate_2d(project_to_plane(outer, normal),
+                                [project_to_plane(h, normal) for h in holes])
+
+    # Wind every triangle like the outer ring (the projection may mirror it)
+    points = np.concatenate([outer] + holes)
+    a, b, c = points[triangles[:, 0]], points[triangles[:, 1]], points[triangles[:, 2]]
+    flip = np.cross(b - a, c - a) @ normal < 0
+    triangles[flip] = triangles[flip][:, ::-1]
+    triangles.setflags(write=False)
+
+    _cache[key] = triangles
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return triangles
+
+
+def triangulate_polygons(polygons):
+    """Triangulate a batch of polygons given as (outer, holes) pairs
+
+    Returns (vertices, triangles, owners): all vertices stacked into one
+    (V, 3) array, (T, 3) triangle indices into it and the polygon index of
+    every triangle, ready to be drawn as a single mesh.
+    """
+    vertices, triangles, owners = [], [], []
+    offset = 0
+
+    for n, (outer, holes) in enumerate(polygons):
+        rings = [np.asarray(outer, dtype=np.float64)] + \
+            [np.asarray(h, dtype=np.float64) for h in holes]
+        tri = triangulate_polygon(rings[0], rings[1:])
+        points = np.concatenate(rings)
+        vertices.append(points)
+        triangles.append(tri + offset)
+        owners.append(np.full(len(tri), n, dtype=np.int64))
+        offset += len(points)
+
+    if not vertices:
+        return np.empty((0, 3)), np.empty((0, 3), dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(vertices), np.concatenate(triangles), np.concatenate(owners)
+
+
+def cache_info():
+    """Cache hit/miss counters and current size"""
+    return dict(_cache_stats, size=len(_cache))
+
+
+def clear_cache():
+    _cache.clear()
+    _cache_stats['hits'] = 0
+    _cache_stats['misses'] = 0
@@ -1,123 +1,276 @@
+import argparse
+import time
+
 import numpy as np
 import json
 
+# Two triangles per quad (corners ordered around the quad)
+QUAD_TRIANGLES = np.array([[0, 1, 2], [0, 2, 3]])
+
+
+def quads(start, end, bottom, top):
+    """Vertical quads between plan points start and end, shape (..., 4, 3)
+
+    start/end are (..., 2) arrays and bottom/top broadcast against them
+    without the last axis. Corners are bottom-left, bottom-right, top-right,
+    top-left, like the walls in the components schema.
+    """
+    start, end = np.broadcast_arrays(start, end)
+    shape = np.broadcast_shapes(start.shape[:-1], np.shape(bottom), np.shape(top))
+    start = np.broadcast_to(start, shape + (2,))
+    end = np.broadcast_to(end, shape + (2,))
+    bottom = np.broadcast_to(bottom, shape)[..., None]
+    top = np.broadcast_to(top, shape)[..., None]
+    return np.stack([
+        np.concatenate([start, bottom], axis=-1),
+        np.concatenate([end, bottom], axis=-1),
+        np.concatenate([end, top], axis=-1),
+        np.concatenate([start, top], axis=-1)
+    ], axis=-2)
+
+
+def rectangles(x0, y0, x1, y1, z):
+    """Horizontal rectangles, shape (..., 4, 3), counter-clockwise from (x0, y0)"""
+    x0, y0, x1, y1, z = np.broadcast_arrays(x0, y0, x1, y1, z)
+    return np.stack([
+        np.stack([x0, y0, z], axis=-1),
+        np.stack([x1, y0, z], axis=-1),
+        np.stack([x1, y1, z], axis=-1),
+        np.stack([x0, y1, z], axis=-1)
+    ], axis=-2)
+
+
+def quads_to_mesh(quad_arrays):
+    """Stack (..., 4, 3) quad arrays into vertices (N, 3) and faces (M, 3)"""
+    corners = np.concatenate([q.reshape(-1, 4, 3) for q in quad_arrays])
+    vertices = corners.reshape(-1, 3)
+    starts = np.arange(len(corners))[:, None, None] * 4
+    faces = (QUAD_TRIANGLES[None, :, :] + starts).reshape(-1, 3)
+    return vertices, faces
+
+
+def generate_building_arrays(floors=5, floor_height=1.0, bays=(4, 3), bay_width=1.0,
+                             window_grid=(1, 1), window_ratio=0.6, setback=0.0, setback_every=0,
+                             balconies=True, balcony_depth=0.5, roof_inset=0.5, roof_height=0.8):
+    """Generate a building as numpy arrays, without any Python loop over elements
+
+    The footprint is bays[0] x bays[1] bays of bay_width. Every
+    setback_every floors the footprint steps in by setback on all sides
+    (the bay count stays, bays get narrower). Each facade bay holds a
+    window_grid[0] x window_grid[1] grid of windows filling window_ratio of
+    their grid cell; the middle bay of the ground floor front gets a door
+    instead. Balconies run along the front on every floor above ground.
+
+    Returns a dict of quad arrays (..., 4, 3) for walls, wall panels,
+    windows, doors, slabs, balconies and the roof box, plus (N, 2, 3)
+    column and beam end points.
+    """
+    bays_x, bays_y = bays
+    columns_x, rows_z = window_grid
+    width, depth = bays_x * bay_width, bays_y * bay_width
+
+    levels = np.arange(floors)
+    z0 = levels * floor_height
+    z1 = z0 + floor_height
+    inset = setback * (levels // setback_every) if setback_every else np.zeros(floors)
+    inset = np.minimum(inset, 0.5 * min(width, depth) - 1e-3)
+
+    # Footprint corners per floor, counter-clockwise: (floors, 4, 2)
+    x0, y0, x1, y1 = inset, inset, width - inset, depth - inset
+    corners = np.stack([np.stack([x0, y0], -1), np.stack([x1, y0], -1),
+                        np.stack([x1, y1], -1), np.stack([x0, y1], -1)], axis=1)
+
+    walls, panels, windows, doors = [], [], [], []
+    for side in range(4):
+        start, end = corners[:, side], corners[:, (side + 1) % 4]
+        count = bays_x if side % 2 == 0 else bays_y
+        direction = end - start
+        # Outward normal of a counter-clockwise footprint edge
+        normal = np.stack([direction[:, 1], -direction[:, 0]], -1)
+        normal /= np.linalg.norm(normal, axis=1, keepdims=True)
+
+        walls.append(quads(start, end, z0, z1))
+
+        t = np.arange(count + 1) / count
+        points = start[:, None, :] + t[None, :, None] * direction[:, None, :]
+        panels.append(quads(points[:, :-1], points[:, 1:], z0[:, None], z1[:, None]))
+
+        # Window grid: (floors, bays, columns, rows)
+        cell = np.arange(columns_x)
+        u0 = (np.arange(count)[:, None] + (cell + (1 - window_ratio) / 2) / columns_x) / count
+        u1 = (np.arange(count)[:, None] + (cell + (1 + window_ratio) / 2) / columns_x) / count
+        row = np.arange(rows_z)
+        v0 = (row + (1 - window_ratio) / 2) / rows_z * floor_height
+        v1 = (row + (1 + window_ratio) / 2) / rows_z * floor_height
+
+        a = start[:, None, None, None, :] + u0[None, :, :, None, None] * direction[:, None, None, None, :]
+        b = start[:, None, None, None, :] + u1[None, :, :, None, None] * direction[:, None, None, None, :]
+        bottom = z0[:, None, None, None] + v0[None, None, None, :]
+        top = z0[:, None, None, None] + v1[None, None, None, :]
+        grid = quads(a, b, bottom, top)
+
+        keep = np.ones(grid.shape[:4], dtype=bool)
+        if side == 0:
+            # Door in the middle bay of the ground floor front
+            middle = count // 2
+            keep[0, middle] = False
+            door_start = start[0] + (middle + (1 - window_ratio) / 2) / count * direction[0]
+            door_end = start[0] + (middle + (1 + window_ratio) / 2) / count * direction[0]
+            doors.append(quads(door_start, door_end, z0[0], z0[0] + window_ratio * floor_height)[None])
+        windows.append((grid[keep], np.broadcast_to(normal[:, None, None, None, :], keep.shape + (2,))[keep]))
+
+    # Floor slabs at every level plus the top slab, each with its footprint
+    slab_levels = np.append(z0, floors * floor_height)
+    slab_inset = np.append(inset, inset[-1])
+    slabs = rectangles(slab_inset, slab_inset, width - slab_inset, depth - slab_inset, slab_levels)
+
+    # Balconies along the front of every floor above ground, one per bay
+    balcony_slabs = np.empty((0, 4, 3))
+    if balconies and floors > 1:
+        upper = levels[1:]
+        bx = inset[upper, None] + np.arange(bays_x + 1)[None, :] * (width - 2 * inset[upper, None]) / bays_x
+        y_front = inset[upper, None]
+        balcony_slabs = rectangles(bx[:, :-1], y_front - balcony_depth, bx[:, 1:], y_front,
+                                   z0[upper, None]).reshape(-1, 4, 3)
+
+    # Rooftop box on the top slab
+    top = floors * floor_height
+    rx0, ry0 = inset[-1] + roof_inset, inset[-1] + roof_inset
+    rx1, ry1 = width - inset[-1] - roof_inset, depth - inset[-1] - roof_inset
+    roof_corners = np.array([[rx0, ry0], [rx1, ry0], [rx1, ry1], [rx0, ry1]])
+    roof_walls = quads(roof_corners, np.roll(roof_corners, -1, axis=0), top, top + roof_height)
+    roof_slab = rectangles(rx0, ry0, rx1, ry1, top + roof_height)[None]
 
-def generate_building_data():
-    # Building dimensions
-    width = 4
-    depth = 3
-    height = 5
-    level_height = 1
-
-    # Main building vertices
-    vertices = np.array([
-        # Base points
-        [0, 0, 0],
-        [width, 0, 0],
-        [width, depth, 0],
-        [0, depth, 0],
-        # Top points
-        [0, 0, height],
-        [width, 0, height],
-        [width, depth, height],
-        [0, depth, height],
-    ]).tolist()
-
-    # Define faces (indices for triangles)
-    faces = [
-        # Bottom
-        [0, 1, 2],
-        [0, 2, 3],
-        # Top
-        [4, 6, 5],
-        [4, 7, 6],
-        # Front
-        [0, 5, 1],
-        [0, 4, 5],
-        # Right
-        [1, 5, 6],
-        [1, 6, 2],
-        # Back
-        [2, 6, 7],
-        [2, 7, 3],
-        # Left
-        [3, 7, 4],
-        [3, 4, 0]
-    ]
-
-    # Generate balcony data
-    balconies = []
-    for floor in range(1, height):
-        balcony_depth = 0.5
-        balcony_verts = [
-            [0, -balcony_depth, floor],
-            [width, -balcony_depth, floor],
-            [width, 0, floor],
-            [0, 0, floor]
-        ]
-        base_idx = len(vertices)
-        vertices.extend(balcony_verts)
-        balconies.extend([
-            [base_idx, base_idx + 1, base_idx + 2],
-            [base_idx, base_idx + 2, base_idx + 3]
-        ])
-
-    # Generate rooftop structure
-    roof_inset = 0.5
-    roof_height = 0.8
-    roof_vertices = [
-        [roof_inset, roof_inset, height],
-        [width - roof_inset, roof_inset, height],
-        [width - roof_inset, depth - roof_inset, height],
-        [roof_inset, depth - roof_inset, height],
-        [roof_inset, roof_inset, height + roof_height],
-        [width - roof_inset, roof_inset, height + roof_height],
-        [width - roof_inset, depth - roof_inset, height + roof_height],
-        [roof_inset, depth - roof_inset, height + roof_height],
-    ]
-
-    base_idx = len(vertices)
-    vertices.extend(roof_vertices)
-
-    roof_faces = [
-        # Bottom
-        [base_idx, base_idx + 1, base_idx + 2],
-        [base_idx, base_idx + 2, base_idx + 3],
-        # Top
-        [base_idx + 4, base_idx + 6, base_idx + 5],
-        [base_idx + 4, base_idx + 7, base_idx + 6],
-        # Front
-        [base_idx, base_idx + 5, base_idx + 1],
-        [base_idx, base_idx + 4, base_idx + 5],
-        # Right
-        [base_idx + 1, base_idx + 5, base_idx + 6],
-        [base_idx + 1, base_idx + 6, base_idx + 2],
-        # Back
-        [base_idx + 2, base_idx + 6, base_idx + 7],
-        [base_idx + 2, base_idx + 7, base_idx + 3],
-        # Left
-        [base_idx + 3, base_idx + 7, base_idx + 4],
-        [base_idx + 3, base_idx + 4, base_idx + 0],
-    ]
-
-    # Combine all faces
-    faces.extend(balconies)
-    faces.extend(roof_faces)
+    # Structural grid: columns on every grid node per floor, beams on the
+    # grid lines at the top of every floor
+    gx = np.arange(bays_x + 1) / bays_x
+    gy = np.arange(bays_y + 1) / bays_y
+    node_x = x0[:, None, None] + gx[None, :, None] * (x1 - x0)[:, None, None]
+    node_y = y0[:, None, None] + gy[None, None, :] * (y1 - y0)[:, None, None]
+    node_x, node_y = np.broadcast_arrays(node_x, node_y)
+    plan = np.stack([node_x, node_y], axis=-1)  # (floors, bays_x + 1, bays_y + 1, 2)
 
+    def points(xy, z):
+        z = np.broadcast_to(np.reshape(z, np.shape(z) + (1,) * (xy.ndim - 1 - np.ndim(z))), xy.shape[:-1])
+        return np.concatenate([xy, z[..., None]], axis=-1)
+
+    columns = np.stack([points(plan, z0), points(plan, z1)], axis=-2).reshape(-1, 2, 3)
+    beams_x = np.stack([points(plan[:, :-1], z1), points(plan[:, 1:], z1)], axis=-2).reshape(-1, 2, 3)
+    beams_y = np.stack([points(plan[:, :, :-1], z1), points(plan[:, :, 1:], z1)], axis=-2).reshape(-1, 2, 3)
+
+    return {
+        'walls': np.stack(walls, axis=1),  # (floors, 4, 4, 3)
+        'panels': panels,
+        'windows': windows,
+        'doors': np.concatenate(doors),
+        'slabs': slabs,
+        'balconies': balcony_slabs,
+        'roof': np.concatenate([roof_walls, roof_slab]),
+        'columns': columns,
+        'beams': np.concatenate([beams_x, beams_y]),
+        'dimensions': {'width': width, 'depth': depth, 'height': floors * floor_height}
+    }
+
+
+def mesh_from_arrays(arrays, window_offset=0.01):
+    """Vertices/faces format: facade panels, windows just outside the facade,
+    slabs, balconies and the roof box"""
+    windows = [grid + window_offset * np.concatenate([normal, np.zeros(normal.shape[:-1] + (1,))], -1)[:, None, :]
+               for grid, normal in arrays['windows']]
+    return quads_to_mesh(arrays['panels'] + windows + [arrays['doors'], arrays['slabs'],
+                                                       arrays['balconies'], arrays['roof']])
+
+
+def vertex_dicts(points):
+    return [{'x': x, 'y': y, 'z': z} for x, y, z in points]
+
+
+def make_components(prefix, polygons, extra=None):
+    """Component dicts from an (N, V, 3) array"""
+    polygons = np.round(polygons, 6).tolist()
+    components = []
+    for n, vertices in enumerate(polygons, start=1):
+        component = {'id': f"{prefix}_{n}", 'vertices': vertex_dicts(vertices)}
+        if extra:
+            component.update(extra)
+        components.append(component)
+    return components
+
+
+def components_from_arrays(arrays):
+    """The same building in the components schema used by the plotters and converters"""
+    window_quads = np.concatenate([grid for grid, _ in arrays['windows']])
     return {
-        "vertices": vertices,
-        "faces": faces,
-        "dimensions": {
-            "width": width,
-            "depth": depth,
-            "height": height
-        }
+        'walls': make_components('wall', arrays['walls'].reshape(-1, 4, 3)) +
+                 make_components('roof_wall', arrays['roof'][:4]),
+        'floors': make_components('floor', arrays['slabs']) +
+                  make_components('balcony', arrays['balconies']) +
+                  make_components('roof', arrays['roof'][4:]),
+        'openings': make_components('door', arrays['doors'], {'type': 'door'}) +
+                    make_components('window', window_quads, {'type': 'window'}),
+        'columns': make_components('column', arrays['columns']),
+        'beams': make_components('beam', arrays['beams'])
     }
 
 
-# Generate and save the data
-building_data = generate_building_data()
-with open('building_data.json', 'w') as f:
-    json.dump(building_data, f)
+def generate_building_data(floors=5, floor_height=1.0, bays=(4, 3), bay_width=1.0,
+                           window_grid=(1, 1), window_ratio=0.6, setback=0.0, setback_every=0,
+                           balconies=True, balcony_depth=0.5, roof_inset=0.5, roof_height=0.8,
+                           mesh=True, components=True, building_id='generated_building'):
+    # Defaults give the original 4 x 3 x 5 box with balconies and a roof box
+    arrays = generate_building_arrays(floors, floor_height, bays, bay_width, window_grid,
+                                      window_ratio, setback, setback_every, balconies,
+                                      balcony_depth, roof_inset, roof_height)
+    data = {'buildingId': building_id, 'dimensions': arrays['dimensions']}
+
+    if mesh:
+        vertices, faces = mesh_from_arrays(arrays)
+        data['vertices'] = np.round(vertices, 6).tolist()
+        data['faces'] = faces.tolist()
+    if components:
+        data['units'] = 'meters'
+        data['components'] = components_from_arrays(arrays)
+
+    return data
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a procedural building for testing and benchmarks.")
+    parser.add_argument('-o', '--output', default='building_data.json', help="Output JSON file")
+    parser.add_argument('--floors', type=int, default=5)
+    parser.add_argument('--floor-height', type=float, default=1.0)
+    parser.add_argument('--bays', type=int, nargs=2, default=(4, 3), metavar=('X', 'Y'))
+    parser.add_argument('--bay-width', type=float, default=1.0)
+    parser.add_argument('--window-grid', type=int, nargs=2, default=(1, 1), metavar=('COLUMNS', 'ROWS'),
+                        help="Windows per facade bay and floor")
+    parser.add_argument('--setback', type=float, default=0.0, help="Inset per setback step in meters")
+    parser.add_argument('--setback-every', type=int, default=0, help="Floors between setbacks (0: none)")
+    parser.add_argument('--no-balconies', action='store_true')
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--mesh-only', action='store_true', help="Only write vertices/faces")
+    output.add_argument('--components-only', action='store_true', help="Only write the components schema")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+
+    building_data = generate_building_data(
+        floors=args.floors, floor_height=args.floor_height, bays=tuple(args.bays),
+        bay_width=args.bay_width, window_grid=tuple(args.window_grid), setback=args.setback,
+        setback_every=args.setback_every, balconies=not args.no_balconies,
+        mesh=not args.components_only, components=not args.mesh_only)
+    generate_time = time.perf_counter() - start
+
+    with open(args.output, 'w') as f:
+        json.dump(building_data, f)
+
+    faces = len(building_data.get('faces', []))
+    components = sum(len(c) for c in building_data.get('components', {}).values())
+    print(f"Building data generated and saved to {args.output} "
+          f"({faces} faces, {components} components, {generate_time:.2f}s)")
+
 
-print("Building data generated and saved to building_data.json")
\ No newline at end of file
+if __name__ == "__main__":
+    main()